@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+from rnaseq_native.config import load_config_yaml
+from rnaseq_native.featurecounts import CountOptions, count_samples, load_annotation, write_count_csv
+from rnaseq_native.io import load_samples_tsv
+
+
+def main(argv: list[str]) -> int:
+    cfg_path = Path(argv[1]) if len(argv) > 1 else Path("config/config.yaml")
+    cfg = load_config_yaml(cfg_path)
+
+    # repo root = parent of the config/ folder
+    repo_root = cfg_path.resolve().parents[1]
+
+    count_cfg = cfg.get("counting", {})
+    inputs = cfg.get("inputs", {})
+    if not count_cfg.get("annotation") or not count_cfg.get("alignments"):
+        raise ValueError("Config 'counting' must contain 'annotation' and 'alignments'.")
+
+    # Inputs are relative to the config file, outputs to the repo root
+    annotation = (cfg_path.parent / count_cfg["annotation"]).resolve()
+    pattern = str(count_cfg["alignments"])  # e.g. results/align/{sample}.sam
+    samples_path = (cfg_path.parent / inputs.get("samples", "samples.tsv")).resolve()
+    outdir = (repo_root / count_cfg.get("outdir", "results/counts")).resolve()
+
+    options = CountOptions(
+        feature=count_cfg.get("feature", "exon"),
+        attribute=count_cfg.get("attribute", "gene_id"),
+        strand=int(count_cfg.get("strand", 0)),
+        min_mapq=int(count_cfg.get("min_mapq", 0)),
+        count_pairs=bool(count_cfg.get("count_pairs", True)),
+    )
+
+    samples_df = load_samples_tsv(samples_path, require_fastq=False)
+    alignments = {
+        s: (cfg_path.parent / pattern.format(sample=s)).resolve()
+        for s in samples_df["sample"]
+    }
+
+    index = load_annotation(annotation, options)
+    print(f"Annotation: {annotation} | genes: {index.n_genes} | chromosomes: {len(index.chroms)}")
+
+    counts, summary = count_samples(alignments, index, options, n_jobs=int(count_cfg.get("n_jobs", 1)))
+
+    block_dir = counts.save(outdir / "count_block")
+    csv_path = write_count_csv(counts, outdir / "gene_count_matrix.csv")
+    summary_path = outdir / "counting_summary.tsv"
+    summary.to_csv(summary_path, sep="\t")
+
+    print(summary.to_string())
+    print(f"Wrote: {block_dir}")
+    print(f"Wrote: {csv_path}")
+    print(f"Wrote: {summary_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
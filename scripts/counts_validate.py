@@ -6,8 +6,10 @@ from pathlib import Path
 
 from rnaseq_native.config import load_config_yaml
 from rnaseq_native.io import load_samples_tsv
+from rnaseq_native.cache import cache_config_from_dict, load_count_matrix_cached
 from rnaseq_native.counts import load_count_matrix, validate_count_matrix, align_counts_and_samples
 from rnaseq_native.paths import project_root
+from rnaseq_native.sparse import SparseCountMatrix
 
 
 def main(argv: list[str]) -> int:
@@ -38,15 +40,30 @@ def main(argv: list[str]) -> int:
     # counts_first metadata does NOT require FASTQ columns
     meta = load_samples_tsv(samples_path, require_fastq=False)
 
-    counts = load_count_matrix(counts_path)
-    validate_count_matrix(counts)
-
-    counts2, meta2 = align_counts_and_samples(counts, meta)
-
-    # Simply summary
-    sample_names = list(counts2.columns[1:])
-    lib_sizes = counts2[sample_names].apply(
-        lambda s: s.astype(int).sum()).to_dict()
+    counts_format = inputs.get("counts_format", "dense")
+    if counts_format != "dense":
+        # Sparse inputs: validate and sum the non-zeros only
+        sparse = SparseCountMatrix.load(counts_path, counts_format)
+        sparse.validate()
+        counts2, meta2 = align_counts_and_samples(sparse.header_frame(), meta)
+        sample_names = list(sparse.columns)
+        lib_sizes = dict(zip(sample_names, sparse.column_totals().tolist()))
+        n_genes = sparse.n_genes
+    else:
+        cache = cache_config_from_dict(cfg.get("cache"), project_root())
+        if cache is not None:
+            counts = load_count_matrix_cached(counts_path, cache)
+        else:
+            counts = load_count_matrix(counts_path)
+        validate_count_matrix(counts)
+
+        counts2, meta2 = align_counts_and_samples(counts, meta)
+
+        # Simply summary
+        sample_names = list(counts2.columns[1:])
+        lib_sizes = counts2[sample_names].apply(
+            lambda s: s.astype(int).sum()).to_dict()
+        n_genes = counts2.shape[0]
 
     outdirs = cfg.get("outdir", {})
     outdir = Path(project_root() / outdirs.get("analysis",
@@ -57,7 +74,7 @@ def main(argv: list[str]) -> int:
         "mode": mode,
         "counts_path": str(counts_path),
         "samples_path": str(samples_path),
-        "n_genes": int(counts2.shape[0]),
+        "n_genes": int(n_genes),
         "n_samples": int(len(sample_names)),
         "samples": sample_names,
         "library_sizes": lib_sizes,
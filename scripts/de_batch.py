@@ -0,0 +1,58 @@
+"""
+Run many DE plans (one per tissue / timepoint) on a bounded pool of processes.
+
+Run:
+    python scripts/de_batch.py <plans_dir | manifest.txt> [--jobs N] [--threads-per-job T]
+                               [--log-dir results/batch] [--cache-dir results/cache/counts]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from rnaseq_native.batch import BatchOptions, discover_plans, run_plans
+from rnaseq_native.cache import CountCacheConfig, DEFAULT_CACHE_DIR
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="de_batch.py")
+    parser.add_argument("plans", help="directory searched for de_plan*.json, or a manifest file")
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--threads-per-job", type=int, default=None,
+                        help="default: CPU count // jobs")
+    parser.add_argument("--log-dir", default="results/batch")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args(argv[1:])
+
+    plans = discover_plans(args.plans)
+    if not plans:
+        print(f"No DE plans found in: {args.plans}")
+        return 2
+
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // max(1, args.jobs))
+    opts = BatchOptions(
+        max_jobs=args.jobs,
+        threads_per_job=threads,
+        log_dir=Path(args.log_dir),
+        cache=CountCacheConfig(directory=Path(args.cache_dir).resolve()),
+    )
+
+    print(f"Plans: {len(plans)} | jobs: {opts.max_jobs} | threads per job: {opts.threads_per_job}")
+    de_run_script = Path(__file__).resolve().parent / "de_run.py"
+    results = run_plans(plans, de_run_script, opts)
+
+    for r in results:
+        status = "ok" if r.ok else f"FAILED ({r.error or f'exit {r.returncode}'})"
+        print(f"{status:>8}  {r.wall_s:8.1f}s  {r.plan}")
+
+    n_failed = sum(not r.ok for r in results)
+    print(f"Finished: {len(results) - n_failed} ok, {n_failed} failed")
+    print(f"Log: {opts.log_dir / 'batch_log.jsonl'}")
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -10,14 +10,20 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 import json
+from dataclasses import asdict
 from datetime import datetime
 
 
 
 from rnaseq_native.paths import project_root
 from rnaseq_native.config import load_config_yaml
-from rnaseq_native.io import load_samples_tsv
+from rnaseq_native.io import load_barcode_map, load_samples_tsv
+from rnaseq_native.cache import cache_config_from_dict, load_count_matrix_cached
 from rnaseq_native.counts import load_count_matrix, align_counts_and_samples
+from rnaseq_native.idmap import DEFAULT_IDMAP_DIR
+from rnaseq_native.ora import ora_options_from_dict
+from rnaseq_native.plots import plot_options_from_dict
+from rnaseq_native.sparse import SparseCountMatrix, load_pseudobulk
 
 
 def write_json(path: Path, payload: dict) -> None:
@@ -47,6 +53,15 @@ def main(argv: list[str]) -> int:
         "contrast", ["condition", "Protzen", "Control"])
     alpha = float(analysis_cfg.get("alpha", 0.05))
     min_total = int(analysis_cfg.get("min_total_count", 10))
+    n_workers = int(analysis_cfg.get("n_workers", 1))
+    de_mode = str(analysis_cfg.get("mode", "deseq2"))
+    if de_mode not in ("deseq2", "screen"):
+        raise ValueError(f"analysis.mode must be 'deseq2' or 'screen', got {de_mode!r}")
+    fit = str(analysis_cfg.get("fit", "default"))
+    if fit not in ("default", "chunked"):
+        raise ValueError(f"analysis.fit must be 'default' or 'chunked', got {fit!r}")
+    chunk_size = int(analysis_cfg.get("chunk_size", 1024))
+    pca_cfg = analysis_cfg.get("pca") or {}
 
     analysis_dir = (repo_root / outdirs.get("analysis",
                     "results/analysis")).resolve()
@@ -72,8 +87,41 @@ def main(argv: list[str]) -> int:
     samples_df = load_samples_tsv(samples_path, require_fastq=False)
     print(f"samples loaded: {samples_df.shape}")
     print(f"samples columns: {list(samples_df.columns)}")
-    # Load count matrix
-    counts_df = load_count_matrix(counts_path)
+    # Load count matrix (through the binary cache if configured)
+    cache = cache_config_from_dict(cfg.get("cache"), repo_root)
+    counts_format = inputs.get("counts_format", "dense")
+    # Optional barcode -> sample table: counts are cell/replicate level
+    barcodes_rel = inputs.get("barcodes")
+    barcodes_path = (cfg_path.parent / barcodes_rel).resolve() if barcodes_rel else None
+    # Optional STRG -> TAIR annotation used to add gene_tair to DE result tables
+    annotation_rel = inputs.get("annotation")
+    annotation_path = (cfg_path.parent / annotation_rel).resolve() if annotation_rel else None
+    if annotation_path is not None and not annotation_path.exists():
+        raise FileNotFoundError(f"Annotation file not found: {annotation_path}")
+    # Optional ORA of the significant genes at the end of de_run
+    ora = ora_options_from_dict(cfg.get("enrichment", {}).get("ora"), cfg_path.parent)
+    if ora is not None and not Path(ora["gene_sets"]).exists():
+        raise FileNotFoundError(f"Gene set file not found: {ora['gene_sets']}")
+    idmap_dir = (repo_root / cfg.get("cache", {}).get("idmap_dir", DEFAULT_IDMAP_DIR)).resolve()
+    if barcodes_path is not None:
+        pseudo = load_pseudobulk(counts_path, counts_format, load_barcode_map(barcodes_path),
+                                 samples_df["sample"].tolist())
+        print(f"pseudobulk counts: {pseudo.n_genes} genes x {pseudo.n_samples} samples")
+        counts_df = pseudo.header_frame()
+        n_genes = pseudo.n_genes
+    elif counts_format != "dense":
+        # Sparse inputs (mtx / triplets) are checked without densifying
+        sparse = SparseCountMatrix.load(counts_path, counts_format)
+        sparse.validate()
+        print(f"sparse counts: {sparse.n_genes} genes x {sparse.n_columns} columns, nnz={sparse.nnz}")
+        counts_df = sparse.header_frame()
+        n_genes = sparse.n_genes
+    elif cache is not None:
+        counts_df = load_count_matrix_cached(counts_path, cache)
+        n_genes = counts_df.shape[0]
+    else:
+        counts_df = load_count_matrix(counts_path)
+        n_genes = counts_df.shape[0]
 
     counts_df, samples_df = align_counts_and_samples(counts_df, samples_df)
     print("counts and samples aligned successfully.")
@@ -87,10 +135,13 @@ def main(argv: list[str]) -> int:
         "inputs": {
             "config": str(cfg_path),
             "samples_tsv": str(samples_path),
-            "counts_csv": str(counts_path)
+            "counts_csv": str(counts_path),
+            "counts_format": counts_format,
+            "barcodes_tsv": str(barcodes_path) if barcodes_path else None,
+            "annotation_csv": str(annotation_path) if annotation_path else None,
         },
         "dataset": {
-            "n_genes": int(counts_df.shape[0]),
+            "n_genes": int(n_genes),
             "n_samples": int(len(samples_df)),
             "sample_order": samples_df['sample'].tolist(),
             "conditions": samples_df['condition'].tolist(),
@@ -106,9 +157,32 @@ def main(argv: list[str]) -> int:
         "filters": {
             "min_total_count": min_total
         },
+        "execution": {
+            "mode": de_mode,
+            "n_workers": n_workers,
+            "fit": fit,
+            "chunk_size": chunk_size,
+        },
+        "pca": {
+            "n_top": int(pca_cfg.get("n_top", 500)),
+            "n_components": int(pca_cfg.get("n_components", 10)),
+            "color_by": list(pca_cfg.get("color_by", ["tree", "condition"])),
+        },
+        "plots": asdict(plot_options_from_dict(analysis_cfg.get("plots"))),
+        "enrichment": {
+            "ora": ora,
+        },
+        "cache": {
+            "enabled": cache is not None,
+            "counts_dir": str(cache.directory) if cache else None,
+            "max_bytes": cache.max_bytes if cache else None,
+            "idmap_dir": str(idmap_dir),
+        },
         "outputs": {
             "analysis_dir": str(analysis_dir),
             "deseq2_dir": str(deseq2_dir),
+            "normalized_dir": str(deseq2_dir / "normalized"),
+            "pca_dir": str(deseq2_dir / "pca"),
             "plots_dir": str(plots_dir),
             "exports_dir": str(exports_dir),
         },
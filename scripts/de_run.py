@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import dataclasses
 import json
 from re import A
 import sys
@@ -8,14 +9,25 @@ from datetime import datetime
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
 
 from pydeseq2.dds import DeseqDataSet
-from pydeseq2.ds import DeseqStats
 
-from rnaseq_native.io import load_samples_tsv
-from rnaseq_native.counts import load_count_matrix, align_counts_and_samples
+from rnaseq_native.io import load_barcode_map
+from rnaseq_native.cache import CountCacheConfig, cache_config_from_dict
+from rnaseq_native.fingerprint import file_fingerprint
+from rnaseq_native.counts import load_count_matrix_typed
+from rnaseq_native.de_chunks import DEFAULT_CHUNK_SIZE, ChunkedInference
+from rnaseq_native.genesets import GeneSetCollection, load_gene_sets
+from rnaseq_native.idmap import DEFAULT_IDMAP_DIR, StrgTairIndex, load_id_index
+from rnaseq_native.de import normalize_contrasts, run_contrasts, summarize_results
+from rnaseq_native.matrix import CountMatrix
+from rnaseq_native.normalize import load_normalized
+from rnaseq_native.ora import ora_from_results
+from rnaseq_native.pca import DEFAULT_N_COMPONENTS, DEFAULT_N_TOP, load_pca, render_pca_plots
+from rnaseq_native.plots import contrast_jobs, plot_options_from_dict, render_jobs
+from rnaseq_native.samples import SampleRegistry
+from rnaseq_native.screen import screen_contrasts
+from rnaseq_native.sparse import SparseCountMatrix, load_pseudobulk
 
 
 def export_gsea_ranked(res_df: pd.DataFrame, exports_dir: Path) -> None:
@@ -56,93 +68,100 @@ def export_gsea_ranked(res_df: pd.DataFrame, exports_dir: Path) -> None:
     print(f"Wrote: {rnk_path}")
 
 
-def plot_volcano(res_df: pd.DataFrame, outpath: Path, alpha: float = 0.05) -> None:
-    df = res_df.copy()
-    df = df.dropna(subset=["log2FoldChange", "pvalue"]).copy()
+def option_value(argv: list[str], name: str) -> str | None:
+    if name not in argv:
+        return None
+    i = argv.index(name)
+    if i + 1 >= len(argv):
+        raise ValueError(f"{name} requires a value")
+    return argv[i + 1]
+
+
+def write_contrast_outputs(
+    res_df: pd.DataFrame,
+    outdir: Path,
+    plots_dir: Path,
+    exports_dir: Path,
+    alpha: float = 0.05,
+    id_index: StrgTairIndex | None = None,
+    ora_sets: GeneSetCollection | None = None,
+    ora_cfg: dict | None = None,
+) -> dict:
+    outdir.mkdir(parents=True, exist_ok=True)
 
-    x = df["log2FoldChange"].astype(float)
-    y = -np.log10(df["pvalue"].astype(float).clip(lower=1e-300))
+    if id_index is not None:
+        # One array lookup adds the TAIR gene to every result table below
+        res_df = id_index.annotate(res_df)
 
-    plt.figure()
-    plt.scatter(x, y, s=8, alpha=0.6)
-    plt.axhline(-np.log10(alpha), linestyle="--")
-    plt.xlabel("log2FoldChange")
-    plt.ylabel("-log10(pvalue)")
-    plt.title("Volcano plot")
-    outpath.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=200)
-    plt.close()
-    print(f"Wrote: {outpath}")
+    export_gsea_ranked(res_df, exports_dir)
 
+    # ---- summary report(quick sanity + insigt) ----
+    counts = summarize_results(res_df)
 
-def plot_ma(res_df: pd.DataFrame, outpath: Path) -> None:
-    df = res_df.copy()
-    # DESeq2 results usually have baseMean; if missing, we skip MA.
-    if "baseMean" not in df.columns:
-        print("MA plot skipped: baseMean column not found.")
-        return
-
-    df = df.dropna(subset=["baseMean", "log2FoldChange"]).copy()
-    x = np.log10(df["baseMean"].astype(float) + 1.0)
-    y = df["log2FoldChange"].astype(float)
-
-    plt.figure()
-    plt.scatter(x, y, s=8, alpha=0.6)
-    plt.axhline(0.0, linestyle="--")
-    plt.xlabel("log10(baseMean + 1)")
-    plt.ylabel("log2FoldChange")
-    plt.title("MA plot")
-    outpath.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=200)
-    plt.close()
-    print(f"Wrote: {outpath}")
-
-
-def get_normed_counts(dds, fallback_counts_t: pd.DataFrame) -> np.ndarray:
-    # Try common PyDESeq2 attributes first.
-    for attr in ["normed_counts", "normalized_counts"]:
-        if hasattr(dds, attr):
-            mat = getattr(dds, attr)
-            try:
-                return np.asarray(mat)
-            except Exception:
-                pass
-
-    # Last resort: use the counts matrix passed from main (samples x genes).
-    return np.asarray(fallback_counts_t)
-
-
-def plot_pca(dds, coldata: pd.DataFrame, fallback_counts_t: pd.DataFrame, outpath: Path) -> None:
-    X = get_normed_counts(dds, fallback_counts_t)  # samples x genes
-    X = np.log1p(X)
-
-    pca = PCA(n_components=2)
-    coords = pca.fit_transform(X)
-
-    plt.figure()
-    plt.scatter(coords[:, 0], coords[:, 1], s=40, alpha=0.8)
-
-    # Label points with sample names (index of coldata)
-    for i, name in enumerate(coldata.index.tolist()):
-        plt.text(coords[i, 0], coords[i, 1], name, fontsize=8)
-
-    plt.xlabel(f"PC1 ({pca.explained_variance_ratio_[0]*100:.1f}%)")
-    plt.ylabel(f"PC2 ({pca.explained_variance_ratio_[1]*100:.1f}%)")
-    plt.title("PCA (log1p normalized counts)")
-    outpath.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(outpath, dpi=200)
-    plt.close()
-    print(f"Wrote: {outpath}")
+    print("\nDE SUMMARY")
+    print(f"genes total: {counts['genes_total']}")
+    print(f"genes pvalue NaN: {counts['pvalue_nan']}")
+    print(f"padj NaN: {counts['padj_nan']}")
+    print(f"pvalue < 0.05: {counts['pvalue_lt_005']}")
+    print(f"padj < 0.05: {counts['padj_lt_005']}")
 
+    top_p = res_df.dropna(subset=["pvalue"]).sort_values("pvalue").head(10)
+    print("\nTop 10 genes by p-value:")
+    print(top_p[["log2FoldChange", "pvalue", "padj"]])
+
+    top_p_path = outdir / "top_10_by_pvalue.csv"
+    top_p.to_csv(top_p_path)
+    print(f"Wrote {top_p_path}")
+
+    top_lfc = res_df.dropna(subset=["log2FoldChange"]).assign(
+        abs_lfc=lambda d: d["log2FoldChange"].abs()
+    ).sort_values("abs_lfc", ascending=False).head(10)
+
+    print("\nTop 10 genes by |log2FoldChange|:")
+    print(top_lfc[["log2FoldChange", "pvalue", "padj"]])
+
+    top_lfc_path = outdir / "top_10_by_lfc.csv"
+    top_lfc.to_csv(top_lfc_path)
+    print(f"Wrote: {top_lfc_path}")
+
+
+    print("Stats finished")
+    print(res_df.head())
+
+    all_path = outdir / "deseq2_all_results.csv"
+    res_df.to_csv(all_path)
+    print(f"Wrote: {all_path}")
+
+    sig = res_df.dropna(subset=["padj"]).query("padj < @alpha").copy()
+    sig_path = outdir / "deseq2_significant_results.csv"
+    sig.to_csv(sig_path)
+    print(f"Wrote: {sig_path} (n={sig.shape[0]})")
+
+    if ora_sets is not None:
+        ora_df = ora_from_results(
+            res_df,
+            ora_sets,
+            alpha=alpha,
+            min_size=int((ora_cfg or {}).get("min_size", 1)),
+            max_size=(ora_cfg or {}).get("max_size"),
+        )
+        ora_path = outdir / "ora_results.csv"
+        ora_df.to_csv(ora_path, index=False)
+        print("\nTop 5 over-represented gene sets:")
+        print(ora_df[["Term", "Overlap", "Size", "pvalue", "padj"]].head(5))
+        print(f"Wrote: {ora_path} ({len(ora_df)} gene sets)")
+
+    return counts
 
 
 def main(argv: list[str]) -> int:
-    plan_path = Path(argv[1]) if len(argv) > 1 else Path(
+    plan_path = Path(argv[1]) if len(argv) > 1 and not argv[1].startswith("--") else Path(
         "results/analysis/de_plan.json")
 
+    # Optional overrides (used by de_batch.py): --n-cpus N, --cache-dir DIR
+    n_cpus = option_value(argv, "--n-cpus")
+    cache_dir = option_value(argv, "--cache-dir")
+
     plan = json.loads(plan_path.read_text(encoding="utf-8"))
 
     # --- outputs from plan---
@@ -162,22 +181,56 @@ def main(argv: list[str]) -> int:
     counts_path = Path(plan["inputs"]["counts_csv"])
     samples_path = Path(plan["inputs"]["samples_tsv"])
 
-    samples_df = load_samples_tsv(samples_path, require_fastq=False)
-    counts_df = load_count_matrix(counts_path)
+    registry = SampleRegistry.load(samples_path, require_fastq=False)
+    samples_df = registry.frame
+    # Counts are held once, sample-major (memory-mapped from the cache if enabled)
+    cache = cache_config_from_dict(plan.get("cache"), plan_path.parent)
+    if cache_dir is not None:
+        # Only the location changes; max_bytes and the rest come from the plan
+        cache = (CountCacheConfig(directory=Path(cache_dir)) if cache is None
+                 else dataclasses.replace(cache, directory=Path(cache_dir)))
+    counts_format = plan["inputs"].get("counts_format", "dense")
+    barcodes_path = plan["inputs"].get("barcodes_tsv")
+    if barcodes_path:
+        # Cell/replicate-level columns are summed to samples while streaming
+        counts = load_pseudobulk(counts_path, counts_format, load_barcode_map(barcodes_path),
+                                 samples_df["sample"].tolist())
+    elif counts_format != "dense":
+        # Filter on the sparse block, then densify only the kept genes
+        sparse = SparseCountMatrix.load(counts_path, counts_format)
+        sparse.validate()
+        sparse = sparse.filter_min_total(min_total)
+        # Without a barcode table every column must be a sheet sample
+        codes = registry.positions(sparse.columns, missing_ok=True)
+        if (codes < 0).any():
+            unknown = [c for c, i in zip(sparse.columns, codes) if i < 0]
+            raise ValueError(
+                f"Sparse count columns are not samples in samples.tsv: {unknown[:10]}. "
+                "Set inputs.barcodes in config.yaml to sum cells/replicates to samples.")
+        empty = [s for s, n in zip(registry.samples, np.bincount(codes, minlength=len(registry))) if n == 0]
+        if empty:
+            raise ValueError(f"No count matrix columns for samples: {empty}")
+        counts = sparse.pseudobulk_codes(codes, registry.samples)
+    elif cache is not None:
+        counts = CountMatrix.from_cache(counts_path, cache)
+    else:
+        counts = CountMatrix.from_frame(load_count_matrix_typed(counts_path))
 
-    counts_df, samples_df = align_counts_and_samples(counts_df, samples_df)
+    # Sheet rows in count-column order (one index lookup, no reordered copy)
+    perm = registry.align(counts.samples)
 
     print("Loaded and aligned inputs for DE")
 
-    # Prepare PyDESeq2 inputs
-    counts_only = counts_df.set_index("Geneid").astype(int)
-
-    # Filter low-count genes before DE
-    keep = counts_only.sum(axis=1) >= min_total
-    counts_only = counts_only.loc[keep]
+    # Filter low-count genes before DE (index view, no copy); the sparse
+    # sample-level path has already filtered before densifying
+    if barcodes_path or counts_format == "dense":
+        counts = counts.filter_min_total(min_total)
 
     # Build metadata with tree + condition
-    coldata = samples_df.set_index("sample")[["tree", "condition"]].copy()
+    coldata = pd.DataFrame(
+        {"tree": registry.column("tree", perm), "condition": registry.column("condition", perm)},
+        index=pd.Index(registry.column("sample", perm), name="sample"),
+    )
 
     coldata["tree"] = pd.Categorical(coldata["tree"])
     coldata["condition"] = pd.Categorical(
@@ -187,41 +240,114 @@ def main(argv: list[str]) -> int:
     print("Tree categories:", coldata["tree"].cat.categories)
 
     print("Prepared PyDESeq2 inputs")
-    print(f"counts_only shape: {counts_only.shape}")
+    print(f"counts shape (samples x genes): ({counts.n_samples}, {counts.n_genes})")
     print(f"coldata shape: {coldata.shape}")
 
-    dds = DeseqDataSet(
-        counts=counts_only.T,
-        metadata=coldata,
-        design=design,
-    )
-
-    print("DeseqDataSet created")
+    execution = plan.get("execution", {})
+    contrasts = normalize_contrasts(contrast)
 
-    print("Running DESeq2...")
-    dds.deseq2()
-    print("DESeq2 finished")
-
-    print("Computing DE statistics...")
-
-    stat_res = DeseqStats(dds, contrast=contrast)
-    stat_res.summary()
-    res_df = stat_res.results_df
+    if execution.get("mode", "deseq2") == "screen":
+        # Quick voom/limma-style ranking: one batched fit, no PyDESeq2
+        print("Running DE screen (voom + moderated t)...")
+        counts_t = counts.to_array()
+        results = screen_contrasts(counts_t, counts.kept_genes, coldata, design, contrasts)
+        print("DE screen finished")
+    else:
+        # Kept genes are gathered once here; DeseqDataSet makes the only other copy
+        adata = counts.to_anndata(coldata)
+        counts_t = adata.X
+        if n_cpus is None:
+            n_cpus = execution.get("n_cpus")
+        n_cpus = int(n_cpus) if n_cpus is not None else None
+
+        # fit: chunked keeps the global steps here and splits per-gene fits into gene chunks
+        inference = None
+        if execution.get("fit", "default") == "chunked":
+            inference = ChunkedInference(
+                n_cpus=n_cpus, chunk_size=int(execution.get("chunk_size", DEFAULT_CHUNK_SIZE)))
+        dds = DeseqDataSet(
+            adata=adata,
+            design=design,
+            n_cpus=n_cpus,
+            inference=inference,
+        )
+
+        print("DeseqDataSet created")
+
+        print("Running DESeq2...")
+        try:
+            dds.deseq2()
+        finally:
+            if inference is not None:
+                inference.close()
+        print("DESeq2 finished")
+
+        print("Computing DE statistics...")
+
+        n_workers = int(execution.get("n_workers", 1))
+        results = run_contrasts(dds, contrasts, alpha=alpha, n_workers=n_workers)
 
     exports_dir = Path(plan["outputs"].get(
         "exports_dir", str(analysis_dir.parent / "exports")))
-    export_gsea_ranked(res_df, exports_dir)
-
-    plot_volcano(res_df, plots_dir / "volcano.png", alpha=alpha)
-    plot_ma(res_df, plots_dir / "ma.png")
-    plot_pca(dds, coldata, counts_only.T, plots_dir / "pca.png")
 
-    # ---- summary report(quick sanity + insigt) ----
-    n_total = int(res_df.shape[0])
-    n_p_nan = int(res_df["pvalue"].isna().sum())
-    n_padj_nan = int(res_df["padj"].isna().sum())
-    n_p_lt_005 = int((res_df["pvalue"] < 0.05).sum(skipna=True))
-    n_padj_lt_005 = int((res_df["padj"] < 0.05).sum(skipna=True))
+    # Size factors + VST are stored next to the results and reused while the inputs match
+    normalized_dir = Path(plan["outputs"].get("normalized_dir", str(outdir / "normalized")))
+    norm_key = {
+        "counts": file_fingerprint(counts_path),
+        "counts_format": counts_format,
+        "barcodes": file_fingerprint(barcodes_path) if barcodes_path else None,
+        "min_total_count": min_total,
+    }
+    norm = load_normalized(normalized_dir, counts_t, counts.kept_genes, coldata.index.tolist(), norm_key)
+    print(f"Normalized counts + VST: {normalized_dir}")
+
+    # PCA scores/loadings are cached next to the normalized counts; plots render from the cache
+    pca_cfg = plan.get("pca") or {}
+    pca = load_pca(
+        Path(plan["outputs"].get("pca_dir", str(outdir / "pca"))),
+        norm.vst, norm.genes, norm.samples,
+        key={"normalized": norm.meta["key"], "vst_trend": norm.meta["vst_trend"]},
+        n_top=int(pca_cfg.get("n_top", DEFAULT_N_TOP)),
+        n_components=int(pca_cfg.get("n_components", DEFAULT_N_COMPONENTS)),
+    )
+    for path in render_pca_plots(pca, coldata, plots_dir,
+                                 color_by=pca_cfg.get("color_by", ["tree", "condition"])):
+        print(f"Wrote: {path}")
+
+    annotation_path = plan["inputs"].get("annotation_csv")
+    id_index = None
+    if annotation_path:
+        idmap_dir = (plan.get("cache") or {}).get("idmap_dir") or DEFAULT_IDMAP_DIR
+        id_index = load_id_index(annotation_path, idmap_dir)
+        print(f"Loaded STRG -> TAIR index: {len(id_index)} keys")
+
+    # Optional ORA: the compiled gene sets are loaded once for all contrasts
+    ora_cfg = (plan.get("enrichment") or {}).get("ora")
+    ora_sets = load_gene_sets(ora_cfg["gene_sets"]) if ora_cfg else None
+
+    # A single contrast keeps the flat layout; several get one folder each
+    multi = len(results) > 1
+    summaries: dict[str, dict] = {}
+    plot_jobs = []
+    for label, res_df in results.items():
+        sub = Path(label) if multi else Path()
+        plot_jobs += contrast_jobs(res_df, plots_dir / sub, alpha=alpha)
+        if multi:
+            print(f"\n=== Contrast: {label} ===")
+        summaries[label] = write_contrast_outputs(
+            res_df,
+            outdir / sub,
+            plots_dir / sub,
+            exports_dir / sub,
+            alpha=alpha,
+            id_index=id_index,
+            ora_sets=ora_sets,
+            ora_cfg=ora_cfg,
+        )
+
+    # Volcano/MA plots of every contrast, rendered together (density + highlighted points)
+    for path in render_jobs(plot_jobs, plot_options_from_dict(plan.get("plots"))):
+        print(f"Wrote: {path}")
 
     summary_path = outdir / "deseq2_summary.json"
 
@@ -231,59 +357,19 @@ def main(argv: list[str]) -> int:
         "inputs": plan["inputs"],
         "design": plan["design"],
         "dataset": plan["dataset"],
-        "summary": {
-            "genes_total": n_total,
-            "pvalue_nan": n_p_nan,
-            "padj_nan": n_padj_nan,
-            "pvalue_lt_005": n_p_lt_005,
-            "padj_lt_005": n_padj_lt_005,
-        },
     }
+    if multi:
+        summary["contrasts"] = {
+            label: {"outdir": str(outdir / label), "summary": s}
+            for label, s in summaries.items()
+        }
+    else:
+        summary["summary"] = next(iter(summaries.values()))
     summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
     print(f"Wrote: {summary_path}")
 
-    print("\nDE SUMMARY")
-    print(f"genes total: {n_total}")
-    print(f"genes pvalue NaN: {n_p_nan}")
-    print(f"padj NaN: {n_padj_nan}")
-    print(f"pvalue < 0.05: {n_p_lt_005}")
-    print(f"padj < 0.05: {n_padj_lt_005}")
-
-    top_p = res_df.dropna(subset=["pvalue"]).sort_values("pvalue").head(10)
-    print("\nTop 10 genes by p-value:")
-    print(top_p[["log2FoldChange", "pvalue", "padj"]])
-
-    top_p_path = outdir / "top_10_by_pvalue.csv"
-    top_p.to_csv(top_p_path)
-    print(f"Wrote {top_p_path}")
-
-    top_lfc = res_df.dropna(subset=["log2FoldChange"]).assign(
-        abs_lfc=lambda d: d["log2FoldChange"].abs()
-    ).sort_values("abs_lfc", ascending=False).head(10)
-
-    print("\nTop 10 genes by |log2FoldChange|:")
-    print(top_lfc[["log2FoldChange", "pvalue", "padj"]])
-
-    top_lfc_path = outdir / "top_10_by_lfc.csv"
-    top_lfc.to_csv(top_lfc_path)
-    print(f"Wrote: {top_lfc_path}")
-
-
-    print("Stats finished")
-    print(res_df.head())
-
-    all_path = outdir / "deseq2_all_results.csv"
-    res_df.to_csv(all_path)
-    print(f"Wrote: {all_path}")
-
-    sig = res_df.dropna(subset=["padj"]).query("padj < @alpha").copy()
-    sig_path = outdir / "deseq2_significant_results.csv"
-    sig.to_csv(sig_path)
-    print(f"Wrote: {sig_path} (n={sig.shape[0]})")
-
-
     print(f"Loaded plan: {plan_path}")
-    print(f"Mode: {plan['mode']}")
+    print(f"Mode: {plan['mode']} ({plan.get('execution', {}).get('mode', 'deseq2')})")
     print(f"Counts: {plan['inputs']['counts_csv']}")
     print(f"Samples: {plan['inputs']['samples_tsv']}")
     print(f"Design formula: {plan['design']['formula']}")
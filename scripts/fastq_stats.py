@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+from rnaseq_native.config import load_config_yaml
+from rnaseq_native.fastq import DEFAULT_BLOCK_BYTES, fastq_stats_many, write_fastq_stats
+from rnaseq_native.samples import SampleRegistry
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 2:
+        print("Usage: python scripts/fastq_stats.py <config/config.yaml> [--split file|block]")
+        return 2
+
+    cfg_path = Path(argv[1])
+    cfg = load_config_yaml(cfg_path)
+
+    samples_tsv = cfg.get("samples_tsv")
+    if not samples_tsv:
+        raise ValueError("Config must contain 'samples_tsv'.")
+    samples_path = (cfg_path.parent / samples_tsv).resolve()
+    df = SampleRegistry.load(samples_path, strict_path=bool(cfg.get("strict_path", False))).frame
+
+    qc_cfg = cfg.get("qc", {})
+    native_cfg = qc_cfg.get("native", {})
+    outdir = Path(qc_cfg.get("outdir", "results/qc")) / "native"
+    n_jobs = int(native_cfg.get("n_jobs", os.cpu_count() or 1))
+    split = native_cfg.get("split", "file")
+    if "--split" in argv[2:-1]:
+        split = argv[argv.index("--split") + 1]
+    block_bytes = int(float(native_cfg.get("block_mb", DEFAULT_BLOCK_BYTES / 1024**2)) * 1024**2)
+
+    paths = [p for _, row in df.iterrows() for p in (row["r1"], row["r2"])]
+    stats = fastq_stats_many(paths, n_jobs=n_jobs, split=split, block_bytes=block_bytes)
+
+    n_bad = 0
+    for i, (_, row) in enumerate(df.iterrows()):
+        s1, s2 = stats[2 * i], stats[2 * i + 1]
+        out = write_fastq_stats({"r1": s1, "r2": s2}, outdir / f"{row['sample']}.fastq_stats.json")
+        note = ""
+        if s1.n_reads != s2.n_reads:
+            note = " | R1/R2 read counts differ"
+            n_bad += 1
+        print(f"{row['sample']}: reads {s1.n_reads} | GC {s1.gc_content:.3f}/{s2.gc_content:.3f} "
+              f"| Q30 {s1.q30_rate:.3f}/{s2.q30_rate:.3f} | N {s1.n_rate:.4f}/{s2.n_rate:.4f}{note}")
+        print(f"  Wrote: {out}")
+
+    return 1 if n_bad else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -1,49 +1,55 @@
-from pathlib import Path
-from collections import OrderedDict
+"""
+Clean a GO GMT file and compile it for the enrichment stages.
+
+Run:
+    python scripts/fix_go_gmt.py [in.gmt] [out.gmt] [--min-size N] [--max-size N]
 
-in_file = Path("data/gene_sets/GO_BP_Arabidopsis.gmt")
-out_file = Path("data/gene_sets/GO_BP_Arabidopsis_fixed.gmt")
+Writes the fixed GMT (unique upper-case genes per term, one line per term)
+and a compiled .npz next to it (see rnaseq_native.genesets).
+"""
 
-gene_sets = OrderedDict()
-descriptions = {}
+from __future__ import annotations
+
+import sys
+from pathlib import Path
 
-with in_file.open("r", encoding="utf-8", errors="ignore") as f:
-    for raw_line in f:
-        line = raw_line.strip()
-        if not line:
-            continue
+from rnaseq_native.genesets import COMPILED_SUFFIX, compile_gmt, parse_gmt
 
-        parts = line.split("\t")
 
-        # Expecting: TERM, DESCRIPTION_FIELD, GENE
-        if len(parts) != 3:
-            continue
+def option_value(argv: list[str], name: str) -> str | None:
+    if name not in argv:
+        return None
+    i = argv.index(name)
+    if i + 1 >= len(argv):
+        raise ValueError(f"{name} requires a value")
+    return argv[i + 1]
 
-        term = parts[0].strip()
-        desc = parts[1].strip()
-        gene_block = parts[2].strip()
 
-        genes = [g.strip().upper() for g in gene_block.split(",") if g.strip()]
+def main(argv: list[str]) -> int:
+    min_size = option_value(argv, "--min-size")
+    max_size = option_value(argv, "--max-size")
+    positional = [a for i, a in enumerate(argv[1:], start=1)
+                  if not a.startswith("--") and not argv[i - 1].startswith("--")]
 
-        if term not in gene_sets:
-            gene_sets[term] = []
-            descriptions[term] = desc
+    in_file = Path(positional[0]) if positional else Path("data/gene_sets/GO_BP_Arabidopsis.gmt")
+    out_file = Path(positional[1]) if len(positional) > 1 else Path(
+        "data/gene_sets/GO_BP_Arabidopsis_fixed.gmt")
 
-        for gene in genes:
-            if gene not in gene_sets[term]:
-                gene_sets[term].append(gene)
+    min_size = int(min_size) if min_size is not None else 1
+    max_size = int(max_size) if max_size is not None else None
+    parse_gmt(in_file).filter_size(min_size, max_size).write_gmt(out_file)
+    # The size filters live in the fixed GMT itself; its compile is what
+    # load_gene_sets(out_file) reuses, whatever filters the caller passes
+    gene_sets = compile_gmt(out_file)
 
+    print("Fixed GMT written to:")
+    print(out_file)
+    print("Compiled gene sets written to:")
+    print(out_file.with_suffix(COMPILED_SUFFIX))
+    print("Total gene sets:", len(gene_sets))
+    print("Genes:", len(gene_sets.genes))
+    return 0
 
-with out_file.open("w", encoding="utf-8") as f:
-    kept = 0
-    for term, genes in gene_sets.items():
-        if not genes:
-            continue
-        desc = descriptions[term]
-        line = "\t".join([term, desc] + genes)
-        f.write(line + "\n")
-        kept += 1
 
-print("Fixed GMT written to:")
-print(out_file)
-print("Total gene sets:", kept)
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
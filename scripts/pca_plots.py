@@ -0,0 +1,43 @@
+"""
+Re-render the PCA plots from the cache written by de_run.py (no recomputation).
+
+Run:
+    python scripts/pca_plots.py [results/analysis/de_plan.json] [--color-by tree,condition]
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+from rnaseq_native.pca import PcaResult, render_pca_plots
+from rnaseq_native.samples import SampleRegistry
+
+
+def main(argv: list[str]) -> int:
+    plan_path = Path(argv[1]) if len(argv) > 1 and not argv[1].startswith("--") else Path(
+        "results/analysis/de_plan.json")
+    plan = json.loads(plan_path.read_text(encoding="utf-8"))
+
+    color_by = (plan.get("pca") or {}).get("color_by", ["tree", "condition"])
+    if "--color-by" in argv:
+        i = argv.index("--color-by")
+        if i + 1 >= len(argv):
+            raise ValueError("--color-by requires a value")
+        color_by = [c for c in argv[i + 1].split(",") if c]
+
+    outputs = plan["outputs"]
+    pca_dir = Path(outputs.get("pca_dir", str(Path(outputs["deseq2_dir"]) / "pca")))
+    result = PcaResult.load(pca_dir)
+
+    registry = SampleRegistry.load(Path(plan["inputs"]["samples_tsv"]), require_fastq=False)
+    metadata = registry.frame.set_index("sample")
+
+    for path in render_pca_plots(result, metadata, Path(outputs["plots_dir"]), color_by=color_by):
+        print(f"Wrote: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -24,7 +24,7 @@ def main(argv: list[str]) -> int:
 
     # Import AFTER sys.path fix (and inside main so VSCode won't move it)
     from rnaseq_native.config import load_config_yaml
-    from rnaseq_native.io import load_samples_tsv
+    from rnaseq_native.samples import SampleRegistry
 
     target = Path(argv[1])
     strict_override = "--strict" in argv[2:]
@@ -49,14 +49,16 @@ def main(argv: list[str]) -> int:
         samples_path = target
         strict = strict_override
 
-    df = load_samples_tsv(samples_path, strict_path=strict)
+    registry = SampleRegistry.load(samples_path, strict_path=strict)
+    df = registry.frame
 
     print(f"Samples file: {samples_path}")
     print(f"Rows: {len(df)}")
-    print(f"Conditions: {sorted(df['condition'].unique().tolist())}")
-    print(f"Trees: {sorted(df['tree'].unique().tolist())}")
+    print(f"Conditions: {registry.levels['condition']}")
+    print(f"Trees: {registry.levels['tree']}")
     print("\nCounts per condition:")
-    print(df["condition"].value_counts().to_string())
+    for level, rows in registry.groups("condition").items():
+        print(f"{level}\t{len(rows)}")
 
     print("\nSamples:")
     for s in df["sample"].tolist():
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from rnaseq_native.config import load_config_yaml
+from rnaseq_native.qc_report import (
+    DEFAULT_OUTLIER_Z,
+    find_fastp_reports,
+    flag_outliers,
+    load_fastp_reports,
+    write_qc_table,
+)
+from rnaseq_native.samples import SampleRegistry
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 2:
+        print("Usage: python scripts/qc_report.py <config/config.yaml>")
+        return 2
+
+    cfg_path = Path(argv[1])
+    cfg = load_config_yaml(cfg_path)
+
+    qc_cfg = cfg.get("qc", {})
+    outdir = Path(qc_cfg.get("outdir", "results/qc"))
+    report_cfg = qc_cfg.get("report", {})
+    n_jobs = int(report_cfg.get("n_jobs", os.cpu_count() or 1))
+    z = float(report_cfg.get("outlier_z", DEFAULT_OUTLIER_Z))
+
+    reports = find_fastp_reports(outdir)
+    if not reports:
+        print(f"No fastp JSON reports in {outdir}")
+        return 1
+
+    table = flag_outliers(load_fastp_reports(reports, n_jobs=n_jobs), z=z)
+
+    # Label rows with tree/condition from the sample sheet, if there is one
+    samples_tsv = cfg.get("samples_tsv")
+    if samples_tsv:
+        registry = SampleRegistry.load(cfg_path.parent / samples_tsv, require_fastq=False)
+        pos = registry.positions(table["sample"], missing_ok=True)
+        for col in ("condition", "tree"):
+            values = registry.column(col)[np.maximum(pos, 0)]
+            table.insert(1, col, np.where(pos >= 0, values, ""))
+    tsv, npz = write_qc_table(table, outdir)
+
+    print(f"Samples: {len(table)} | outliers: {int(table['outlier'].sum())}")
+    for _, row in table[table["outlier"]].iterrows():
+        print(f"  {row['sample']}: {row['outlier_reasons']}")
+    print(f"Wrote: {tsv}")
+    print(f"Wrote: {npz}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+import shutil
 import sys
 from pathlib import Path
 
 from rnaseq_native.config import load_config_yaml
-from rnaseq_native.io import load_samples_tsv
-from rnaseq_native.qc import FastpQCConfig, fastp_command
-from rnaseq_native.run import RunOptions, run_commands
+from rnaseq_native.qc import QC_MANIFEST, FastpQCConfig, QCManifest, fastp_command
+from rnaseq_native.run import CommandResult, RunFailed, RunOptions, run_commands
+from rnaseq_native.samples import SampleRegistry
 
 
 def main(argv: list[str]) -> int:
@@ -16,6 +17,7 @@ def main(argv: list[str]) -> int:
 
     cfg_path = Path(argv[1])
     do_run = "--run" in argv[2:]  # default is dry-run
+    force = "--force" in argv[2:]  # ignore the QC manifest and rerun every sample
 
     cfg = load_config_yaml(cfg_path)
 
@@ -25,28 +27,72 @@ def main(argv: list[str]) -> int:
 
     samples_path = (cfg_path.parent / samples_tsv).resolve()
     strict = bool(cfg.get("strict_path", False))
-    df = load_samples_tsv(samples_path, strict_path=strict)
+    df = SampleRegistry.load(samples_path, strict_path=strict).frame
 
     qc_cfg = cfg.get("qc", {})
     outdir = qc_cfg.get("outdir", "results/qc")
 
     fastp_cfg = qc_cfg.get("fastp", {})
     threads = int(fastp_cfg.get("threads", 4))
+    # Total fastp -w threads allowed at once (default: all cores)
+    max_threads = qc_cfg.get("max_threads")
+
+    # Incremental mode: skip samples whose inputs, params and outputs are unchanged
+    incremental = bool(qc_cfg.get("incremental", True)) and not force
+    manifest = QCManifest(Path(outdir) / QC_MANIFEST, checksum=bool(qc_cfg.get("checksum", False)))
 
     cmds: list[list[str]] = []
+    rows: dict[str, tuple[str, str]] = {}
+    n_skipped = 0
 
     for _, row in df.iterrows():
-        cmds.append(
-            fastp_command(
-                sample=row["sample"],
-                r1=row["r1"],
-                r2=row["r2"],
-                outdir=outdir,
-                cfg=FastpQCConfig(threads=threads),
-            )
+        cmd = fastp_command(
+            sample=row["sample"],
+            r1=row["r1"],
+            r2=row["r2"],
+            outdir=outdir,
+            cfg=FastpQCConfig(threads=threads),
         )
-    run_commands(cmds, RunOptions(dry_run=not do_run))
-    return 0
+        if incremental and manifest.is_current(row["sample"], row["r1"], row["r2"], cmd, outdir):
+            n_skipped += 1
+            continue
+        cmds.append(cmd)
+        rows[row["sample"]] = (row["r1"], row["r2"])
+
+    print(f"Samples up to date: {n_skipped} | to run: {len(cmds)}")
+
+    if do_run and cmds and shutil.which("fastp") is None:
+        print("fastp not found on PATH; run scripts/fastq_stats.py for read QC without it.")
+        return 2
+
+    def record(result: CommandResult) -> None:
+        # Save after every sample so an interrupted run resumes from here
+        r1, r2 = rows[result.name]
+        if result.ok:
+            manifest.record(result.name, r1, r2, result.cmd, outdir)
+        else:
+            manifest.forget(result.name)
+        manifest.save()
+    opts = RunOptions(
+        dry_run=not do_run,
+        thread_budget=int(max_threads) if max_threads else None,
+        log_dir=Path(outdir) / "logs",
+    )
+    try:
+        results = run_commands(cmds, opts, names=list(rows), on_complete=record)
+    except RunFailed as e:
+        results = e.results
+        print(f"fastp failed (exit {e.returncode}); remaining samples cancelled.")
+
+    if not do_run:
+        return 0
+
+    for r in results:
+        status = "not run" if r.returncode is None else f"exit {r.returncode}"
+        cpu = f"{r.cpu_s:.1f}s" if r.cpu_s is not None else "n/a"
+        print(f"{r.name}: {status}, wall {r.wall_s:.1f}s, cpu {cpu}, log {r.stderr_log}")
+
+    return 0 if all(r.ok for r in results) else 1
 
 
 if __name__ == "__main__":
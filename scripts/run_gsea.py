@@ -1,39 +1,66 @@
+"""
+Preranked GSEA for every ranked list x gene-set library in config.yaml (`gsea:`).
+
+Run:
+    python scripts/run_gsea.py config/config.yaml [--force]
+
+Jobs whose ranked list, library, options and report are unchanged since
+the last run are skipped (results/gsea/gsea_manifest.json); --force reruns all.
+"""
+
+from __future__ import annotations
+
+import sys
 from pathlib import Path
-import gseapy as gp
 
+from rnaseq_native.config import load_config_yaml
+from rnaseq_native.gsea_batch import (
+    GSEA_MANIFEST,
+    GseaJob,
+    GseaJobResult,
+    GseaManifest,
+    gsea_config_from_dict,
+    run_gsea_jobs,
+)
 
-def main() -> None:
-    rnk_file = Path("results/exports/gsea_ranked_genes_TAIR.rnk")
-    gmt_file = Path("data/gene_sets/GO_BP_Arabidopsis_fixed.gmt")
-    outdir = Path("results/gsea/go_bp")
 
-    if not rnk_file.exists():
-        raise FileNotFoundError(f"Ranked file not found: {rnk_file}")
+def main(argv: list[str]) -> int:
+    cfg_path = Path(argv[1]) if len(argv) > 1 and not argv[1].startswith("--") else Path(
+        "config/config.yaml")
+    force = "--force" in argv[1:]
 
-    if not gmt_file.exists():
-        raise FileNotFoundError(f"GMT file not fount: {gmt_file}")
+    cfg = load_config_yaml(cfg_path)
+    # repo root = parent of the config/ folder
+    repo_root = cfg_path.resolve().parents[1]
+    stage = gsea_config_from_dict(cfg.get("gsea"), cfg_path.parent, repo_root)
+    jobs, options, outdir = stage.jobs, stage.options, stage.outdir
+    manifest = GseaManifest(outdir / GSEA_MANIFEST)
 
-    outdir.mkdir(parents=True, exist_ok=True)
+    incremental = stage.incremental and not force
+    todo = [j for j in jobs if not (incremental and manifest.is_current(j, options))]
 
     print(f"Running preranked GSEA")
-    print(f"Ranked file: {rnk_file}")
-    print(f"Gene sets:   {gmt_file}")
+    print(f"Jobs: {len(jobs)} | up to date: {len(jobs) - len(todo)} | to run: {len(todo)}")
+    print(f"Permutations: {options.permutations} | set size: {options.min_size}-{options.max_size}"
+          f" | thread budget: {stage.max_threads}")
     print(f"Output dir:  {outdir}")
 
-    gp.prerank(
-        rnk=str(rnk_file),
-        gene_sets=str(gmt_file),
-        outdir=str(outdir),
-        permutation_num=1000,
-        min_size=10,
-        max_size=500,
-        seed=42,
-        threads=4,
-        verbose=True,
-    )
+    def record(job: GseaJob, result: GseaJobResult) -> None:
+        # Save after every job so an interrupted run resumes from here
+        if result.ok:
+            manifest.record(job, options)
+        else:
+            manifest.forget(job.name)
+        manifest.save()
+        status = "ok" if result.ok else f"FAILED ({result.error})"
+        print(f"{status:>8}  {result.wall_s:8.1f}s  {job.name}  ({result.n_sets} gene sets)")
+
+    results = run_gsea_jobs(todo, options, max_threads=stage.max_threads, on_complete=record)
 
-    print("GSEA finished successfully.")
+    n_failed = sum(not r.ok for r in results)
+    print(f"Finished: {len(results) - n_failed} ok, {n_failed} failed")
+    return 1 if n_failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main(sys.argv))
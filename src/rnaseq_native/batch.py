@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from rnaseq_native.cache import CountCacheConfig, cache_config_from_dict, load_count_block_cached
+
+# Environment variables that cap BLAS / OpenMP / joblib threads in a child process
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "LOKY_MAX_CPU_COUNT",
+)
+
+
+@dataclass(frozen=True)
+class BatchOptions:
+    max_jobs: int = 2
+    threads_per_job: int = 1
+    log_dir: Path = Path("results/batch")
+    cache: CountCacheConfig = field(default_factory=CountCacheConfig)
+
+
+@dataclass(frozen=True)
+class JobResult:
+    plan: str
+    returncode: int
+    wall_s: float
+    log: str
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def discover_plans(target: str | Path) -> list[Path]:
+    """
+    Find DE plans from a directory or a manifest file.
+
+    - directory: every de_plan*.json below it (recursive, sorted)
+    - manifest: one plan path per line (blank lines and # comments ignored),
+      relative paths resolved against the manifest's folder
+    Duplicate plan paths are dropped, keeping the first occurrence.
+    """
+    target = Path(target)
+    if not target.exists():
+        raise FileNotFoundError(f"Plan directory or manifest not found: {target}")
+
+    if target.is_dir():
+        plans = sorted(target.rglob("de_plan*.json"))
+    else:
+        plans = []
+        for line in target.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            p = Path(line)
+            plans.append(p if p.is_absolute() else target.parent / p)
+
+    seen: set[Path] = set()
+    unique: list[Path] = []
+    for p in plans:
+        p = p.resolve()
+        if p not in seen:
+            seen.add(p)
+            unique.append(p)
+
+    missing = [str(p) for p in unique if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing DE plan files: {missing}")
+    return unique
+
+
+def thread_env(threads: int, base: dict[str, str] | None = None) -> dict[str, str]:
+    """Copy of the environment with every thread pool capped at `threads`."""
+    env = dict(os.environ if base is None else base)
+    for var in THREAD_ENV_VARS:
+        env[var] = str(threads)
+    return env
+
+
+def warm_count_cache(
+    plans: list[Path], default: CountCacheConfig
+) -> dict[Path, tuple[CountCacheConfig | None, str | None]]:
+    """
+    Load each distinct (counts file, cache) pair once so DE jobs only map it.
+
+    Plans without a cache section share `default`. Returns
+    {plan path: (cache used, error message or None)}. A counts file that fails
+    to load marks every plan using it as failed, without touching the others.
+    """
+    groups: dict[tuple[Path, CountCacheConfig], list[Path]] = {}
+    status: dict[Path, tuple[CountCacheConfig | None, str | None]] = {}
+    for plan_path in plans:
+        try:
+            plan = json.loads(plan_path.read_text(encoding="utf-8"))
+            counts = Path(plan["inputs"]["counts_csv"]).resolve()
+        except (OSError, ValueError, KeyError) as e:
+            status[plan_path] = (None, f"unreadable plan: {e!r}")
+            continue
+        cache = cache_config_from_dict(plan.get("cache"), plan_path.parent) or default
+        groups.setdefault((counts, cache), []).append(plan_path)
+
+    for (counts, cache), members in groups.items():
+        try:
+            load_count_block_cached(counts, cache)
+            error = None
+        except (OSError, ValueError) as e:
+            error = f"count matrix {counts}: {e}"
+        for p in members:
+            status[p] = (cache, error)
+    return status
+
+
+class _JsonlLog:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, event: str, **fields: Any) -> None:
+        record = {"time": datetime.now().isoformat(timespec="seconds"), "event": event, **fields}
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _run_one(plan_path: Path, de_run_script: Path, opts: BatchOptions,
+             cache: CountCacheConfig, index: int, log: _JsonlLog) -> JobResult:
+    job_log = opts.log_dir / "jobs" / f"{index:03d}_{plan_path.parent.name}_{plan_path.stem}.log"
+    job_log.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        sys.executable, str(de_run_script), str(plan_path),
+        "--n-cpus", str(opts.threads_per_job),
+        "--cache-dir", str(cache.directory),
+    ]
+    log.write("start", plan=str(plan_path), job=index, log=str(job_log))
+
+    start = time.perf_counter()
+    with job_log.open("w", encoding="utf-8") as out:
+        proc = subprocess.run(
+            cmd, stdout=out, stderr=subprocess.STDOUT,
+            env=thread_env(opts.threads_per_job),
+        )
+    wall = time.perf_counter() - start
+
+    result = JobResult(plan=str(plan_path), returncode=proc.returncode,
+                       wall_s=round(wall, 3), log=str(job_log))
+    log.write("end", plan=str(plan_path), job=index,
+              returncode=proc.returncode, wall_s=result.wall_s)
+    return result
+
+
+def run_plans(plans: list[Path], de_run_script: str | Path, opts: BatchOptions) -> list[JobResult]:
+    """
+    Run de_run.py on every plan, at most opts.max_jobs at a time.
+
+    Shared count matrices are parsed once up front (warm_count_cache); each job
+    is a separate process with BLAS/OpenMP/joblib capped at
+    opts.threads_per_job threads. One failing plan does not stop the others.
+    Progress and timings are appended to <log_dir>/batch_log.jsonl.
+
+    Returns one JobResult per plan, in the order of `plans`.
+    """
+    de_run_script = Path(de_run_script)
+    log = _JsonlLog(opts.log_dir / "batch_log.jsonl")
+    log.write("batch_start", n_plans=len(plans), max_jobs=opts.max_jobs,
+              threads_per_job=opts.threads_per_job)
+
+    batch_start = time.perf_counter()
+    status = warm_count_cache(plans, opts.cache)
+    log.write("cache_ready", wall_s=round(time.perf_counter() - batch_start, 3))
+
+    results: dict[Path, JobResult] = {}
+    runnable: list[tuple[int, Path, CountCacheConfig]] = []
+    for i, p in enumerate(plans):
+        cache, error = status[p]
+        if error or cache is None:
+            results[p] = JobResult(plan=str(p), returncode=-1, wall_s=0.0, log="", error=error)
+            log.write("skipped", plan=str(p), job=i, error=error)
+        else:
+            runnable.append((i, p, cache))
+
+    with ThreadPoolExecutor(max_workers=max(1, opts.max_jobs)) as pool:
+        futures = {
+            pool.submit(_run_one, p, de_run_script, opts, cache, i, log): p
+            for i, p, cache in runnable
+        }
+        for fut in as_completed(futures):
+            p = futures[fut]
+            try:
+                results[p] = fut.result()
+            except OSError as e:
+                results[p] = JobResult(plan=str(p), returncode=-1, wall_s=0.0, log="", error=repr(e))
+                log.write("error", plan=str(p), error=repr(e))
+
+    ordered = [results[p] for p in plans]
+    log.write(
+        "batch_end",
+        wall_s=round(time.perf_counter() - batch_start, 3),
+        n_ok=sum(r.ok for r in ordered),
+        n_failed=sum(not r.ok for r in ordered),
+    )
+    return ordered
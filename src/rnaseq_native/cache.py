@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.counts import (
+    DEFAULT_CHUNKSIZE,
+    REQUIRED_GENE_COLUMN,
+    load_count_matrix_typed,
+    validate_count_matrix,
+)
+from rnaseq_native.fingerprint import content_hash, file_fingerprint
+from rnaseq_native.fsutil import atomic_dir, entry_dir
+
+DEFAULT_CACHE_DIR = "results/cache/counts"
+DEFAULT_MAX_BYTES = 5 * 1024**3
+
+VALUES_FILE = "counts.npy"
+GENES_FILE = "genes.npy"
+META_FILE = "meta.json"
+
+
+@dataclass(frozen=True)
+class CountCacheConfig:
+    directory: Path = Path(DEFAULT_CACHE_DIR)
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+
+def cache_config_from_dict(cfg: dict[str, Any] | None, root: str | Path) -> CountCacheConfig | None:
+    """
+    Build a CountCacheConfig from the `cache:` section of config.yaml (or a DE plan).
+
+    Returns None if the section is missing or `enabled: false`.
+    Relative directories are resolved against `root`.
+    """
+    if not cfg or not cfg.get("enabled", True):
+        return None
+    directory = Path(cfg.get("counts_dir", DEFAULT_CACHE_DIR))
+    if not directory.is_absolute():
+        directory = Path(root) / directory
+    if "max_bytes" in cfg:
+        max_bytes = int(cfg["max_bytes"])
+    else:
+        max_bytes = int(float(cfg.get("max_size_gb", DEFAULT_MAX_BYTES / 1024**3)) * 1024**3)
+    return CountCacheConfig(directory=directory.resolve(), max_bytes=max_bytes)
+
+
+def write_count_block(
+    directory: str | Path,
+    values: np.ndarray,
+    genes: np.ndarray,
+    samples: list[str],
+    meta: dict[str, Any] | None = None,
+) -> Path:
+    """
+    Write a (samples x genes) count block as .npy files plus a JSON sidecar.
+
+    The block is stored C-contiguous so each sample is one contiguous row and
+    the file can later be memory-mapped with read_count_block. The directory is
+    written under a temporary name and renamed into place.
+    """
+    directory = Path(directory)
+    if values.shape != (len(samples), len(genes)):
+        raise ValueError(
+            f"Count block shape {values.shape} does not match "
+            f"{len(samples)} samples x {len(genes)} genes")
+
+    with atomic_dir(directory) as tmp:
+        np.save(tmp / VALUES_FILE, np.ascontiguousarray(values))
+        np.save(tmp / GENES_FILE, np.asarray(genes, dtype=str))
+        payload = dict(meta or {})
+        payload.update({
+            "samples": list(samples),
+            "n_genes": int(len(genes)),
+            "dtype": str(values.dtype),
+        })
+        (tmp / META_FILE).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return directory
+
+
+def read_count_block(
+    directory: str | Path, mmap: bool = True
+) -> tuple[np.ndarray, np.ndarray, list[str], dict[str, Any]]:
+    """
+    Read a block written by write_count_block.
+
+    Returns (values, genes, samples, meta). With mmap=True the values are a
+    read-only np.memmap and nothing is parsed or copied.
+    """
+    directory = Path(directory)
+    meta = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+    values = np.load(directory / VALUES_FILE, mmap_mode="r" if mmap else None)
+    genes = np.load(directory / GENES_FILE)
+    return values, genes, list(meta["samples"]), meta
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def _frame_from_block(values: np.ndarray, genes: np.ndarray, samples: list[str]) -> pd.DataFrame:
+    # values.T is a view; pandas keeps the (samples x genes) block as-is
+    df = pd.DataFrame(values.T, columns=samples, copy=False)
+    df.insert(0, REQUIRED_GENE_COLUMN, pd.array(genes.astype(object), dtype="string"))
+    return df
+
+
+def _lookup(path: Path, entry: Path) -> dict[str, Any] | None:
+    meta_path = entry / META_FILE
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    source = meta.get("source", {})
+    fp = file_fingerprint(path)
+    if source.get("size") != fp["size"]:
+        return None
+    if source.get("mtime_ns") == fp["mtime_ns"]:
+        return meta
+    # Same size but touched: only the content hash can tell if it changed
+    if source.get("hash") != content_hash(path):
+        return None
+    meta["source"]["mtime_ns"] = fp["mtime_ns"]
+    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return meta
+
+
+def load_count_block_cached(
+    path: str | Path,
+    cache: CountCacheConfig | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """
+    Return (values, genes, samples) for a count matrix, going through the cache.
+
+    On a hit (same size and mtime, or same content hash) the cached block is
+    memory-mapped without parsing. On a miss the file is parsed with
+    load_count_matrix_typed, validated and written to the cache, and the
+    cache is trimmed to cache.max_bytes, least recently used first. Either
+    way `values` is the read-only (samples x genes) block of the cache entry.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Count matrix file not found: {path}")
+    cache = cache or CountCacheConfig()
+    path = path.resolve()
+    entry = entry_dir(path, cache.directory)
+
+    if _lookup(path, entry) is None:
+        df = load_count_matrix_typed(path, chunksize=chunksize)
+        validate_count_matrix(df)
+
+        samples = list(df.columns[1:])
+        values = df[samples].to_numpy().T
+        genes = df[REQUIRED_GENE_COLUMN].to_numpy(dtype=str)
+        del df
+        source = file_fingerprint(path, checksum=True)
+        source["path"] = str(path)
+
+        cache.directory.mkdir(parents=True, exist_ok=True)
+        write_count_block(entry, values, genes, samples, meta={"source": source})
+        del values
+        evict_count_cache(cache.directory, cache.max_bytes, keep=entry)
+    else:
+        os.utime(entry / META_FILE)
+
+    values, genes, samples, _ = read_count_block(entry)
+    return values, genes, samples
+
+
+def load_count_matrix_cached(
+    path: str | Path,
+    cache: CountCacheConfig | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """
+    Load a count matrix through the binary cache (see load_count_block_cached).
+
+    The returned DataFrame has the same layout as load_count_matrix (Geneid
+    first, then one integer column per sample), backed read-only by the
+    memory-mapped cache block.
+    """
+    values, genes, samples = load_count_block_cached(path, cache, chunksize=chunksize)
+    return _frame_from_block(values, genes, samples)
+
+
+def invalidate_count_cache(path: str | Path, cache: CountCacheConfig | None = None) -> bool:
+    """Remove the cache entry for `path`. Returns True if an entry existed."""
+    cache = cache or CountCacheConfig()
+    entry = entry_dir(Path(path).resolve(), cache.directory)
+    if not entry.exists():
+        return False
+    shutil.rmtree(entry)
+    return True
+
+
+def evict_count_cache(
+    cache_dir: str | Path, max_bytes: int, keep: Path | None = None
+) -> list[Path]:
+    """
+    Delete least recently used entries until the cache fits in max_bytes.
+
+    Recency is the mtime of each entry's meta.json (touched on every hit).
+    `keep` is never evicted, even if it alone exceeds the cap. Entries that
+    cannot be removed (e.g. still mapped on Windows) are skipped.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return []
+
+    entries = []
+    for entry in cache_dir.iterdir():
+        meta = entry / META_FILE
+        if entry.is_dir() and meta.exists():
+            entries.append((meta.stat().st_mtime_ns, _entry_size(entry), entry))
+
+    total = sum(size for _, size, _ in entries)
+    removed: list[Path] = []
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        if keep is not None and entry == keep:
+            continue
+        try:
+            shutil.rmtree(entry)
+        except OSError:
+            continue
+        total -= size
+        removed.append(entry)
+    return removed
@@ -1,9 +1,17 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Mapping, Sequence
+
+import numpy as np
 import pandas as pd
 
+from rnaseq_native.samples import SampleRegistry
+from rnaseq_native.validate import CountValidationReport, check_count_values
+
 REQUIRED_GENE_COLUMN = "Geneid"
+DEFAULT_CHUNKSIZE = 50_000
+MAX_REPORTED_CELLS = 10
 
 
 
@@ -20,18 +28,105 @@ def load_count_matrix(path: str | Path) -> pd.DataFrame:
     if not path.exists():
         raise FileNotFoundError(f"Count matrix file not found: {path}")
 
+    df = pd.read_csv(path, sep=_delimiter(path), dtype=str)
+
+    return df
+
+
+def _delimiter(path: Path) -> str:
     # Choose delimiter from file extension
-    suffix = path.suffix.lower()
-    if suffix == ".csv":
-        df = pd.read_csv(path, dtype=str)
+    # Default to TSV for .tsv/.txt/anything else
+    return "," if path.suffix.lower() == ".csv" else "\t"
+
+
+def _parse_count_chunk(
+    chunk: pd.DataFrame, sample_cols: list[str], row_offset: int
+) -> np.ndarray:
+    """
+    Parse the sample columns of one chunk into a (genes x samples) unsigned block.
+
+    Raises ValueError naming the offending (row, column) cells. Rows are
+    0-based data rows (header excluded), counted across the whole file.
+    """
+    genes = chunk[REQUIRED_GENE_COLUMN].astype(str).to_numpy()
+    values, report = check_count_values(
+        chunk[sample_cols], genes, row_offset=row_offset, max_issues=MAX_REPORTED_CELLS)
+    report.raise_if_invalid()
+
+    # Keep each chunk at the narrowest width; concatenation upcasts if needed
+    if values.size == 0 or values.max() <= np.iinfo(np.uint32).max:
+        return values.astype(np.uint32, order="C")
+    return values.astype(np.uint64, order="C")
+
+
+def load_count_matrix_typed(
+    path: str | Path, chunksize: int = DEFAULT_CHUNKSIZE
+) -> pd.DataFrame:
+    """
+    Load a gene-level count matrix in chunks with compact integer columns.
+
+    Unlike load_count_matrix, the file is never materialised as an all-string
+    frame: each chunk is parsed straight into an unsigned integer block, and
+    only the Geneid column is kept as strings.
+
+    Returns a DataFrame laid out like load_count_matrix (Geneid first, then
+    one column per sample) where the sample columns are uint32, or uint64 if
+    any count does not fit in 32 bits.
+
+    Raises:
+        FileNotFoundError: if the count matrix does not exist
+        ValueError: if the header is invalid, or if any cell is missing,
+            non-numeric, non-integer or negative (with row/column coordinates)
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Count matrix file not found: {path}")
+
+    header = pd.read_csv(path, sep=_delimiter(path), nrows=0).columns
+    if len(header) < 2:
+        raise ValueError(
+            "Count matrix must have at least 2 columns: Geneid + >=1 sample")
+    if header[0] != REQUIRED_GENE_COLUMN:
+        raise ValueError(
+            f"First column must be '{REQUIRED_GENE_COLUMN}', but got '{header[0]}'."
+        )
+    sample_cols = list(header[1:])
+
+    genes: list[np.ndarray] = []
+    blocks: list[np.ndarray] = []
+    n_rows = 0
+
+    reader = pd.read_csv(
+        path,
+        sep=_delimiter(path),
+        dtype={REQUIRED_GENE_COLUMN: str},
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            blocks.append(_parse_count_chunk(chunk, sample_cols, n_rows))
+            genes.append(chunk[REQUIRED_GENE_COLUMN].to_numpy(dtype=object))
+            n_rows += chunk.shape[0]
+
+    if blocks:
+        values = np.concatenate(blocks, axis=0)
+        gene_ids = np.concatenate(genes)
     else:
-        # Default to TSV for .tsv/.txt/anything else
-        df = pd.read_csv(path, sep="\t", dtype=str)
+        values = np.empty((0, len(sample_cols)), dtype=np.uint32)
+        gene_ids = np.empty(0, dtype=object)
+    del blocks
+
+    df = pd.DataFrame(values, columns=sample_cols, copy=False)
+    df.insert(0, REQUIRED_GENE_COLUMN, pd.array(gene_ids, dtype="string"))
 
     return df
 
 
-def validate_count_matrix(df: pd.DataFrame) -> None:
+def validate_count_matrix(
+    df: pd.DataFrame,
+    n_jobs: int = 1,
+    max_issues: int = MAX_REPORTED_CELLS,
+) -> CountValidationReport:
     """
     Validate the count matrix structure and vlues.
     
@@ -40,6 +135,11 @@ def validate_count_matrix(df: pd.DataFrame) -> None:
       - Gene IDs must be non-empty and unique
       - Sample columns must be numeric, integer, non-negative
       - No missing values allowed
+
+    The sample columns are converted once into a 2-D block and scanned in a
+    single pass (split over n_jobs threads by column blocks). Returns the
+    CountValidationReport; raises ValueError listing the first offending
+    (gene, sample) cells if it is not ok.
       """
     if df.shape[1] < 2:
         raise ValueError(
@@ -62,27 +162,17 @@ def validate_count_matrix(df: pd.DataFrame) -> None:
     # Sample columns (everything except Geneid)
     sample_cols = list(df.columns[1:])
 
-    # No missing values in sample columns
-    if df[sample_cols].isna().any().any():
-        raise ValueError(
-            "Count matrix contains missing values in sample columns.")
-
-    # Covert to numeric (will raise if non-numeric values found)
-    numeric = df[sample_cols].apply(pd.to_numeric, errors="raise")
-
-    # Must be integer-like (no decimals)
-    if (numeric % 1 != 0).any().any():
-        raise ValueError(
-            "Count matrix contains non-integer values in sample columns (counts must be integers)")
+    _, report = check_count_values(
+        df[sample_cols], gene.to_numpy(), max_issues=max_issues, n_jobs=n_jobs)
+    report.raise_if_invalid()
 
-    # Must be non-negative
-    if (numeric < 0).any().any():
-        raise ValueError(
-            "Count matrix contains negative values in sample columns (counts must be >=0)")
+    return report
 
 
 def align_counts_and_samples(
-    counts_df: pd.DataFrame, samples_df: pd.DataFrame
+    counts_df: pd.DataFrame,
+    samples_df: pd.DataFrame,
+    registry: SampleRegistry | None = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Ensure sample names match between count matrix and samples metadata.
@@ -92,26 +182,124 @@ def align_counts_and_samples(
     - Reorders samples_df ro match the column order in counts_df
     - Raises clear errors listing missing/extra sample names
 
+    Pass a SampleRegistry built from samples_df to reuse its sample index
+    (and cached permutation) across several matrices.
+    """
+    if registry is None:
+        registry = SampleRegistry(samples_df)
+    perm = registry.align(list(counts_df.columns[1:]))
+
+    return counts_df, registry.take(perm)
+
+
+def sample_codes(
+    columns: Sequence[str],
+    barcode_to_sample: Mapping[str, str] | pd.Series,
+    samples: Sequence[str],
+    drop_unmapped: bool = False,
+) -> np.ndarray:
+    """
+    Map count matrix columns (cells, barcodes, replicates) to sample positions.
+
+    Each column is looked up in barcode_to_sample (one hash lookup per column)
+    and the sample is located in `samples`, normally the samples.tsv order.
+    Returns one int code per column; -1 marks columns that are dropped.
+
+    Raises ValueError if a column has no sample (unless drop_unmapped), if
+    the table names samples missing from `samples`, or if some sample gets
+    no column at all.
+    """
+    lookup = pd.Series(barcode_to_sample, dtype=object)
+    mapped = lookup.reindex(pd.Index(list(columns), dtype=object))
+    unmapped = mapped.isna().to_numpy()
+    if unmapped.any() and not drop_unmapped:
+        shown = mapped.index[unmapped][:MAX_REPORTED_CELLS].tolist()
+        raise ValueError(
+            f"{int(unmapped.sum())} count matrix columns have no sample in the barcode table: {shown}")
+
+    codes = pd.Index(list(samples)).get_indexer(mapped.to_numpy())
+    unknown = sorted(set(mapped[(codes < 0) & ~unmapped]))
+    if unknown:
+        raise ValueError(f"Barcode table maps to samples not in samples.tsv: {unknown}")
+
+    empty = [s for s, n in zip(samples, np.bincount(codes[codes >= 0], minlength=len(samples))) if n == 0]
+    if empty:
+        raise ValueError(f"No count matrix columns for samples: {empty}")
+    return codes
+
+
+def aggregate_columns(block: np.ndarray, codes: np.ndarray, n_samples: int) -> np.ndarray:
     """
-    if "sample" not in samples_df.columns:
-        raise ValueError("samples_df must contain a 'sample' column.")
+    Sum the columns of a (genes x columns) block per sample code.
 
-    count_samples = list(counts_df.columns[1:])
-    meta_samples = samples_df["sample"].astype(str).tolist()
+    Columns are gathered in code order once and each sample's run is summed
+    with np.add.reduceat. Columns with code -1 are skipped. Returns a
+    (genes x n_samples) uint64 block.
+    """
+    keep = np.flatnonzero(codes >= 0)
+    idx = keep[np.argsort(codes[keep], kind="stable")]
+    sorted_codes = codes[idx]
+    out = np.zeros((block.shape[0], n_samples), dtype=np.uint64)
+    if len(idx) == 0:
+        return out
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    out[:, sorted_codes[starts]] = np.add.reduceat(block[:, idx], starts, axis=1, dtype=np.uint64)
+    return out
+
+
+def pseudobulk_count_matrix(
+    path: str | Path,
+    barcode_to_sample: Mapping[str, str] | pd.Series,
+    samples: Sequence[str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    drop_unmapped: bool = False,
+) -> pd.DataFrame:
+    """
+    Sum a wide cell/replicate-level count matrix (Geneid + columns) to samples.
 
-    missing_in_meta = sorted(set(count_samples) - set(meta_samples))
-    extra_in_meta = sorted(set(meta_samples) - set(count_samples))
+    The file is streamed in chunks of `chunksize` genes; only mapped columns
+    are parsed, each chunk is validated like load_count_matrix_typed and
+    immediately reduced to (genes x samples), so the cell-level matrix is
+    never held in memory.
 
-    if missing_in_meta or extra_in_meta:
-        parts: list[str] = []
-        if missing_in_meta:
-            parts.append(f"Missing in samples.tsv: {missing_in_meta}")
-        if extra_in_meta:
-            parts.append(f"Extra in samples.tsv: {extra_in_meta}")
+    Returns a Geneid + samples frame in the order of `samples` (uint32
+    columns, or uint64 if any sum does not fit).
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Count matrix file not found: {path}")
+
+    header = pd.read_csv(path, sep=_delimiter(path), nrows=0).columns
+    if len(header) < 2 or header[0] != REQUIRED_GENE_COLUMN:
         raise ValueError(
-            "Sample mismatch between count matrix and samples.tsv. " + " | ".join(parts))
-    # Reorder metadata to match count matrix column order
-    samples_df = samples_df.set_index(
-        "sample").loc[count_samples].reset_index()
+            f"Count matrix must start with '{REQUIRED_GENE_COLUMN}' followed by >=1 column.")
+    all_codes = sample_codes(header[1:], barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+    used = np.flatnonzero(all_codes >= 0)
+    cols = [header[1 + i] for i in used]
+    codes = all_codes[used]
+
+    genes: list[np.ndarray] = []
+    sums: list[np.ndarray] = []
+    n_rows = 0
+    reader = pd.read_csv(
+        path,
+        sep=_delimiter(path),
+        dtype={REQUIRED_GENE_COLUMN: str},
+        usecols=[REQUIRED_GENE_COLUMN, *cols],
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            block = _parse_count_chunk(chunk, cols, n_rows)
+            sums.append(aggregate_columns(block, codes, len(samples)))
+            genes.append(chunk[REQUIRED_GENE_COLUMN].to_numpy(dtype=object))
+            n_rows += chunk.shape[0]
 
-    return counts_df, samples_df
+    values = np.concatenate(sums) if sums else np.zeros((0, len(samples)), dtype=np.uint64)
+    if values.size == 0 or values.max() <= np.iinfo(np.uint32).max:
+        values = values.astype(np.uint32)
+    df = pd.DataFrame(values, columns=list(samples), copy=False)
+    df.insert(0, REQUIRED_GENE_COLUMN, pd.array(
+        np.concatenate(genes) if genes else np.empty(0, dtype=object), dtype="string"))
+    validate_count_matrix(df)
+    return df
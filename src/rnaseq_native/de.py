@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Sequence
+
+import pandas as pd
+
+# Fitted DeseqDataSet shared with contrast workers (set before the pool starts)
+_WORKER_DDS: Any = None
+
+
+def normalize_contrasts(contrast: Sequence[Any]) -> list[list[str]]:
+    """
+    Accept one contrast ["factor", "level", "reference"] or a list of them.
+
+    Returns a list of contrasts; raises ValueError on anything else.
+    """
+    if not contrast:
+        raise ValueError("At least one contrast is required.")
+    if all(isinstance(x, str) for x in contrast):
+        contrasts = [list(contrast)]
+    else:
+        contrasts = [list(c) for c in contrast]
+
+    for c in contrasts:
+        if len(c) != 3 or not all(isinstance(x, str) for x in c):
+            raise ValueError(
+                f"Contrast must be [factor, level, reference], got {c}")
+
+    labels = [contrast_label(c) for c in contrasts]
+    dups = sorted({x for x in labels if labels.count(x) > 1})
+    if dups:
+        raise ValueError(f"Duplicate contrasts: {dups}")
+    return contrasts
+
+
+def contrast_label(contrast: Sequence[str]) -> str:
+    """Folder-safe name for a contrast, e.g. condition_Protzen_vs_Control."""
+    factor, level, ref = contrast
+    return f"{factor}_{level}_vs_{ref}".replace("/", "-").replace(" ", "-")
+
+
+def _init_worker(dds: Any) -> None:
+    global _WORKER_DDS
+    _WORKER_DDS = dds
+
+
+def _contrast_results(contrast: list[str], alpha: float, dds: Any = None) -> pd.DataFrame:
+    from pydeseq2.ds import DeseqStats
+
+    stat_res = DeseqStats(
+        dds if dds is not None else _WORKER_DDS,
+        contrast=contrast,
+        alpha=alpha,
+        n_cpus=1,
+        quiet=True,
+    )
+    stat_res.summary()
+    return stat_res.results_df
+
+
+def run_contrasts(
+    dds: Any,
+    contrasts: list[list[str]],
+    alpha: float = 0.05,
+    n_workers: int = 1,
+    executor: str = "process",
+) -> dict[str, pd.DataFrame]:
+    """
+    Run DeseqStats for each contrast on one already fitted DeseqDataSet.
+
+    dds.deseq2() must have been called: size factors, dispersions and LFCs are
+    shared, only the Wald test / filtering / p-value adjustment run per contrast.
+
+    With n_workers > 1 the contrasts run on a pool ("process" or "thread").
+    Process workers get the fitted dds once each: inherited through fork where
+    available, otherwise pickled once per worker by the pool initializer.
+    Each DeseqStats uses a single CPU so the pool size is the CPU budget.
+
+    Returns {contrast_label: results_df}, in the order of `contrasts`.
+    """
+    labels = [contrast_label(c) for c in contrasts]
+    n_workers = max(1, min(n_workers, len(contrasts)))
+
+    if n_workers == 1:
+        results = [_contrast_results(c, alpha, dds) for c in contrasts]
+    elif executor == "thread":
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(lambda c: _contrast_results(c, alpha, dds), contrasts))
+    elif executor == "process":
+        if "fork" in mp.get_all_start_methods():
+            _init_worker(dds)
+            try:
+                with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context("fork")) as pool:
+                    results = list(pool.map(_contrast_results, contrasts, [alpha] * len(contrasts)))
+            finally:
+                _init_worker(None)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers, initializer=_init_worker, initargs=(dds,)
+            ) as pool:
+                results = list(pool.map(_contrast_results, contrasts, [alpha] * len(contrasts)))
+    else:
+        raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+
+    return dict(zip(labels, results))
+
+
+def summarize_results(res_df: pd.DataFrame) -> dict[str, int]:
+    """Counts reported in deseq2_summary.json for one contrast."""
+    return {
+        "genes_total": int(res_df.shape[0]),
+        "pvalue_nan": int(res_df["pvalue"].isna().sum()),
+        "padj_nan": int(res_df["padj"].isna().sum()),
+        "pvalue_lt_005": int((res_df["pvalue"] < 0.05).sum(skipna=True)),
+        "padj_lt_005": int((res_df["padj"] < 0.05).sum(skipna=True)),
+    }
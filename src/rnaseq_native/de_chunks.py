@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Literal
+
+import numpy as np
+from pydeseq2 import utils
+from pydeseq2.default_inference import DefaultInference
+
+DEFAULT_CHUNK_SIZE = 1024
+
+# (shared memory name, shape, dtype) of a (samples x genes) block
+SharedSpec = tuple[str, tuple[int, ...], str]
+
+
+def _fit_range(
+    func_name: str,
+    blocks: dict[str, np.ndarray],
+    per_gene: dict[str, np.ndarray],
+    fixed: dict[str, Any],
+) -> list[Any]:
+    """Run one pydeseq2.utils per-gene solver over the genes (columns) of `blocks`."""
+    func = getattr(utils, func_name)
+    n = len(next(iter(per_gene.values()))) if per_gene else next(iter(blocks.values())).shape[1]
+    out = []
+    for i in range(n):
+        kwargs = {k: v[:, i] for k, v in blocks.items()}
+        kwargs.update({k: v[i] for k, v in per_gene.items()})
+        out.append(func(**kwargs, **fixed))
+    return out
+
+
+def _fit_chunk(
+    func_name: str,
+    shared: dict[str, SharedSpec],
+    lo: int,
+    hi: int,
+    per_gene: dict[str, np.ndarray],
+    fixed: dict[str, Any],
+) -> list[Any]:
+    # Copy only this chunk's columns out of the parent's shared blocks
+    blocks = {}
+    for key, (name, shape, dtype) in shared.items():
+        shm = SharedMemory(name=name)
+        try:
+            blocks[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[:, lo:hi].copy()
+        finally:
+            shm.close()
+    return _fit_range(func_name, blocks, per_gene, fixed)
+
+
+class ChunkedInference(DefaultInference):
+    """
+    PyDESeq2 inference that fits genes in chunks on a process pool.
+
+    DeseqDataSet.deseq2() keeps every global step in the calling process
+    (size factors, dispersion trend, dispersion prior, Cook's cutoff); only
+    the per-gene solvers (lin_reg_mu, irls, alpha_mle) are split into
+    chunks of `chunk_size` genes. The counts and mu blocks are placed in
+    shared memory once per call (counts are reused across calls while
+    unchanged) and each worker copies out only its chunk's columns. Every
+    gene runs the same pydeseq2 solver as DefaultInference, and chunks are
+    merged in gene order, so the results match a single-process fit.
+
+    Call close() (or use as a context manager) to stop the pool and free
+    the shared blocks.
+    """
+
+    def __init__(self, n_cpus: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        super().__init__(n_cpus=n_cpus)
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+        self.chunk_size = int(chunk_size)
+        self._pool: ProcessPoolExecutor | None = None
+        self._counts: tuple[SharedMemory, np.ndarray] | None = None
+
+    def __enter__(self) -> ChunkedInference:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Pool and shared blocks belong to the process that created them
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_counts"] = None
+        return state
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._counts is not None:
+            self._counts[0].close()
+            self._counts[0].unlink()
+            self._counts = None
+
+    @staticmethod
+    def _to_shared(array: np.ndarray) -> tuple[SharedMemory, np.ndarray]:
+        array = np.ascontiguousarray(array)
+        shm = SharedMemory(create=True, size=max(1, array.nbytes))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        return shm, view
+
+    def _shared_counts(self, counts: np.ndarray) -> tuple[SharedMemory, np.ndarray]:
+        # deseq2() passes the same non-zero counts block to each solver
+        if self._counts is not None:
+            view = self._counts[1]
+            if view.shape == counts.shape and view.dtype == counts.dtype and np.array_equal(view, counts):
+                return self._counts
+            self._counts[0].close()
+            self._counts[0].unlink()
+        self._counts = self._to_shared(counts)
+        return self._counts
+
+    def _map_genes(
+        self,
+        func_name: str,
+        counts: np.ndarray,
+        per_gene: dict[str, np.ndarray],
+        fixed: dict[str, Any],
+        mu: np.ndarray | None = None,
+    ) -> list[Any]:
+        n_genes = counts.shape[1]
+        if self.n_cpus <= 1 or n_genes <= self.chunk_size:
+            blocks = {"counts": counts} if mu is None else {"counts": counts, "mu": mu}
+            return _fit_range(func_name, blocks, per_gene, fixed)
+
+        owned: list[SharedMemory] = []
+        try:
+            shm, view = self._shared_counts(counts)
+            shared = {"counts": (shm.name, view.shape, view.dtype.str)}
+            if mu is not None:
+                mu_shm, mu_view = self._to_shared(mu)
+                owned.append(mu_shm)
+                shared["mu"] = (mu_shm.name, mu_view.shape, mu_view.dtype.str)
+
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.n_cpus)
+            bounds = range(0, n_genes, self.chunk_size)
+            futures = [
+                self._pool.submit(
+                    _fit_chunk, func_name, shared, lo, min(lo + self.chunk_size, n_genes),
+                    {k: v[lo:lo + self.chunk_size] for k, v in per_gene.items()}, fixed,
+                )
+                for lo in bounds
+            ]
+            return [r for fut in futures for r in fut.result()]
+        finally:
+            for shm in owned:
+                shm.close()
+                shm.unlink()
+
+    def lin_reg_mu(  # noqa: D102
+        self,
+        counts: np.ndarray,
+        size_factors: np.ndarray,
+        design_matrix: np.ndarray,
+        min_mu: float,
+    ) -> np.ndarray:
+        res = self._map_genes(
+            "fit_lin_mu", counts, {},
+            {"size_factors": size_factors, "design_matrix": design_matrix, "min_mu": min_mu},
+        )
+        return np.array(res).T
+
+    def irls(  # noqa: D102
+        self,
+        counts: np.ndarray,
+        size_factors: np.ndarray,
+        design_matrix: np.ndarray,
+        disp: np.ndarray,
+        min_mu: float,
+        beta_tol: float,
+        min_beta: float = -30,
+        max_beta: float = 30,
+        optimizer: Literal["BFGS", "L-BFGS-B"] = "L-BFGS-B",
+        maxiter: int = 250,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        res = self._map_genes(
+            "irls_solver", counts, {"disp": np.asarray(disp)},
+            {
+                "size_factors": size_factors, "design_matrix": design_matrix,
+                "min_mu": min_mu, "beta_tol": beta_tol, "min_beta": min_beta,
+                "max_beta": max_beta, "optimizer": optimizer, "maxiter": maxiter,
+            },
+        )
+        mle_lfcs, mu_hat, hat_diagonals, converged = (np.array(m) for m in zip(*res, strict=False))
+        return mle_lfcs, mu_hat.T, hat_diagonals.T, converged
+
+    def alpha_mle(  # noqa: D102
+        self,
+        counts: np.ndarray,
+        design_matrix: np.ndarray,
+        mu: np.ndarray,
+        alpha_hat: np.ndarray,
+        min_disp: float,
+        max_disp: float,
+        prior_disp_var: float | None = None,
+        cr_reg: bool = True,
+        prior_reg: bool = False,
+        optimizer: Literal["BFGS", "L-BFGS-B"] = "L-BFGS-B",
+    ) -> tuple[np.ndarray, np.ndarray]:
+        res = self._map_genes(
+            "fit_alpha_mle", counts, {"alpha_hat": np.asarray(alpha_hat)},
+            {
+                "design_matrix": design_matrix, "min_disp": min_disp, "max_disp": max_disp,
+                "prior_disp_var": prior_disp_var, "cr_reg": cr_reg, "prior_reg": prior_reg,
+                "optimizer": optimizer,
+            },
+            mu=mu,
+        )
+        dispersions, converged = (np.array(m) for m in zip(*res, strict=False))
+        return dispersions, converged
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import gzip
+import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+import numpy as np
+
+DEFAULT_BLOCK_BYTES = 8 * 1024**2
+PHRED_OFFSET = 33
+GC_BINS = 101  # per-read GC percentage 0..100
+
+_GC = np.zeros(256, dtype=np.uint8)
+_GC[list(b"GCgc")] = 1
+_N = np.zeros(256, dtype=np.uint8)
+_N[list(b"Nn")] = 1
+
+
+def _pad_add(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) < len(b):
+        a, b = b, a
+    out = a.copy()
+    out[: len(b)] += b
+    return out
+
+
+@dataclass(frozen=True)
+class FastqStats:
+    """
+    Summed statistics of one FASTQ file (or of some of its blocks).
+
+    Per-position arrays are indexed by 0-based cycle and are as long as the
+    longest read seen. Stats of separate blocks combine with merge(), in any
+    order, so a file can be split across workers.
+    """
+    n_reads: int
+    n_bases: int
+    n_gc: int
+    n_n: int
+    n_q30: int
+    qual_sum: np.ndarray  # sum of Phred scores per position
+    bases_by_pos: np.ndarray  # reads covering each position
+    n_by_pos: np.ndarray  # N calls per position
+    length_hist: np.ndarray  # reads per length
+    gc_hist: np.ndarray  # reads per GC percentage (GC_BINS)
+
+    @classmethod
+    def empty(cls) -> FastqStats:
+        z = np.zeros(0, dtype=np.int64)
+        return cls(0, 0, 0, 0, 0, z, z, z, z, np.zeros(GC_BINS, dtype=np.int64))
+
+    def merge(self, other: FastqStats) -> FastqStats:
+        return FastqStats(
+            n_reads=self.n_reads + other.n_reads,
+            n_bases=self.n_bases + other.n_bases,
+            n_gc=self.n_gc + other.n_gc,
+            n_n=self.n_n + other.n_n,
+            n_q30=self.n_q30 + other.n_q30,
+            qual_sum=_pad_add(self.qual_sum, other.qual_sum),
+            bases_by_pos=_pad_add(self.bases_by_pos, other.bases_by_pos),
+            n_by_pos=_pad_add(self.n_by_pos, other.n_by_pos),
+            length_hist=_pad_add(self.length_hist, other.length_hist),
+            gc_hist=self.gc_hist + other.gc_hist,
+        )
+
+    def _rate(self, n: int) -> float:
+        return n / self.n_bases if self.n_bases else float("nan")
+
+    @property
+    def gc_content(self) -> float:
+        return self._rate(self.n_gc)
+
+    @property
+    def n_rate(self) -> float:
+        return self._rate(self.n_n)
+
+    @property
+    def q30_rate(self) -> float:
+        return self._rate(self.n_q30)
+
+    @property
+    def mean_length(self) -> float:
+        return self.n_bases / self.n_reads if self.n_reads else float("nan")
+
+    def mean_quality_by_position(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.qual_sum / self.bases_by_pos
+
+    def n_rate_by_position(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.n_by_pos / self.bases_by_pos
+
+    def to_dict(self) -> dict[str, Any]:
+        lengths = np.flatnonzero(self.length_hist)
+        return {
+            "n_reads": self.n_reads,
+            "n_bases": self.n_bases,
+            "mean_length": round(self.mean_length, 3),
+            "gc_content": round(self.gc_content, 6),
+            "n_rate": round(self.n_rate, 6),
+            "q30_rate": round(self.q30_rate, 6),
+            "mean_quality_by_position": np.round(self.mean_quality_by_position(), 3).tolist(),
+            "n_rate_by_position": np.round(self.n_rate_by_position(), 6).tolist(),
+            "length_distribution": {int(n): int(self.length_hist[n]) for n in lengths},
+            "gc_distribution": self.gc_hist.tolist(),
+        }
+
+
+def _open(path: Path) -> IO[bytes]:
+    with path.open("rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else path.open("rb")
+
+
+def iter_fastq_blocks(
+    path: str | Path, block_bytes: int = DEFAULT_BLOCK_BYTES
+) -> Iterator[tuple[bytes, int]]:
+    """
+    Read a FASTQ file (plain or gzip) in blocks of whole records.
+
+    Yields (block, index of the block's first record). Each block holds about
+    block_bytes of text cut after a complete 4-line record, so memory stays
+    bounded by the block size whatever the file size. Raises ValueError if
+    the file ends inside a record.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"FASTQ file not found: {path}")
+
+    first = 0
+    rest = b""
+    with _open(path) as f:
+        while True:
+            data = f.read(block_bytes)
+            buf = rest + data
+            if not data:
+                break
+            n_lines = buf.count(b"\n")
+            # Cut after the last newline that closes a 4-line record
+            cut = len(buf)
+            for _ in range(n_lines % 4 + 1):
+                cut = buf.rfind(b"\n", 0, cut)
+                if cut < 0:
+                    break
+            if cut < 0 or n_lines < 4:
+                rest = buf
+                continue
+            block, rest = buf[: cut + 1], buf[cut + 1:]
+            yield block, first
+            first += (n_lines - n_lines % 4) // 4
+
+    if rest.strip():
+        if not rest.endswith(b"\n"):
+            rest += b"\n"
+        if rest.count(b"\n") % 4:
+            raise ValueError(f"Truncated FASTQ file {path}: last record is incomplete.")
+        yield rest, first
+
+
+def block_stats(block: bytes, first_record: int = 0, source: str = "") -> FastqStats:
+    """
+    Statistics for a block of whole FASTQ records (as from iter_fastq_blocks).
+
+    Sequence and quality lines are joined into one byte buffer each and
+    handled as uint8 arrays; per-position sums use a reshape when all reads
+    share one length and a bincount over cycle positions otherwise.
+    """
+    lines = block.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    if lines and lines[0].endswith(b"\r"):
+        lines = [x.rstrip(b"\r") for x in lines]
+    n = len(lines) // 4
+    if n == 0:
+        return FastqStats.empty()
+
+    headers, seqs, plus, quals = lines[0::4], lines[1::4], lines[2::4], lines[3::4]
+    lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=n)
+    q_lengths = np.fromiter(map(len, quals), dtype=np.int64, count=n)
+    bad = np.flatnonzero(
+        (lengths != q_lengths)
+        | ~np.fromiter((h[:1] == b"@" for h in headers), dtype=bool, count=n)
+        | ~np.fromiter((p[:1] == b"+" for p in plus), dtype=bool, count=n)
+    )
+    if len(bad):
+        raise ValueError(
+            f"Malformed FASTQ record {first_record + int(bad[0]) + 1} in {source or 'block'} "
+            "(expected '@' header, '+' separator and equal sequence/quality lengths).")
+
+    seq = np.frombuffer(b"".join(seqs), dtype=np.uint8)
+    qual = np.frombuffer(b"".join(quals), dtype=np.uint8).astype(np.int16) - PHRED_OFFSET
+    is_gc = _GC[seq]
+    is_n = _N[seq]
+
+    max_len = int(lengths.max())
+    if int(lengths.min()) == max_len:
+        shape = (n, max_len)
+        qual_sum = qual.reshape(shape).sum(axis=0, dtype=np.int64)
+        n_by_pos = is_n.reshape(shape).sum(axis=0, dtype=np.int64)
+        bases_by_pos = np.full(max_len, n, dtype=np.int64)
+    else:
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        pos = np.arange(len(seq), dtype=np.int64) - np.repeat(starts, lengths)
+        qual_sum = np.bincount(pos, weights=qual, minlength=max_len).astype(np.int64)
+        n_by_pos = np.bincount(pos, weights=is_n, minlength=max_len).astype(np.int64)
+        bases_by_pos = np.bincount(pos, minlength=max_len).astype(np.int64)
+
+    nonempty = lengths > 0
+    gc_hist = np.zeros(GC_BINS, dtype=np.int64)
+    if nonempty.any():
+        starts = np.concatenate(([0], np.cumsum(lengths[:-1])))[nonempty]
+        gc_reads = np.add.reduceat(is_gc.astype(np.int64), starts)
+        pct = np.rint(100 * gc_reads / lengths[nonempty]).astype(np.int64)
+        gc_hist += np.bincount(pct, minlength=GC_BINS)
+
+    return FastqStats(
+        n_reads=n,
+        n_bases=int(len(seq)),
+        n_gc=int(is_gc.sum(dtype=np.int64)),
+        n_n=int(is_n.sum(dtype=np.int64)),
+        n_q30=int((qual >= 30).sum()),
+        qual_sum=qual_sum,
+        bases_by_pos=bases_by_pos,
+        n_by_pos=n_by_pos,
+        length_hist=np.bincount(lengths).astype(np.int64),
+        gc_hist=gc_hist,
+    )
+
+
+def fastq_stats(
+    path: str | Path,
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+    n_jobs: int = 1,
+) -> FastqStats:
+    """
+    Stream one FASTQ file (plain or gzip) and return its FastqStats.
+
+    With n_jobs > 1 the blocks are read (and decompressed) here and their
+    statistics computed on a process pool. At most 2 * n_jobs blocks are in
+    flight, so memory stays bounded by about 2 * n_jobs * block_bytes.
+    """
+    path = Path(path)
+    total = FastqStats.empty()
+    if n_jobs <= 1:
+        for block, first in iter_fastq_blocks(path, block_bytes):
+            total = total.merge(block_stats(block, first, str(path)))
+        return total
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        pending: set = set()
+        for block, first in iter_fastq_blocks(path, block_bytes):
+            if len(pending) >= 2 * n_jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    total = total.merge(fut.result())
+            pending.add(pool.submit(block_stats, block, first, str(path)))
+        for fut in pending:
+            total = total.merge(fut.result())
+    return total
+
+
+def fastq_stats_many(
+    paths: list[str | Path],
+    n_jobs: int = 1,
+    split: str = "file",
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> list[FastqStats]:
+    """
+    FastqStats for several files, in the order of `paths`.
+
+    split="file": one process per file at a time (best for many files).
+    split="block": files one after another, each split into blocks across
+    n_jobs processes (best for a few large files).
+    """
+    if split not in ("file", "block"):
+        raise ValueError(f"split must be 'file' or 'block', got {split!r}")
+    paths = [Path(p) for p in paths]
+    missing = [str(p) for p in paths if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing FASTQ files: {missing}")
+
+    if split == "block":
+        return [fastq_stats(p, block_bytes, n_jobs) for p in paths]
+    if n_jobs <= 1 or len(paths) == 1:
+        return [fastq_stats(p, block_bytes) for p in paths]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(paths))) as pool:
+        return list(pool.map(fastq_stats, paths, [block_bytes] * len(paths)))
+
+
+def fastq_pair_stats(
+    r1: str | Path,
+    r2: str | Path,
+    n_jobs: int = 1,
+    split: str = "file",
+    block_bytes: int = DEFAULT_BLOCK_BYTES,
+) -> dict[str, FastqStats]:
+    """
+    Stats for a paired-end sample: {"r1": ..., "r2": ...}.
+
+    Raises ValueError if R1 and R2 hold a different number of reads.
+    """
+    s1, s2 = fastq_stats_many([r1, r2], n_jobs=n_jobs, split=split, block_bytes=block_bytes)
+    if s1.n_reads != s2.n_reads:
+        raise ValueError(
+            f"R1 and R2 have different read counts: {s1.n_reads} ({r1}) vs {s2.n_reads} ({r2})")
+    return {"r1": s1, "r2": s2}
+
+
+def write_fastq_stats(stats: dict[str, FastqStats], path: str | Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({k: v.to_dict() for k, v in stats.items()}, indent=2),
+                    encoding="utf-8")
+    return path
@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.counts import REQUIRED_GENE_COLUMN
+from rnaseq_native.matrix import CountMatrix
+
+DEFAULT_READ_CHUNK = 500_000
+
+# SAM FLAG bits
+FLAG_PAIRED = 0x1
+FLAG_UNMAPPED = 0x4
+FLAG_REVERSE = 0x10
+FLAG_FIRST = 0x40
+FLAG_SECONDARY = 0x100
+FLAG_SUPPLEMENTARY = 0x800
+
+# featureCounts-style summary categories, in report order
+COUNT_STATUS = (
+    "assigned",
+    "unassigned_unmapped",
+    "unassigned_secondary",
+    "unassigned_mapq",
+    "unassigned_no_features",
+    "unassigned_ambiguity",
+)
+
+# Index built once per counting worker (set by the pool initializer)
+_WORKER_INDEX: Any = None
+
+
+def _open_text(path: Path) -> IO[str]:
+    with path.open("rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+@dataclass(frozen=True)
+class CountOptions:
+    feature: str = "exon"  # GTF/GFF feature type to count on
+    attribute: str = "gene_id"  # attribute that groups features into genes
+    strand: int = 0  # 0 unstranded, 1 stranded, 2 reversely stranded
+    min_mapq: int = 0
+    count_pairs: bool = True  # paired reads: count each fragment once (via its first mate)
+
+
+@dataclass(frozen=True)
+class GeneIndex:
+    """
+    Features of an annotation as sorted arrays per chromosome.
+
+    For each chromosome: feature starts (sorted), ends, gene codes (positions
+    into `genes`) and strands (+1, -1, 0), 1-based closed intervals. The
+    longest feature per chromosome bounds the search window of a query, so
+    overlaps are found with two searchsorted calls and one vectorized
+    filter, no per-read loop.
+    """
+    genes: np.ndarray
+    chroms: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]]
+
+    @property
+    def n_genes(self) -> int:
+        return len(self.genes)
+
+    def overlaps(
+        self, chrom: str, starts: np.ndarray, ends: np.ndarray, strand: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        All (query position, gene code) pairs where query i overlaps a feature.
+
+        `strand` (+1/-1 per query), if given, keeps only features on that
+        strand (unstranded features always match). Pairs may repeat when a
+        query overlaps several features of one gene.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if chrom not in self.chroms or len(starts) == 0:
+            return empty, empty
+        f_start, f_end, f_gene, f_strand, max_len = self.chroms[chrom]
+
+        lo = np.searchsorted(f_start, starts - max_len + 1, side="left")
+        hi = np.searchsorted(f_start, ends, side="right")
+        n_cand = hi - lo
+        total = int(n_cand.sum())
+        if total == 0:
+            return empty, empty
+
+        query = np.repeat(np.arange(len(starts)), n_cand)
+        offset = np.arange(total) - np.repeat(np.cumsum(n_cand) - n_cand, n_cand)
+        feat = np.repeat(lo, n_cand) + offset
+        hit = f_end[feat] >= starts[query]
+        if strand is not None:
+            fs = f_strand[feat]
+            hit &= (fs == 0) | (fs == strand[query])
+        return query[hit], f_gene[feat[hit]]
+
+
+def load_annotation(path: str | Path, options: CountOptions = CountOptions()) -> GeneIndex:
+    """
+    Build a GeneIndex from a GTF or GFF3 file (plain or gzip).
+
+    Keeps rows whose type is options.feature and groups them by
+    options.attribute (`gene_id "X"` in GTF, `gene_id=X` in GFF3). Genes are
+    numbered in order of first appearance, which is the Geneid order of the
+    count matrix.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Annotation file not found: {path}")
+
+    df = pd.read_csv(
+        path, sep="\t", comment="#", header=None, usecols=[0, 2, 3, 4, 6, 8],
+        names=["chrom", "type", "start", "end", "strand", "attributes"],
+        dtype={"chrom": str, "type": str, "strand": str, "attributes": str},
+        quoting=3,
+    )
+    df = df[df["type"] == options.feature]
+    if df.empty:
+        raise ValueError(f"No '{options.feature}' features in {path.name}.")
+
+    pattern = rf'(?:^|;)\s*{options.attribute}[ =]"?([^";]+)"?'
+    gene = df["attributes"].str.extract(pattern, expand=False)
+    if gene.isna().any():
+        bad = int(gene.isna().sum())
+        raise ValueError(f"{bad} '{options.feature}' rows in {path.name} have no '{options.attribute}'.")
+
+    codes, genes = pd.factorize(gene, sort=False)
+    strand = df["strand"].map({"+": 1, "-": -1}).fillna(0).to_numpy(dtype=np.int8)
+    start = df["start"].to_numpy(dtype=np.int64)
+    end = df["end"].to_numpy(dtype=np.int64)
+    chrom = df["chrom"].to_numpy()
+
+    chroms = {}
+    for name in pd.unique(chrom):
+        sel = np.flatnonzero(chrom == name)
+        order = sel[np.argsort(start[sel], kind="stable")]
+        f_len = end[order] - start[order] + 1
+        chroms[str(name)] = (start[order], end[order], codes[order].astype(np.int64),
+                             strand[order], int(f_len.max()))
+    return GeneIndex(genes=np.asarray(genes, dtype=str), chroms=chroms)
+
+
+def _sam_header_lines(path: Path) -> int:
+    n = 0
+    with _open_text(path) as f:
+        for line in f:
+            if not line.startswith("@"):
+                break
+            n += 1
+    return n
+
+
+def _cigar_blocks(pos: np.ndarray, cigar: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Aligned reference blocks (read position, start, end) from CIGAR strings.
+
+    M/=/X/D extend a block and N (intron) starts a new one, as in
+    featureCounts. Reads whose CIGAR is a single "<n>M" skip the regex.
+    """
+    simple = cigar.str.fullmatch(r"\d+M").to_numpy()
+    idx_s = np.flatnonzero(simple)
+    s_start = pos[idx_s]
+    s_end = s_start + cigar.iloc[idx_s].str[:-1].astype(np.int64).to_numpy() - 1
+
+    idx_c = np.flatnonzero(~simple)
+    if len(idx_c) == 0:
+        return idx_s, s_start, s_end
+
+    ops = cigar.iloc[idx_c].str.extractall(r"(\d+)([MIDNSHP=X])")
+    read = ops.index.get_level_values(0).to_numpy()
+    n = ops[0].astype(np.int64).to_numpy()
+    op = ops[1].to_numpy()
+    consumes = np.isin(op, ["M", "D", "N", "=", "X"])
+    in_block = np.isin(op, ["M", "D", "=", "X"])
+    ref_len = np.where(consumes, n, 0)
+
+    # Offset of each op from the read's leftmost position
+    cum = pd.Series(ref_len).groupby(read).cumsum().to_numpy() - ref_len
+    b_start = pos[read[in_block]] + cum[in_block]
+    b_end = b_start + n[in_block] - 1
+    b_read = read[in_block]
+    return (np.concatenate([idx_s, b_read]),
+            np.concatenate([s_start, b_start]),
+            np.concatenate([s_end, b_end]))
+
+
+def iter_sam_chunks(path: str | Path, chunksize: int = DEFAULT_READ_CHUNK) -> Iterator[pd.DataFrame]:
+    """Stream the first six SAM columns (QNAME..CIGAR) in chunks; header lines are skipped."""
+    path = Path(path)
+    try:
+        yield from pd.read_csv(
+            path, sep="\t", header=None, usecols=range(6),
+            names=["qname", "flag", "chrom", "pos", "mapq", "cigar"],
+            dtype={"qname": str, "flag": np.int64, "chrom": str, "pos": np.int64,
+                   "mapq": np.int64, "cigar": str},
+            skiprows=_sam_header_lines(path), chunksize=chunksize, quoting=3,
+        )
+    except pd.errors.EmptyDataError:
+        return  # header only, no reads
+
+
+def iter_bed_chunks(path: str | Path, chunksize: int = DEFAULT_READ_CHUNK) -> Iterator[pd.DataFrame]:
+    """
+    Stream BED alignment records (chrom, start0, end[, name, score, strand]).
+
+    Each record is one aligned read; chunks come back in the SAM column
+    layout (1-based pos, "<n>M" CIGAR, FLAG from the strand, MAPQ from score).
+    """
+    for chunk in pd.read_csv(
+        path, sep="\t", header=None, comment="#",
+        dtype={0: str, 3: str, 5: str}, chunksize=chunksize, quoting=3,
+    ):
+        start = chunk[1].to_numpy(dtype=np.int64)
+        end = chunk[2].to_numpy(dtype=np.int64)
+        strand = chunk[5] if 5 in chunk.columns else pd.Series("+", index=chunk.index)
+        yield pd.DataFrame({
+            "qname": chunk[3] if 3 in chunk.columns else "",
+            "flag": np.where(strand.to_numpy() == "-", FLAG_REVERSE, 0),
+            "chrom": chunk[0],
+            "pos": start + 1,
+            "mapq": (pd.to_numeric(chunk[4], errors="coerce").fillna(255).to_numpy(dtype=np.int64)
+                     if 4 in chunk.columns else 255),
+            "cigar": pd.Series(end - start, index=chunk.index).astype(str) + "M",
+        })
+
+
+def _assign_chunk(chunk: pd.DataFrame, index: GeneIndex, options: CountOptions,
+                  counts: np.ndarray, status: dict[str, int]) -> None:
+    flag = chunk["flag"].to_numpy()
+    unmapped = (flag & FLAG_UNMAPPED) != 0
+    secondary = ~unmapped & ((flag & (FLAG_SECONDARY | FLAG_SUPPLEMENTARY)) != 0)
+    # The second mate of a pair is not counted on its own: the pair is one fragment
+    mate2 = options.count_pairs & ((flag & FLAG_PAIRED) != 0) & ((flag & FLAG_FIRST) == 0)
+    low_mapq = ~unmapped & ~secondary & (chunk["mapq"].to_numpy() < options.min_mapq)
+    keep = ~(unmapped | secondary | mate2 | low_mapq)
+
+    status["unassigned_unmapped"] += int((unmapped & ~mate2).sum())
+    status["unassigned_secondary"] += int((secondary & ~mate2).sum())
+    status["unassigned_mapq"] += int((low_mapq & ~mate2).sum())
+
+    reads = chunk[keep]
+    n = len(reads)
+    if n == 0:
+        return
+    r_flag = reads["flag"].to_numpy()
+    read_strand = np.where((r_flag & FLAG_REVERSE) != 0, -1, 1)
+    # A second mate lies on the opposite strand of its fragment
+    read_strand[((r_flag & FLAG_PAIRED) != 0) & ((r_flag & FLAG_FIRST) == 0)] *= -1
+    if options.strand == 2:
+        read_strand = -read_strand
+
+    b_read, b_start, b_end = _cigar_blocks(reads["pos"].to_numpy(), reads["cigar"].reset_index(drop=True))
+    chrom = reads["chrom"].to_numpy()[b_read]
+
+    hit_read, hit_gene = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for name in pd.unique(chrom):
+        sel = np.flatnonzero(chrom == name)
+        q, g = index.overlaps(
+            str(name), b_start[sel], b_end[sel],
+            read_strand[b_read[sel]] if options.strand else None,
+        )
+        hit_read.append(b_read[sel][q])
+        hit_gene.append(g)
+
+    pairs = np.unique(np.concatenate(hit_read) * index.n_genes + np.concatenate(hit_gene))
+    read_of_pair = pairs // index.n_genes
+    n_genes_per_read = np.bincount(read_of_pair, minlength=n)
+    unique = n_genes_per_read[read_of_pair] == 1
+
+    counts += np.bincount(pairs[unique] % index.n_genes, minlength=index.n_genes).astype(counts.dtype)
+    status["assigned"] += int(unique.sum())
+    status["unassigned_ambiguity"] += int((n_genes_per_read > 1).sum())
+    status["unassigned_no_features"] += int((n_genes_per_read == 0).sum())
+
+
+def count_reads(
+    path: str | Path,
+    index: GeneIndex,
+    options: CountOptions = CountOptions(),
+    chunksize: int = DEFAULT_READ_CHUNK,
+) -> tuple[np.ndarray, dict[str, int]]:
+    """
+    Count the reads of one alignment file (SAM, or BED for plain-text records) per gene.
+
+    Reads are streamed in chunks of `chunksize` records. Like featureCounts
+    with default settings, a read (or fragment) is counted for a gene when
+    any of its aligned blocks overlaps a feature of that gene and of no
+    other gene; reads hitting several genes count as ambiguous.
+
+    Returns (counts per gene in index order, {status: number of reads}).
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Alignment file not found: {path}")
+    if options.strand not in (0, 1, 2):
+        raise ValueError(f"strand must be 0, 1 or 2, got {options.strand}")
+
+    name = path.name.lower().removesuffix(".gz")
+    chunks = iter_bed_chunks(path, chunksize) if name.endswith(".bed") else iter_sam_chunks(path, chunksize)
+    counts = np.zeros(index.n_genes, dtype=np.uint64)
+    status = {k: 0 for k in COUNT_STATUS}
+    for chunk in chunks:
+        _assign_chunk(chunk, index, options, counts, status)
+    return counts, status
+
+
+def _init_worker(index: GeneIndex) -> None:
+    global _WORKER_INDEX
+    _WORKER_INDEX = index
+
+
+def _count_in_worker(path: str, options: CountOptions, chunksize: int) -> tuple[np.ndarray, dict[str, int]]:
+    return count_reads(path, _WORKER_INDEX, options, chunksize)
+
+
+def count_samples(
+    alignments: dict[str, str | Path],
+    index: GeneIndex,
+    options: CountOptions = CountOptions(),
+    n_jobs: int = 1,
+    chunksize: int = DEFAULT_READ_CHUNK,
+) -> tuple[CountMatrix, pd.DataFrame]:
+    """
+    Count every sample's alignment file; files are spread over n_jobs processes.
+
+    The gene index is sent to each worker once (pool initializer). Returns a
+    CountMatrix (samples x genes, uint32 when the counts fit) and a summary
+    frame with one row per sample and one column per COUNT_STATUS.
+    """
+    samples = list(alignments)
+    paths = [str(alignments[s]) for s in samples]
+    missing = [p for p in paths if not Path(p).exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing alignment files: {missing}")
+
+    if n_jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(paths)), initializer=_init_worker, initargs=(index,)
+        ) as pool:
+            results = list(pool.map(_count_in_worker, paths,
+                                    [options] * len(paths), [chunksize] * len(paths)))
+    else:
+        results = [count_reads(p, index, options, chunksize) for p in paths]
+
+    values = np.stack([c for c, _ in results]) if results else np.zeros((0, index.n_genes), np.uint64)
+    if values.size == 0 or values.max() <= np.iinfo(np.uint32).max:
+        values = values.astype(np.uint32)
+    summary = pd.DataFrame([s for _, s in results], index=pd.Index(samples, name="sample"))
+    return CountMatrix(values=np.ascontiguousarray(values), genes=index.genes, samples=samples), summary
+
+
+def write_count_csv(counts: CountMatrix, path: str | Path) -> Path:
+    """Write the Geneid + sample columns layout read by load_count_matrix."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(counts.to_array().T, columns=counts.samples)
+    df.insert(0, REQUIRED_GENE_COLUMN, counts.kept_genes)
+    df.to_csv(path, index=False)
+    return path
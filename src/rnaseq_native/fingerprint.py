@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any
+
+HASH_BLOCK = 1 << 20
+
+
+def content_hash(path: str | Path) -> str:
+    """Return the BLAKE2b hex digest of a file's content, read in 1 MiB blocks."""
+    h = hashlib.blake2b(digest_size=20)
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: str | Path, checksum: bool = False) -> dict[str, Any]:
+    """
+    Describe a file by size and mtime (nanoseconds), plus its content hash if requested.
+    """
+    st = Path(path).stat()
+    fp: dict[str, Any] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if checksum:
+        fp["hash"] = content_hash(path)
+    return fp
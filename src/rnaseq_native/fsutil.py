@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def entry_dir(path: Path, cache_dir: Path) -> Path:
+    """Per-file entry under `cache_dir`, keyed by the resolved path."""
+    key = hashlib.blake2b(str(path).encode("utf-8"), digest_size=8).hexdigest()
+    return cache_dir / f"{path.stem}-{key}"
+
+
+@contextmanager
+def atomic_dir(directory: str | Path) -> Iterator[Path]:
+    """
+    Yield a temporary sibling of `directory` to write into; on success it
+    replaces `directory`, on error it is removed and `directory` is untouched.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        yield tmp
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
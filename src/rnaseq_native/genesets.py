@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import json
+import os
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+
+from rnaseq_native.fingerprint import file_fingerprint
+
+COMPILED_SUFFIX = ".npz"
+
+
+@dataclass(frozen=True)
+class GeneSetCollection:
+    """
+    Gene sets stored CSR-style over one gene dictionary.
+
+    Set i holds genes[indices[offsets[i]:offsets[i + 1]]]. Members of a set
+    are unique; sets keep the order of the GMT file.
+    """
+
+    names: np.ndarray
+    descriptions: np.ndarray
+    genes: np.ndarray
+    offsets: np.ndarray
+    indices: np.ndarray
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def members(self, i: int) -> np.ndarray:
+        """Gene-dictionary indices of set i."""
+        return self.indices[self.offsets[i]:self.offsets[i + 1]]
+
+    def member_names(self, i: int) -> list[str]:
+        return self.genes[self.members(i)].tolist()
+
+    def __iter__(self) -> Iterator[tuple[str, list[str]]]:
+        for i, name in enumerate(self.names):
+            yield str(name), self.member_names(i)
+
+    def set_ids(self) -> np.ndarray:
+        """Set number of every entry in `indices` (the CSR row of each member)."""
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.sizes)
+
+    def subset(self, keep: np.ndarray) -> GeneSetCollection:
+        """Sets selected by a boolean mask or index array (gene dictionary unchanged)."""
+        keep = np.flatnonzero(keep) if np.asarray(keep).dtype == bool else np.asarray(keep)
+        sizes = self.sizes[keep]
+        offsets = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        starts = np.repeat(self.offsets[keep] - offsets[:-1], sizes)
+        indices = self.indices[np.arange(offsets[-1]) + starts]
+        return GeneSetCollection(
+            self.names[keep], self.descriptions[keep], self.genes, offsets, indices, dict(self.meta))
+
+    def filter_size(self, min_size: int = 1, max_size: int | None = None) -> GeneSetCollection:
+        """Keep sets with min_size <= size <= max_size and drop genes no kept set uses."""
+        sizes = self.sizes
+        keep = sizes >= min_size
+        if max_size is not None:
+            keep &= sizes <= max_size
+        out = self.subset(keep)
+        used, indices = np.unique(out.indices, return_inverse=True)
+        meta = dict(self.meta, min_size=int(min_size), max_size=max_size)
+        return GeneSetCollection(
+            out.names, out.descriptions, self.genes[used], out.offsets,
+            indices.astype(np.int32), meta)
+
+    def restrict_to(
+        self, universe: Sequence[str], min_size: int = 1, max_size: int | None = None
+    ) -> GeneSetCollection:
+        """
+        Re-index the sets onto `universe` (e.g. the genes of a ranked list).
+
+        Members not in the universe are dropped and the size filters apply to
+        what is left, as enrichment tools do. In the result `genes` is the
+        universe and `indices` are positions in it.
+        """
+        universe = np.asarray(universe, dtype=str)
+        lookup = {g: i for i, g in enumerate(universe.tolist())}
+        if len(lookup) != len(universe):
+            raise ValueError("Gene universe has duplicate genes.")
+        pos = np.array([lookup.get(g, -1) for g in self.genes.tolist()], dtype=np.int64)
+
+        mapped = pos[self.indices]
+        hit = mapped >= 0
+        sizes = np.bincount(self.set_ids()[hit], minlength=len(self))
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        out = GeneSetCollection(
+            self.names, self.descriptions, universe, offsets,
+            mapped[hit].astype(np.int32), dict(self.meta))
+
+        keep = sizes >= min_size
+        if max_size is not None:
+            keep &= sizes <= max_size
+        return out if keep.all() else out.subset(keep)
+
+    def save(self, path: str | Path) -> Path:
+        """
+        Write the compiled collection as one uncompressed .npz file.
+
+        The file is written under a temporary name and renamed into place, so
+        concurrent readers see either the old or the new file, never half of one.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        with tmp.open("wb") as f:
+            np.savez(
+                f,
+                names=self.names.astype(str),
+                descriptions=self.descriptions.astype(str),
+                genes=self.genes.astype(str),
+                offsets=self.offsets.astype(np.int64),
+                indices=self.indices.astype(np.int32),
+                meta=np.array(json.dumps(self.meta)),
+            )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> GeneSetCollection:
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Gene set file not found: {path}")
+        with np.load(path) as data:
+            return cls(
+                names=data["names"],
+                descriptions=data["descriptions"],
+                genes=data["genes"],
+                offsets=data["offsets"],
+                indices=data["indices"],
+                meta=json.loads(str(data["meta"])),
+            )
+
+    def write_gmt(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for i, (name, desc) in enumerate(zip(self.names.tolist(), self.descriptions.tolist())):
+                f.write("\t".join([name, desc] + self.member_names(i)) + "\n")
+        return path
+
+
+def parse_gmt(path: str | Path, upper: bool = True) -> GeneSetCollection:
+    """
+    Parse a GMT file in one pass.
+
+    Accepts the standard layout (term, description, gene, gene, ...) and the
+    variant with all genes comma-packed in the third column. Genes are
+    stripped (and upper-cased if `upper`), duplicates within a set are
+    dropped, and a term listed on several lines is merged into one set with
+    the first description. Lines with fewer than 3 fields are skipped.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"GMT file not found: {path}")
+
+    gene_ids: dict[str, int] = {}
+    sets: dict[str, dict[int, None]] = {}
+    descriptions: dict[str, str] = {}
+
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for raw_line in f:
+            parts = raw_line.rstrip("\r\n").split("\t")
+            if len(parts) < 3:
+                continue
+            term = parts[0].strip()
+            if not term:
+                continue
+            fields = parts[2].split(",") if len(parts) == 3 else parts[2:]
+
+            members = sets.get(term)
+            if members is None:
+                members = sets[term] = {}
+                descriptions[term] = parts[1].strip()
+            for gene in fields:
+                gene = gene.strip()
+                if not gene:
+                    continue
+                if upper:
+                    gene = gene.upper()
+                members[gene_ids.setdefault(gene, len(gene_ids))] = None
+
+    sizes = np.fromiter((len(m) for m in sets.values()), dtype=np.int64, count=len(sets))
+    offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.fromiter(
+        (g for m in sets.values() for g in m), dtype=np.int32, count=int(offsets[-1]))
+    return GeneSetCollection(
+        names=np.array(list(sets), dtype=str),
+        descriptions=np.array([descriptions[t] for t in sets], dtype=str),
+        genes=np.array(list(gene_ids), dtype=str),
+        offsets=offsets,
+        indices=indices,
+    )
+
+
+def compile_gmt(
+    gmt_path: str | Path,
+    out_path: str | Path | None = None,
+    min_size: int = 1,
+    max_size: int | None = None,
+    upper: bool = True,
+) -> GeneSetCollection:
+    """
+    Parse a GMT file, save it as a compiled .npz and return it size-filtered.
+
+    `out_path` defaults to the GMT path with a .npz suffix. The stored
+    collection is unfiltered, so loads with any size filters can share it;
+    the source fingerprint is stored so load_gene_sets can tell when to
+    recompile.
+    """
+    gmt_path = Path(gmt_path)
+    out_path = Path(out_path) if out_path is not None else gmt_path.with_suffix(COMPILED_SUFFIX)
+    collection = parse_gmt(gmt_path, upper=upper)
+    source = file_fingerprint(gmt_path)
+    source["path"] = str(gmt_path.resolve())
+    collection.meta.update({"source": source, "upper": upper})
+    collection.save(out_path)
+    return collection.filter_size(min_size, max_size)
+
+
+def load_gene_sets(
+    path: str | Path,
+    min_size: int = 1,
+    max_size: int | None = None,
+) -> GeneSetCollection:
+    """
+    Load a gene-set library from a compiled .npz or a .gmt file.
+
+    For a .gmt, a compiled .npz next to it is used if it was built from this
+    file (same resolved path, size and mtime); otherwise, or if it cannot be
+    read, the GMT is compiled (and the .npz rewritten). Either way the size
+    filters are applied on load, never stored.
+    """
+    path = Path(path)
+    if path.suffix == COMPILED_SUFFIX:
+        return GeneSetCollection.load(path).filter_size(min_size, max_size)
+    if not path.exists():
+        raise FileNotFoundError(f"GMT file not found: {path}")
+
+    compiled = path.with_suffix(COMPILED_SUFFIX)
+    try:
+        collection = GeneSetCollection.load(compiled)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        collection = None  # missing or unreadable: treat as stale
+    if collection is not None:
+        source = collection.meta.get("source", {})
+        fp = file_fingerprint(path)
+        # Files compiled with size filters (older layout) are rebuilt unfiltered
+        if (source.get("path") == str(path.resolve())
+                and source.get("size") == fp["size"] and source.get("mtime_ns") == fp["mtime_ns"]
+                and "min_size" not in collection.meta):
+            return collection.filter_size(min_size, max_size)
+    return compile_gmt(path, compiled, min_size=min_size, max_size=max_size)
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.genesets import GeneSetCollection
+
+# Result columns, named as in gseapy's prerank report
+RESULT_COLUMNS = [
+    "Term", "Description", "Size", "ES", "NES", "NOM p-val", "FDR q-val",
+    "Tag %", "Gene %", "Lead_genes",
+]
+
+# Upper bound on permutations x genes held at once in a worker
+BATCH_ELEMENTS = 1 << 22
+
+# Ranked gene sets for this worker (set by the pool initializer)
+_WORKER_SETS: Any = None
+
+
+@dataclass(frozen=True)
+class PrerankOptions:
+    permutations: int = 1000
+    min_size: int = 15
+    max_size: int = 500
+    weight: float = 1.0
+    seed: int = 42
+    n_jobs: int = 1
+    block_size: int = 250  # permutations per task; fixes the per-block seeds
+
+
+@dataclass(frozen=True)
+class RankedSets:
+    """
+    Gene sets laid out over a ranked list, ready for running-sum scoring.
+
+    `members` holds rank positions (0 = highest metric) of every set's genes,
+    CSR-style with `starts` and `sizes`. Sets are ordered by size, so the
+    sets of one size form a dense (n_sets_k, k) block; `groups` lists
+    (k, first set, last set + 1) for each size.
+    """
+
+    weights: np.ndarray
+    members: np.ndarray
+    starts: np.ndarray
+    sizes: np.ndarray
+    groups: tuple[tuple[int, int, int], ...]
+
+    @property
+    def n_genes(self) -> int:
+        return len(self.weights)
+
+    @property
+    def n_sets(self) -> int:
+        return len(self.sizes)
+
+    @classmethod
+    def build(
+        cls, metric: np.ndarray, sets: GeneSetCollection, weight: float = 1.0, dtype: Any = np.float32
+    ) -> RankedSets:
+        """
+        `sets` must be indexed on the ranked genes and ordered by size (see prerank).
+
+        float32 weights halve the permutation blocks; use float64 for the
+        observed scores that are reported.
+        """
+        sizes = sets.sizes.astype(np.int64)
+        if (sizes == 0).any():
+            raise ValueError("Gene sets must not be empty after restricting to the ranked genes.")
+        if (np.diff(sizes) < 0).any():
+            raise ValueError("Gene sets must be ordered by size.")
+        bounds = np.flatnonzero(np.diff(sizes)) + 1
+        first = np.concatenate([[0], bounds])
+        last = np.concatenate([bounds, [len(sizes)]])
+        weights = np.abs(metric) ** weight if weight != 0 else np.ones(len(metric))
+        return cls(
+            weights=weights.astype(dtype),
+            members=sets.indices.astype(np.int32),
+            starts=sets.offsets[:-1].astype(np.int64),
+            sizes=sizes,
+            groups=tuple((int(sizes[i]), int(i), int(j)) for i, j in zip(first, last)),
+        )
+
+
+def read_rnk(path: str | Path) -> pd.Series:
+    """Read a 2-column ranked list (gene, metric; no header) as a Series indexed by gene."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Ranked file not found: {path}")
+    df = pd.read_csv(path, sep="\t", header=None, comment="#", usecols=[0, 1],
+                     names=["gene", "rank_metric"], dtype={"gene": str})
+    metric = pd.to_numeric(df["rank_metric"], errors="coerce")
+    if metric.isna().any():
+        bad = df.loc[metric.isna(), "gene"].head(5).tolist()
+        raise ValueError(f"Non-numeric rank metric in {path} for genes: {bad}")
+    return pd.Series(metric.to_numpy(dtype=np.float64), index=df["gene"].to_numpy(), name="rank_metric")
+
+
+def _running_extremes(ranked: RankedSets, pos: np.ndarray, k: int) -> np.ndarray:
+    """
+    Enrichment scores of sets of size k from their hit positions.
+
+    `pos` is (..., k): rank positions of each set's members, sorted along
+    the last axis. The running sum peaks right after a hit and bottoms out
+    right before one, so only the hits are evaluated: after hit j (0-based)
+    at position p it is cw_j / total - (p - j) / (n_genes - k).
+    """
+    w = ranked.weights[pos]
+    after = np.cumsum(w, axis=-1)
+    scale = after[..., -1:].copy()
+    scale[scale == 0] = 1.0
+    np.divide(1.0, scale, out=scale)
+    after *= scale
+    after -= (pos - np.arange(k, dtype=pos.dtype)) * w.dtype.type(1.0 / (ranked.n_genes - k))
+    w *= scale
+    before = np.subtract(after, w, out=w)
+    high = np.maximum(after.max(axis=-1), 0.0)
+    low = np.minimum(before.min(axis=-1), 0.0)
+    return np.where(np.abs(high) > np.abs(low), high, low)
+
+
+def enrichment_scores(ranked: RankedSets, perms: np.ndarray) -> np.ndarray:
+    """
+    (n_perms, n_sets) enrichment scores for gene -> rank position layouts.
+
+    Row r of `perms` gives the rank position of every gene (np.arange for
+    the observed ranking). Work is done one set size at a time on dense
+    (n_perms, n_sets_k, k) blocks, so sorts and sums stay small.
+    """
+    out = np.empty((len(perms), ranked.n_sets), dtype=np.float64)
+    for k, first, last in ranked.groups:
+        lo, hi = ranked.starts[first], ranked.starts[first] + (last - first) * k
+        pos = perms[:, ranked.members[lo:hi]].reshape(len(perms), last - first, k)
+        pos.sort(axis=-1)
+        out[:, first:last] = _running_extremes(ranked, pos, k)
+    return out
+
+
+def null_scores(ranked: RankedSets, seed: np.random.SeedSequence, n: int) -> np.ndarray:
+    """(n, n_sets) enrichment scores under random gene-label permutations."""
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(n, BATCH_ELEMENTS // max(1, ranked.n_genes)))
+    out = np.empty((n, ranked.n_sets), dtype=np.float32)
+    base = np.arange(ranked.n_genes, dtype=np.int32)
+    for lo in range(0, n, batch):
+        hi = min(n, lo + batch)
+        perms = rng.permuted(np.broadcast_to(base, (hi - lo, len(base))), axis=1)
+        out[lo:hi] = enrichment_scores(ranked, perms)
+    return out
+
+
+def _init_worker(ranked: RankedSets) -> None:
+    global _WORKER_SETS
+    _WORKER_SETS = ranked
+
+
+def _null_in_worker(seed: np.random.SeedSequence, n: int) -> np.ndarray:
+    return null_scores(_WORKER_SETS, seed, n)
+
+
+def permutation_scores(ranked: RankedSets, options: PrerankOptions) -> np.ndarray:
+    """
+    Null enrichment scores for options.permutations gene-label permutations.
+
+    Permutations are split into blocks of options.block_size, each with its
+    own child of SeedSequence(options.seed), so results do not depend on
+    n_jobs. Blocks run on a process pool when n_jobs > 1; the ranked sets are
+    sent to each worker once.
+    """
+    sizes = [options.block_size] * (options.permutations // options.block_size)
+    if options.permutations % options.block_size:
+        sizes.append(options.permutations % options.block_size)
+    seeds = np.random.SeedSequence(options.seed).spawn(len(sizes))
+
+    if options.n_jobs > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(options.n_jobs, len(sizes)), initializer=_init_worker, initargs=(ranked,)
+        ) as pool:
+            blocks = list(pool.map(_null_in_worker, seeds, sizes))
+    else:
+        blocks = [null_scores(ranked, s, n) for s, n in zip(seeds, sizes)]
+    if not blocks:
+        return np.zeros((0, ranked.n_sets), dtype=np.float32)
+    return np.concatenate(blocks)
+
+
+def _fraction_at_least(sorted_values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    if len(sorted_values) == 0:
+        return np.full(len(x), np.nan)
+    return (len(sorted_values) - np.searchsorted(sorted_values, x, side="left")) / len(sorted_values)
+
+
+def significance(es: np.ndarray, null: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    NES, nominal p-values and FDR q-values from observed and null scores.
+
+    Follows GSEA (Subramanian et al. 2005): scores are normalized by the mean
+    null score of the same sign per set, p-values count the same-signed nulls
+    at least as extreme, and the FDR compares the pooled null NES of all sets
+    with the observed NES on the same side.
+    """
+    null = null.astype(np.float64)
+    pos_null = null >= 0
+    n_pos = pos_null.sum(axis=0)
+    n_neg = len(null) - n_pos
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos_mean = np.where(pos_null, null, 0).sum(axis=0) / n_pos
+        neg_mean = -np.where(~pos_null, null, 0).sum(axis=0) / n_neg
+
+        up = es >= 0
+        nes = np.where(up, es / pos_mean, es / neg_mean)
+        null_nes = np.where(pos_null, null / pos_mean, null / neg_mean)
+
+        pval = np.where(
+            up,
+            (pos_null & (null >= es)).sum(axis=0) / n_pos,
+            (~pos_null & (null <= es)).sum(axis=0) / n_neg,
+        )
+
+        pooled = null_nes[np.isfinite(null_nes)]
+        null_up = np.sort(pooled[pooled >= 0])
+        null_down = np.sort(-pooled[pooled < 0])
+        obs = nes[np.isfinite(nes)]
+        obs_up = np.sort(obs[obs >= 0])
+        obs_down = np.sort(-obs[obs < 0])
+
+        fdr = np.full(len(es), np.nan)
+        fdr[up] = _fraction_at_least(null_up, nes[up]) / _fraction_at_least(obs_up, nes[up])
+        fdr[~up] = _fraction_at_least(null_down, -nes[~up]) / _fraction_at_least(obs_down, -nes[~up])
+    return nes, pval, np.minimum(fdr, 1.0)
+
+
+def _leading_edge(ranked: RankedSets, es: np.ndarray, genes: np.ndarray) -> list[tuple]:
+    # Observed layout only: per-set work on small arrays
+    n = ranked.n_genes
+    rows = []
+    for s, (start, size) in enumerate(zip(ranked.starts, ranked.sizes)):
+        p = np.sort(ranked.members[start:start + size])
+        w = ranked.weights[p]
+        total = w.sum() or 1.0
+        j = np.arange(size)
+        if es[s] >= 0:
+            i = int(np.argmax(np.cumsum(w) / total - (p - j) / (n - size)))
+            lead, peak = p[:i + 1], int(p[i]) + 1
+        else:
+            i = int(np.argmin((np.cumsum(w) - w) / total - (p - j) / (n - size)))
+            lead, peak = p[i:], n - int(p[i])
+        rows.append((len(lead) / size, peak / n, ";".join(genes[lead].tolist())))
+    return rows
+
+
+def prerank(
+    ranking: pd.Series,
+    gene_sets: GeneSetCollection,
+    options: PrerankOptions = PrerankOptions(),
+) -> pd.DataFrame:
+    """
+    Preranked GSEA of one ranked list against a gene-set collection.
+
+    `ranking` maps gene -> metric (e.g. read_rnk). Genes are upper-cased to
+    match parse_gmt, ranked by metric (descending), and sets are restricted
+    to the ranked genes before the size filters. Enrichment scores use the
+    weighted running sum (options.weight = 1 is GSEA's default). Returns one
+    row per set with RESULT_COLUMNS, sorted by NES (descending).
+    """
+    if ranking.index.has_duplicates:
+        dups = ranking.index[ranking.index.duplicated()].unique()[:5].tolist()
+        raise ValueError(f"Duplicate genes in ranked list: {dups}")
+    ranking = ranking.dropna()
+    order = np.argsort(-ranking.to_numpy(dtype=np.float64), kind="stable")
+    genes = pd.Index(ranking.index.astype(str).str.strip().str.upper()).to_numpy(dtype=str)[order]
+    metric = ranking.to_numpy(dtype=np.float64)[order]
+
+    sets = gene_sets.restrict_to(genes, options.min_size, options.max_size)
+    if len(sets) == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    sets = sets.subset(np.argsort(sets.sizes, kind="stable"))
+    ranked = RankedSets.build(metric, sets, options.weight)
+    # The reported observed scores and leading edges use float64 weights
+    observed = RankedSets.build(metric, sets, options.weight, dtype=np.float64)
+
+    es = enrichment_scores(observed, np.arange(observed.n_genes, dtype=np.int32)[None, :])[0]
+    null = permutation_scores(ranked, options)
+    nes, pval, fdr = significance(es, null)
+    edges = _leading_edge(observed, es, genes)
+
+    res = pd.DataFrame({
+        "Term": sets.names,
+        "Description": sets.descriptions,
+        "Size": ranked.sizes,
+        "ES": es,
+        "NES": nes,
+        "NOM p-val": pval,
+        "FDR q-val": fdr,
+        "Tag %": [e[0] for e in edges],
+        "Gene %": [e[1] for e in edges],
+        "Lead_genes": [e[2] for e in edges],
+    })
+    return res.sort_values("NES", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from rnaseq_native.fingerprint import file_fingerprint
+from rnaseq_native.genesets import COMPILED_SUFFIX, GeneSetCollection, load_gene_sets
+from rnaseq_native.gsea import PrerankOptions, prerank, read_rnk
+from rnaseq_native.manifest import JsonManifest
+
+GSEA_MANIFEST = "gsea_manifest.json"
+REPORT_FILE = "prerank_report.csv"
+
+# Gene-set libraries loaded by this process: path -> (fingerprint, collection)
+_LIBRARIES: dict[str, tuple[tuple[int, int], GeneSetCollection]] = {}
+
+
+@dataclass(frozen=True)
+class GseaJob:
+    ranked_name: str
+    ranked_path: Path
+    library_name: str
+    library_path: Path
+    outdir: Path
+
+    @property
+    def name(self) -> str:
+        return f"{self.ranked_name}/{self.library_name}"
+
+    @property
+    def report(self) -> Path:
+        return self.outdir / REPORT_FILE
+
+
+@dataclass(frozen=True)
+class GseaJobResult:
+    job: str
+    n_sets: int
+    wall_s: float
+    report: str
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def expand_jobs(
+    ranked: dict[str, str | Path],
+    libraries: dict[str, str | Path],
+    outdir: str | Path,
+) -> list[GseaJob]:
+    """
+    One job per (ranked list, library) pair, written to outdir/<ranked>/<library>.
+
+    Jobs are ordered by library so a worker tends to reuse the library it
+    has already loaded. Missing inputs raise FileNotFoundError up front.
+    """
+    missing = [str(p) for p in [*ranked.values(), *libraries.values()] if not Path(p).exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing GSEA inputs: {missing}")
+    outdir = Path(outdir)
+    return [
+        GseaJob(r_name, Path(r_path), l_name, Path(l_path), outdir / r_name / l_name)
+        for l_name, l_path in libraries.items()
+        for r_name, r_path in ranked.items()
+    ]
+
+
+def _params(options: PrerankOptions) -> dict[str, Any]:
+    # The process count does not change the results, so it does not force a rerun
+    params = asdict(options)
+    params.pop("n_jobs")
+    return params
+
+
+class GseaManifest(JsonManifest):
+    """
+    Record of finished GSEA jobs, stored as JSON in the GSEA output folder.
+
+    A job is up to date when its ranked list, gene-set library, prerank
+    options and report are unchanged (size + mtime), so reruns only schedule
+    new or changed combinations.
+    """
+
+    key = "jobs"
+
+    @staticmethod
+    def _state(job: GseaJob, options: PrerankOptions) -> dict[str, Any]:
+        return {
+            "params": _params(options),
+            "inputs": {
+                "ranked": file_fingerprint(job.ranked_path),
+                "library": file_fingerprint(job.library_path),
+            },
+        }
+
+    def is_current(self, job: GseaJob, options: PrerankOptions) -> bool:
+        entry = self.entries.get(job.name)
+        if entry is None or not job.report.exists():
+            return False
+        state = self._state(job, options)
+        return (entry.get("params") == state["params"]
+                and entry.get("inputs") == state["inputs"]
+                and entry.get("report") == file_fingerprint(job.report))
+
+    def record(self, job: GseaJob, options: PrerankOptions) -> None:
+        self.entries[job.name] = {
+            **self._state(job, options),
+            "report": file_fingerprint(job.report),
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+
+def compiled_library(path: str | Path) -> Path:
+    """Compile a .gmt library once (before workers start); .npz paths are returned as-is."""
+    path = Path(path)
+    if path.suffix == COMPILED_SUFFIX:
+        return path
+    load_gene_sets(path)
+    return path.with_suffix(COMPILED_SUFFIX)
+
+
+def library(path: str | Path) -> GeneSetCollection:
+    """A compiled library, loaded once per process and reloaded only if the file changes."""
+    key = str(Path(path).resolve())
+    fp = file_fingerprint(key)
+    stamp = (fp["size"], fp["mtime_ns"])
+    hit = _LIBRARIES.get(key)
+    if hit is None or hit[0] != stamp:
+        hit = _LIBRARIES[key] = (stamp, load_gene_sets(key))
+    return hit[1]
+
+
+def run_gsea_job(job: GseaJob, options: PrerankOptions) -> GseaJobResult:
+    start = time.perf_counter()
+    try:
+        # run_gsea_jobs compiled the library before starting the workers
+        path = job.library_path
+        gene_sets = library(path if path.suffix == COMPILED_SUFFIX else path.with_suffix(COMPILED_SUFFIX))
+        res = prerank(read_rnk(job.ranked_path), gene_sets, options)
+        job.outdir.mkdir(parents=True, exist_ok=True)
+        res.to_csv(job.report, index=False)
+    except Exception as e:  # reported per job; the other jobs keep running
+        return GseaJobResult(job.name, 0, time.perf_counter() - start, str(job.report),
+                             error=f"{type(e).__name__}: {e}")
+    return GseaJobResult(job.name, len(res), time.perf_counter() - start, str(job.report))
+
+
+def run_gsea_jobs(
+    jobs: list[GseaJob],
+    options: PrerankOptions,
+    max_threads: int = 1,
+    on_complete: Callable[[GseaJob, GseaJobResult], None] | None = None,
+) -> list[GseaJobResult]:
+    """
+    Run GSEA jobs concurrently within a budget of max_threads processes.
+
+    Up to max_threads jobs run at once on a process pool; the budget left
+    over is given to each job's permutation blocks (options.n_jobs), so a
+    single job uses every process. GMT libraries are compiled once here and
+    loaded at most once per worker. on_complete is called in this process
+    as each job finishes. Results keep the order of `jobs`.
+    """
+    if not jobs:
+        return []
+    for path in {j.library_path for j in jobs}:
+        compiled_library(path)
+
+    max_threads = max(1, int(max_threads))
+    n_workers = min(max_threads, len(jobs))
+    job_options = replace(options, n_jobs=max(1, max_threads // n_workers))
+
+    results: dict[str, GseaJobResult] = {}
+    if n_workers == 1:
+        for job in jobs:
+            results[job.name] = run_gsea_job(job, job_options)
+            if on_complete is not None:
+                on_complete(job, results[job.name])
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = {pool.submit(run_gsea_job, job, job_options): job for job in jobs}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                results[job.name] = fut.result()
+                if on_complete is not None:
+                    on_complete(job, results[job.name])
+    return [results[j.name] for j in jobs]
+
+
+@dataclass(frozen=True)
+class GseaStageConfig:
+    jobs: list[GseaJob]
+    options: PrerankOptions
+    outdir: Path
+    max_threads: int = 1
+    incremental: bool = True
+
+
+def gsea_config_from_dict(
+    cfg: dict[str, Any] | None, config_dir: str | Path, root: str | Path
+) -> GseaStageConfig:
+    """
+    Read the `gsea:` section of config.yaml.
+
+    `ranked` and `libraries` map names to files, resolved against the
+    config folder like other inputs; `outdir` is resolved against `root`.
+    """
+    cfg = cfg or {}
+    ranked = cfg.get("ranked") or {}
+    libraries = cfg.get("libraries") or {}
+    if not ranked or not libraries:
+        raise ValueError("gsea.ranked and gsea.libraries must each name at least one file.")
+
+    def resolve(p: str) -> Path:
+        return (Path(config_dir) / p).resolve()
+
+    outdir = (Path(root) / cfg.get("outdir", "results/gsea")).resolve()
+    jobs = expand_jobs(
+        {str(k): resolve(v) for k, v in ranked.items()},
+        {str(k): resolve(v) for k, v in libraries.items()},
+        outdir,
+    )
+    defaults = PrerankOptions()
+    options = PrerankOptions(
+        permutations=int(cfg.get("permutations", defaults.permutations)),
+        min_size=int(cfg.get("min_size", defaults.min_size)),
+        max_size=int(cfg.get("max_size", defaults.max_size)),
+        weight=float(cfg.get("weight", defaults.weight)),
+        seed=int(cfg.get("seed", defaults.seed)),
+    )
+    return GseaStageConfig(
+        jobs=jobs,
+        options=options,
+        outdir=outdir,
+        max_threads=int(cfg.get("max_threads") or os.cpu_count() or 1),
+        incremental=bool(cfg.get("incremental", True)),
+    )
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.fingerprint import content_hash, file_fingerprint
+from rnaseq_native.fsutil import atomic_dir, entry_dir
+
+STRG_COLUMN = "STRG_key"
+TAIR_COLUMN = "Arabidopsis_ID"
+TAIR_OUTPUT_COLUMN = "gene_tair"
+
+DEFAULT_IDMAP_DIR = "results/cache/idmap"
+
+KEYS_FILE = "strg_keys.npy"
+TAIR_FILE = "tair_ids.npy"
+META_FILE = "meta.json"
+
+
+def strip_tair_isoform(ids: pd.Series | Sequence[Any]) -> pd.Series:
+    """
+    Convert Arabidopsis isoform IDs like AT1G11910.1 -> AT1G11910 for a whole column.
+
+    Works on the column at once (str.split), missing values stay missing.
+    """
+    s = ids if isinstance(ids, pd.Series) else pd.Series(ids, dtype=object)
+    return s.astype("string").str.split(".", n=1).str[0].str.strip()
+
+
+def build_strg_tair_pairs(ann_df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Clean STRG_key / Arabidopsis_ID pairs into a sorted one-to-one mapping.
+
+    Returns (keys, tair, n_multi): keys sorted and unique, tair[i] the TAIR
+    gene of keys[i], and the number of STRG keys that had more than one
+    TAIR gene. Those keep the first TAIR ID in sort order, as before.
+    """
+    missing = {STRG_COLUMN, TAIR_COLUMN} - set(ann_df.columns)
+    if missing:
+        raise ValueError(f"Missing columns in annotation file: {sorted(missing)}")
+
+    df = ann_df[[STRG_COLUMN, TAIR_COLUMN]].dropna()
+    keys = df[STRG_COLUMN].astype(str).str.strip().to_numpy(dtype=str)
+    tair = strip_tair_isoform(df[TAIR_COLUMN].astype(str)).to_numpy(dtype=str)
+    keep = (keys != "") & (tair != "") & (tair != "nan")
+    keys, tair = keys[keep], tair[keep]
+
+    # One sort by (key, tair); the first row of each key run is its mapping
+    order = np.lexsort((tair, keys))
+    keys, tair = keys[order], tair[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    ends = np.append(starts[1:], len(keys)) - 1
+    n_multi = int((tair[starts] != tair[ends]).sum())
+    return keys[first], tair[first], n_multi
+
+
+@dataclass(frozen=True)
+class StrgTairIndex:
+    """
+    Sorted STRG-key -> TAIR-ID lookup table.
+
+    `keys` is sorted, so mapping a list of genes is one searchsorted call on
+    the (usually memory-mapped) arrays, with no merge and no per-row Python.
+    """
+
+    keys: np.ndarray
+    tair: np.ndarray
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, ann_df: pd.DataFrame) -> StrgTairIndex:
+        keys, tair, n_multi = build_strg_tair_pairs(ann_df)
+        return cls(keys=keys, tair=tair, meta={"n_multi": n_multi})
+
+    def positions(self, genes: Sequence[Any]) -> np.ndarray:
+        """Index rows of `genes` (whitespace stripped), -1 where unmapped."""
+        query = pd.Series(genes, dtype=object).astype(str).str.strip().to_numpy(dtype=str)
+        if len(self.keys) == 0:
+            return np.full(len(query), -1, dtype=np.int64)
+        pos = np.searchsorted(self.keys, query)
+        pos = np.minimum(pos, len(self.keys) - 1)
+        return np.where(self.keys[pos] == query, pos, -1)
+
+    def lookup(self, genes: Sequence[Any]) -> np.ndarray:
+        """TAIR IDs of `genes` as an object array, None where unmapped."""
+        pos = self.positions(genes)
+        out = np.full(len(pos), None, dtype=object)
+        hit = pos >= 0
+        out[hit] = self.tair[pos[hit]]
+        return out
+
+    def mapping_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({STRG_COLUMN: self.keys, TAIR_COLUMN: self.tair})
+
+    def map_ranked(
+        self,
+        ranked_df: pd.DataFrame,
+        gene_column: str = "gene",
+        metric: str = "rank_metric",
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Map a ranked STRG gene list to TAIR genes for preranked GSEA.
+
+        Returns (mapped, unmapped). `mapped` has gene_tair in front of the
+        ranked columns; if several STRG genes hit the same TAIR gene, the one
+        with the largest |metric| is kept. It is sorted by metric, descending.
+        """
+        missing = {gene_column, metric} - set(ranked_df.columns)
+        if missing:
+            raise ValueError(f"Missing columns in ranked file: {sorted(missing)}")
+
+        genes = ranked_df[gene_column].astype(str).str.strip()
+        pos = self.positions(genes)
+        hit = pos >= 0
+
+        mapped = ranked_df.loc[hit].assign(**{gene_column: genes[hit]})
+        mapped.insert(0, TAIR_OUTPUT_COLUMN, self.tair[pos[hit]])
+        unmapped = ranked_df.loc[~hit].assign(**{gene_column: genes[~hit]})
+
+        # Largest |metric| wins per TAIR gene, then order for GSEA
+        strength = mapped[metric].abs().to_numpy()
+        order = np.argsort(-strength, kind="stable")
+        mapped = mapped.iloc[order].drop_duplicates(subset=[TAIR_OUTPUT_COLUMN], keep="first")
+        mapped = mapped.sort_values(metric, ascending=False, kind="stable")
+        return mapped.reset_index(drop=True), unmapped.reset_index(drop=True)
+
+    def annotate(
+        self,
+        res_df: pd.DataFrame,
+        gene_column: str | None = None,
+        column: str = TAIR_OUTPUT_COLUMN,
+    ) -> pd.DataFrame:
+        """
+        Copy of a result table (e.g. DE results) with a TAIR ID column added.
+
+        Genes are taken from `gene_column`, or from the index if None (the
+        layout of PyDESeq2 results_df). Unmapped genes get None.
+        """
+        genes = res_df.index if gene_column is None else res_df[gene_column]
+        out = res_df.copy()
+        out[column] = self.lookup(genes.tolist())
+        return out
+
+
+def _source_matches(path: Path, meta: dict[str, Any]) -> bool:
+    source = meta.get("source", {})
+    fp = file_fingerprint(path)
+    if source.get("size") != fp["size"]:
+        return False
+    return source.get("mtime_ns") == fp["mtime_ns"] or source.get("hash") == content_hash(path)
+
+
+def write_id_index(directory: str | Path, index: StrgTairIndex) -> Path:
+    """Write an index as two .npy arrays plus a JSON sidecar (tmp dir, then rename)."""
+    directory = Path(directory)
+    with atomic_dir(directory) as tmp:
+        np.save(tmp / KEYS_FILE, np.asarray(index.keys, dtype=str))
+        np.save(tmp / TAIR_FILE, np.asarray(index.tair, dtype=str))
+        payload = dict(index.meta)
+        payload["n_keys"] = int(len(index))
+        (tmp / META_FILE).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return directory
+
+
+def read_id_index(directory: str | Path, mmap: bool = True) -> StrgTairIndex:
+    directory = Path(directory)
+    meta = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+    mode = "r" if mmap else None
+    return StrgTairIndex(
+        keys=np.load(directory / KEYS_FILE, mmap_mode=mode),
+        tair=np.load(directory / TAIR_FILE, mmap_mode=mode),
+        meta=meta,
+    )
+
+
+def load_id_index(
+    annotation_path: str | Path,
+    cache_dir: str | Path | None = DEFAULT_IDMAP_DIR,
+) -> StrgTairIndex:
+    """
+    STRG -> TAIR index for an annotation CSV, built once per file version.
+
+    The index is stored under `cache_dir` (keyed by the resolved path) and
+    memory-mapped on later calls while the file's size and mtime, or else
+    its content hash, are unchanged. Only the STRG_key and Arabidopsis_ID
+    columns are parsed on a rebuild. cache_dir=None builds in memory only.
+    """
+    path = Path(annotation_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Annotation file not found: {path}")
+    path = path.resolve()
+
+    entry = None
+    if cache_dir is not None:
+        entry = entry_dir(path, Path(cache_dir).resolve())
+        meta_path = entry / META_FILE
+        if meta_path.exists() and _source_matches(
+                path, json.loads(meta_path.read_text(encoding="utf-8"))):
+            return read_id_index(entry)
+
+    header = pd.read_csv(path, nrows=0).columns
+    missing = {STRG_COLUMN, TAIR_COLUMN} - set(header)
+    if missing:
+        raise ValueError(f"Missing columns in annotation file: {sorted(missing)}")
+    ann_df = pd.read_csv(path, usecols=[STRG_COLUMN, TAIR_COLUMN], dtype=str)
+    index = StrgTairIndex.from_frame(ann_df)
+    if entry is None:
+        return index
+
+    source = file_fingerprint(path, checksum=True)
+    source["path"] = str(path)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    write_id_index(entry, StrgTairIndex(index.keys, index.tair, {**index.meta, "source": source}))
+    return read_id_index(entry)
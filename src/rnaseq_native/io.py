@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 
@@ -7,6 +9,10 @@ import pandas as pd
 REQUIRED_COLUMNS = ("sample", "tree", "condition", "r1", "r2")
 REQUIRED_COLUMNS_MIN = ("sample", "tree", "condition")
 ALLOWED_CONDITIONS = ("Control", "Protzen")
+# Threads for listing FASTQ folders (network filesystems are latency bound)
+DEFAULT_LIST_THREADS = 16
+# Column -> sample lookup table for pseudobulk aggregation
+BARCODE_COLUMNS = ("barcode", "sample")
 
 
 def load_samples_tsv(
@@ -70,12 +76,78 @@ def load_samples_tsv(
 
     # Optional validation: verify that FASTQ files exist
     if require_fastq and strict_path:
-        missing_paths: list[str] = []
-        for col in ("r1", "r2"):
-            for p in df[col].tolist():
-                if p and not Path(p).exists():
-                    missing_paths.append(p)
+        paths = [p for col in ("r1", "r2") for p in df[col].tolist() if p]
+        missing_paths = find_missing_paths(paths)
         if missing_paths:
             raise FileNotFoundError(f"Missing FASTQ paths: {missing_paths}")
 
     return df
+
+
+def load_barcode_map(path: str | Path) -> pd.Series:
+    """Load the column -> sample lookup table used for pseudobulk aggregation.
+
+    The TSV needs two columns: barcode (a column name of the cell- or
+    replicate-level count matrix) and sample (a sample ID from samples.tsv).
+    Returns a Series indexed by barcode with the sample as value.
+    Exceptions:
+     FileNotFoundError: if the TSV file does not exist.
+     ValueError: if columns are missing, or barcodes are empty or repeated.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Barcode table not found: {path}")
+
+    df = pd.read_csv(path, sep="\t", dtype=str).fillna("")
+    missing = [col for col in BARCODE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(
+            f"Missing required columns in {path.name}: {missing}. Required: {BARCODE_COLUMNS}"
+        )
+    for col in BARCODE_COLUMNS:
+        df[col] = df[col].str.strip()
+
+    if ((df["barcode"] == "") | (df["sample"] == "")).any():
+        raise ValueError(f"Some rows in {path.name} have empty 'barcode' or 'sample' values.")
+    if df["barcode"].duplicated().any():
+        dups = df.loc[df["barcode"].duplicated(), "barcode"].unique().tolist()[:10]
+        raise ValueError(f"Barcodes assigned more than once in {path.name}: {dups}")
+
+    return pd.Series(df["sample"].to_numpy(), index=pd.Index(df["barcode"], name="barcode"), name="sample")
+
+
+def _list_dir(folder: Path) -> set[str] | None:
+    try:
+        return set(os.listdir(folder))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def find_missing_paths(paths: list[str], n_jobs: int = DEFAULT_LIST_THREADS) -> list[str]:
+    """Return the entries of `paths` that do not exist, in input order.
+
+    Instead of one stat per file, each parent folder is listed once and the
+    names are looked up in that listing; folders are listed concurrently on
+    a thread pool, which hides the round trips of network filesystems.
+    """
+    by_folder: dict[Path, None] = {}
+    resolved = []
+    for p in paths:
+        path = Path(p)
+        resolved.append(path)
+        by_folder.setdefault(path.parent, None)
+
+    folders = list(by_folder)
+    if n_jobs > 1 and len(folders) > 1:
+        with ThreadPoolExecutor(max_workers=min(n_jobs, len(folders))) as pool:
+            listings = dict(zip(folders, pool.map(_list_dir, folders)))
+    else:
+        listings = {f: _list_dir(f) for f in folders}
+
+    missing: list[str] = []
+    for p, path in zip(paths, resolved):
+        names = listings[path.parent]
+        # Names absent from the listing get one real check (case-insensitive filesystems)
+        if (names is None or path.name not in names) and not path.exists():
+            missing.append(p)
+    return missing
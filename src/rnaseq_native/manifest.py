@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+
+class JsonManifest:
+    """
+    Per-item records of finished work, stored as {key: {name: entry}} in a
+    JSON file. Subclasses set `key` and define is_current/record; save()
+    writes a temporary file and renames it so a crash never leaves half a
+    manifest.
+    """
+
+    key = "entries"
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, Any]] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8")).get(self.key, {})
+
+    def forget(self, name: str) -> None:
+        self.entries.pop(name, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({self.key: self.entries}, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
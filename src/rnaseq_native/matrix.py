@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.cache import (
+    CountCacheConfig,
+    load_count_block_cached,
+    read_count_block,
+    write_count_block,
+)
+from rnaseq_native.counts import REQUIRED_GENE_COLUMN
+
+
+@dataclass(frozen=True)
+class CountMatrix:
+    """
+    A count matrix held once, sample-major: values[i, j] = count of gene j in sample i.
+
+    `values` is C-contiguous (each sample is one contiguous row) and is usually
+    a read-only np.memmap from the count cache. Gene filters are recorded as
+    `gene_index` (positions into `genes`) instead of copying the block; only
+    to_array() materialises the kept genes, once.
+    """
+    values: np.ndarray
+    genes: np.ndarray
+    samples: list[str]
+    gene_index: np.ndarray | None = None
+
+    def __post_init__(self) -> None:
+        if self.values.ndim != 2 or self.values.shape != (len(self.samples), len(self.genes)):
+            raise ValueError(
+                f"values must be (samples x genes) = ({len(self.samples)}, {len(self.genes)}), "
+                f"got {self.values.shape}")
+        if not self.values.flags.c_contiguous:
+            raise ValueError("values must be C-contiguous (sample-major).")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> CountMatrix:
+        """
+        Build from a Geneid-first count frame (as returned by the loaders).
+
+        The sample columns are transposed into a sample-major block (one copy);
+        use from_cache to map a cached block without copying.
+        """
+        samples = list(df.columns[1:])
+        values = np.ascontiguousarray(df[samples].to_numpy().T)
+        genes = df[REQUIRED_GENE_COLUMN].to_numpy(dtype=str)
+        return cls(values=values, genes=genes, samples=samples)
+
+    @classmethod
+    def from_cache(cls, path: str | Path, cache: CountCacheConfig | None = None) -> CountMatrix:
+        """Memory-map a count matrix through the count cache (parsing it on a miss)."""
+        values, genes, samples = load_count_block_cached(path, cache)
+        return cls(values=values, genes=genes, samples=samples)
+
+    @classmethod
+    def load(cls, directory: str | Path, mmap: bool = True) -> CountMatrix:
+        values, genes, samples, _ = read_count_block(directory, mmap=mmap)
+        return cls(values=values, genes=genes, samples=samples)
+
+    def save(self, directory: str | Path) -> Path:
+        """Write the kept genes in the binary count format (see write_count_block)."""
+        return write_count_block(directory, self.to_array(), self.kept_genes, self.samples)
+
+    def header_frame(self) -> pd.DataFrame:
+        """Empty Geneid + samples frame, for helpers that only read column names."""
+        return pd.DataFrame(columns=[REQUIRED_GENE_COLUMN, *self.samples])
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.samples)
+
+    @property
+    def n_genes(self) -> int:
+        return len(self.genes) if self.gene_index is None else len(self.gene_index)
+
+    @property
+    def kept_genes(self) -> np.ndarray:
+        return self.genes if self.gene_index is None else self.genes[self.gene_index]
+
+    def gene_totals(self) -> np.ndarray:
+        """Total count per kept gene (summed over the contiguous sample rows)."""
+        totals = self.values.sum(axis=0, dtype=np.uint64)
+        return totals if self.gene_index is None else totals[self.gene_index]
+
+    def filter_min_total(self, min_total: int) -> CountMatrix:
+        """Keep genes whose total count over all samples is >= min_total (no copy)."""
+        totals = self.gene_totals()
+        keep = np.flatnonzero(totals >= min_total)
+        if self.gene_index is not None:
+            keep = self.gene_index[keep]
+        elif len(keep) == len(self.genes):
+            return self
+        return replace(self, gene_index=keep)
+
+    def to_array(self) -> np.ndarray:
+        """
+        Return the (samples x kept genes) block.
+
+        Without a gene filter this is `values` itself (no copy); otherwise the
+        kept columns are gathered into one new C-contiguous array.
+        """
+        if self.gene_index is None:
+            return self.values
+        return np.take(self.values, self.gene_index, axis=1)
+
+    def to_frame(self) -> pd.DataFrame:
+        """samples x genes DataFrame around to_array() (index=samples, columns=genes)."""
+        return pd.DataFrame(
+            self.to_array(), index=pd.Index(self.samples), columns=self.kept_genes, copy=False)
+
+    def to_anndata(self, metadata: pd.DataFrame):
+        """
+        Wrap to_array() in an AnnData for DeseqDataSet(adata=...).
+
+        metadata must be indexed by sample, in the same order as self.samples.
+        """
+        import anndata as ad
+
+        if metadata.index.astype(str).tolist() != self.samples:
+            raise ValueError(
+                "metadata index must match the count matrix sample order.")
+        return ad.AnnData(
+            X=self.to_array(),
+            obs=metadata,
+            var=pd.DataFrame(index=pd.Index(self.kept_genes.astype(str))),
+        )
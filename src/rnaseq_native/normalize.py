@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+from scipy.stats import trim_mean
+
+from rnaseq_native.fsutil import atomic_dir
+
+DEFAULT_CHUNK_SIZE = 4096
+SIZE_FACTORS_FILE = "size_factors.npy"
+NORMED_FILE = "normed_counts.npy"
+VST_FILE = "vst_counts.npy"
+GENES_FILE = "genes.npy"
+META_FILE = "meta.json"
+
+_MIN_DISP = 1e-8
+
+
+def _chunks(n: int, chunk_size: int) -> range:
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be >= 1, got {chunk_size}")
+    return range(0, n, chunk_size)
+
+
+def _log_chunk(counts: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.log(np.asarray(counts[:, lo:hi], dtype=np.float64))
+
+
+def _log_ratio_bins(log_ratios: np.ndarray, lo: float, width: float, n_bins: int) -> np.ndarray:
+    return np.clip(((log_ratios - lo) / width).astype(np.int64), 0, n_bins - 1)
+
+
+def size_factors(
+    counts: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE, n_bins: int = 4096
+) -> np.ndarray:
+    """
+    Median-of-ratios size factors of a (samples x genes) block, as PyDESeq2.
+
+    Genes with a zero in any sample are skipped. Log counts are only ever
+    formed one gene chunk at a time: pass 1 gets each gene's mean log count,
+    pass 2 histograms each sample's log ratios, and pass 3 keeps only the
+    ratios in the bins holding the median, so the median is exact without
+    a full (samples x genes) log matrix.
+    """
+    n_samples, n_genes = counts.shape
+    bounds = _chunks(n_genes, chunk_size)
+    log_means = np.empty(n_genes)
+    log_max = 0.0
+    for lo in bounds:
+        hi = min(lo + chunk_size, n_genes)
+        lc = _log_chunk(counts, lo, hi)
+        log_means[lo:hi] = lc.mean(axis=0)
+        finite = np.isfinite(log_means[lo:hi])
+        if finite.any():
+            log_max = max(log_max, float(lc[:, finite].max()))
+
+    valid = np.isfinite(log_means)
+    n_valid = int(valid.sum())
+    if n_valid == 0:
+        raise ValueError("Every gene has a zero count in some sample; median-of-ratios is undefined.")
+    # Counts of kept genes are >= 1, so every log ratio lies in [-max mean, log_max - min mean]
+    low = -float(log_means[valid].max())
+    width = (log_max - float(log_means[valid].min()) - low) / n_bins or 1.0
+
+    def ratio_chunks():
+        for lo in bounds:
+            hi = min(lo + chunk_size, n_genes)
+            keep = valid[lo:hi]
+            if keep.any():
+                yield _log_chunk(counts, lo, hi)[:, keep] - log_means[lo:hi][keep]
+
+    rows = np.arange(n_samples)[:, None] * n_bins
+    hist = np.zeros(n_samples * n_bins, dtype=np.int64)
+    for lr in ratio_chunks():
+        hist += np.bincount((rows + _log_ratio_bins(lr, low, width, n_bins)).ravel(),
+                            minlength=n_samples * n_bins)
+    cum = np.cumsum(hist.reshape(n_samples, n_bins), axis=1)
+
+    # Bins holding the two middle ranks (equal when n_valid is odd)
+    ranks = np.array([(n_valid - 1) // 2, n_valid // 2])
+    first = np.array([np.searchsorted(c, ranks, side="right") for c in cum])
+    before = np.where(first[:, 0] > 0, cum[np.arange(n_samples), first[:, 0] - 1], 0)
+
+    picked: list[list[np.ndarray]] = [[] for _ in range(n_samples)]
+    for lr in ratio_chunks():
+        b = _log_ratio_bins(lr, low, width, n_bins)
+        sel = (b >= first[:, :1]) & (b <= first[:, 1:])
+        for i in range(n_samples):
+            picked[i].append(lr[i, sel[i]])
+
+    log_medians = np.empty(n_samples)
+    for i in range(n_samples):
+        vals = np.concatenate(picked[i])
+        k = ranks - before[i]
+        part = np.partition(vals, k)
+        log_medians[i] = (part[k[0]] + part[k[1]]) / 2
+    return np.exp(log_medians)
+
+
+def vst_transform(normed: np.ndarray, trend: tuple[float, float]) -> np.ndarray:
+    """
+    DESeq2's variance-stabilizing transform of normalized counts for the
+    dispersion trend a0 + a1 / mean (a1 = 0 is the mean-dispersion case).
+    """
+    a0, a1 = trend
+    aq = a0 * np.asarray(normed, dtype=np.float64)
+    out = np.sqrt(aq * (1.0 + a1 + aq))
+    out *= 2.0
+    out += 1.0 + a1
+    out += 2.0 * aq
+    out /= 4.0 * a0
+    return np.log2(out, out=out)
+
+
+def moments_dispersions(
+    counts: np.ndarray, factors: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> tuple[np.ndarray, np.ndarray]:
+    """Per-gene normalized means and method-of-moments dispersions (chunked)."""
+    n_genes = counts.shape[1]
+    xim = float(np.mean(1.0 / factors))
+    means = np.empty(n_genes)
+    disps = np.empty(n_genes)
+    for lo in _chunks(n_genes, chunk_size):
+        hi = min(lo + chunk_size, n_genes)
+        normed = counts[:, lo:hi] / factors[:, None]
+        m = normed.mean(axis=0)
+        v = normed.var(axis=0, ddof=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            disps[lo:hi] = (v - xim * m) / (m * m)
+        means[lo:hi] = m
+    return means, disps
+
+
+def _gamma_trend(means: np.ndarray, disps: np.ndarray) -> tuple[float, float] | None:
+    # Gamma GLM (identity link) of disp ~ a0 + a1 / mean by IRLS
+    X = np.column_stack([np.ones(len(means)), 1.0 / means])
+    coef = np.array([1.0, 1.0])
+    for _ in range(100):
+        pred = X @ coef
+        if np.any(pred <= 0):
+            return None
+        w = 1.0 / (pred * pred)
+        new = np.linalg.solve((X * w[:, None]).T @ X, (X * w[:, None]).T @ disps)
+        if np.allclose(new, coef, rtol=1e-10, atol=0):
+            coef = new
+            break
+        coef = new
+    return float(coef[0]), float(coef[1])
+
+
+def fit_vst_trend(means: np.ndarray, disps: np.ndarray) -> tuple[float, float]:
+    """
+    Parametric dispersion trend (a0, a1) fitted as DESeq2 does (robust gamma
+    GLM, refitted without genes whose dispersion is < 1e-4 or >= 15 times
+    the curve), from blind moments dispersions instead of per-gene MLEs.
+    Falls back to the mean dispersion (a1 = 0) if the fit breaks down.
+    """
+    use = np.isfinite(disps) & (means > 0) & (disps > 10 * _MIN_DISP)
+    m, d = means[use], disps[use]
+    if len(m) == 0:
+        raise ValueError("No genes with positive dispersion to fit a VST trend.")
+    old = np.array([0.1, 0.1])
+    coef = np.array([1.0, 1.0])
+    while (coef > 1e-10).all() and (np.log(np.abs(coef / old)) ** 2).sum() >= 1e-6:
+        old = coef
+        fitted = _gamma_trend(m, d)
+        if fitted is None or min(fitted) <= 1e-10:
+            return float(trim_mean(d, proportiontocut=0.001)), 0.0
+        coef = np.array(fitted)
+        ratio = d / (coef[0] + coef[1] / m)
+        keep = (ratio >= 1e-4) & (ratio < 15)
+        m, d = m[keep], d[keep]
+    return float(coef[0]), float(coef[1])
+
+
+@dataclass(frozen=True)
+class NormalizedCounts:
+    """
+    Size factors, normalized counts and VST values of one count matrix.
+
+    normed and vst are (samples x genes) float32 blocks, usually read-only
+    np.memmaps from write_normalized; meta holds the VST trend and the key
+    of the inputs they were computed from.
+    """
+
+    size_factors: np.ndarray
+    normed: np.ndarray
+    vst: np.ndarray
+    genes: np.ndarray
+    samples: list[str]
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, directory: str | Path, mmap: bool = True) -> NormalizedCounts:
+        directory = Path(directory)
+        meta = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        return cls(
+            size_factors=np.load(directory / SIZE_FACTORS_FILE),
+            normed=np.load(directory / NORMED_FILE, mmap_mode=mode),
+            vst=np.load(directory / VST_FILE, mmap_mode=mode),
+            genes=np.load(directory / GENES_FILE),
+            samples=list(meta["samples"]),
+            meta=meta,
+        )
+
+
+def write_normalized(
+    directory: str | Path,
+    counts: np.ndarray,
+    genes: Sequence[str],
+    samples: Sequence[str],
+    key: dict[str, Any] | None = None,
+    trend: tuple[float, float] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> NormalizedCounts:
+    """
+    Normalize a (samples x genes) count block and store it for reuse.
+
+    Size factors are median-of-ratios; the VST uses `trend` or, by default,
+    a blind trend fitted to moments dispersions. Normalized and VST values
+    are written chunk by chunk into .npy memmaps under a temporary directory
+    that is renamed into place. Returns the stored (memory-mapped) result.
+    """
+    directory = Path(directory)
+    n_samples, n_genes = counts.shape
+    if (n_samples, n_genes) != (len(samples), len(genes)):
+        raise ValueError(
+            f"counts shape {counts.shape} does not match {len(samples)} samples x {len(genes)} genes")
+
+    factors = size_factors(counts, chunk_size)
+    if trend is None:
+        trend = fit_vst_trend(*moments_dispersions(counts, factors, chunk_size))
+
+    with atomic_dir(directory) as tmp:
+        np.save(tmp / SIZE_FACTORS_FILE, factors)
+        np.save(tmp / GENES_FILE, np.asarray(genes, dtype=str))
+        normed = np.lib.format.open_memmap(tmp / NORMED_FILE, mode="w+", dtype=np.float32,
+                                           shape=(n_samples, n_genes))
+        vst = np.lib.format.open_memmap(tmp / VST_FILE, mode="w+", dtype=np.float32,
+                                        shape=(n_samples, n_genes))
+        for lo in _chunks(n_genes, chunk_size):
+            hi = min(lo + chunk_size, n_genes)
+            block = counts[:, lo:hi] / factors[:, None]
+            normed[:, lo:hi] = block
+            vst[:, lo:hi] = vst_transform(block, trend)
+        normed.flush()
+        vst.flush()
+        del normed, vst
+
+        meta = {
+            "samples": list(samples),
+            "n_genes": int(n_genes),
+            "vst_trend": {"a0": trend[0], "a1": trend[1]},
+            "key": key or {},
+        }
+        (tmp / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return NormalizedCounts.load(directory)
+
+
+def load_normalized(
+    directory: str | Path,
+    counts: np.ndarray,
+    genes: Sequence[str],
+    samples: Sequence[str],
+    key: dict[str, Any],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> NormalizedCounts:
+    """
+    Stored normalization for `key` (e.g. counts fingerprint + filters), or a
+    fresh one written to `directory` when the stored key, genes or samples differ.
+    """
+    directory = Path(directory)
+    if (directory / META_FILE).exists():
+        try:
+            stored = NormalizedCounts.load(directory)
+        except (OSError, ValueError, KeyError):
+            stored = None
+        if (stored is not None and stored.meta.get("key") == key
+                and stored.samples == list(samples)
+                and np.array_equal(stored.genes, np.asarray(genes, dtype=str))):
+            return stored
+    return write_normalized(directory, counts, genes, samples, key=key, chunk_size=chunk_size)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.genesets import GeneSetCollection
+
+ORA_COLUMNS = [
+    "Term", "Description", "Size", "Overlap", "Expected", "Fold", "pvalue", "padj", "Genes",
+]
+
+# log(i!) for i = 0..len-1, grown on demand and shared by all calls
+_LOG_FACTORIALS = np.zeros(1)
+_LOG_FACTORIALS_LOCK = threading.Lock()
+
+
+def log_factorials(n: int) -> np.ndarray:
+    """Table of log(i!) for i = 0..n (cached; extended when a larger n is asked for)."""
+    global _LOG_FACTORIALS
+    with _LOG_FACTORIALS_LOCK:
+        if len(_LOG_FACTORIALS) <= n:
+            size = max(n + 1, 2 * len(_LOG_FACTORIALS))
+            table = np.zeros(size)
+            np.cumsum(np.log(np.arange(1, size)), out=table[1:])
+            _LOG_FACTORIALS = table
+        return _LOG_FACTORIALS
+
+
+def hypergeom_sf(k: np.ndarray, n_set: np.ndarray, n_drawn: int, n_total: int) -> np.ndarray:
+    """
+    P(X >= k) for X ~ Hypergeometric(n_total genes, n_set in the set, n_drawn drawn).
+
+    Vectorized over sets: the tail terms of all sets are laid out in one
+    flat array, evaluated in log space from the log-factorial table and
+    summed per set with a log-sum-exp. k = 0 gives 1.
+    """
+    k = np.asarray(k, dtype=np.int64)
+    n_set = np.asarray(n_set, dtype=np.int64)
+    out = np.ones(len(k))
+    todo = np.flatnonzero(k > 0)
+    if len(todo) == 0:
+        return out
+
+    lf = log_factorials(n_total)
+    kk, big_k = k[todo], n_set[todo]
+    upper = np.minimum(big_k, n_drawn)
+    lengths = upper - kk + 1
+    starts = np.zeros(len(todo), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    seg = np.repeat(np.arange(len(todo)), lengths)
+    i = np.arange(lengths.sum()) - starts[seg] + kk[seg]
+    kx = big_k[seg]
+
+    def log_comb(a: np.ndarray | int, b: np.ndarray | int) -> np.ndarray:
+        return lf[a] - lf[b] - lf[np.subtract(a, b)]
+
+    log_p = log_comb(kx, i) + log_comb(n_total - kx, n_drawn - i) - log_comb(n_total, n_drawn)
+    peak = np.maximum.reduceat(log_p, starts)
+    tail = np.log(np.add.reduceat(np.exp(log_p - peak[seg]), starts)) + peak
+    out[todo] = np.minimum(np.exp(tail), 1.0)
+    return out
+
+
+def bh_adjust(pvalues: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (NaN stays NaN)."""
+    p = np.asarray(pvalues, dtype=np.float64)
+    out = np.full(len(p), np.nan)
+    ok = np.flatnonzero(np.isfinite(p))
+    if len(ok) == 0:
+        return out
+    order = ok[np.argsort(p[ok], kind="stable")]
+    scaled = p[order] * len(ok) / np.arange(1, len(ok) + 1)
+    out[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return out
+
+
+def ora(
+    significant: Sequence[str],
+    universe: Sequence[str],
+    gene_sets: GeneSetCollection,
+    min_size: int = 1,
+    max_size: int | None = None,
+) -> pd.DataFrame:
+    """
+    Over-representation analysis of a significant gene list.
+
+    Sets are restricted to the universe (all tested genes) before the size
+    filters. Overlaps are counted on a boolean mask over the universe in one
+    pass over all set members; p-values are one-sided hypergeometric tails
+    with BH-adjusted padj. Genes are upper-cased to match parse_gmt. Returns
+    ORA_COLUMNS, sorted by pvalue.
+    """
+    universe = pd.Index(pd.Series(list(universe), dtype=object).astype(str).str.strip().str.upper()).unique()
+    sig = pd.Index(pd.Series(list(significant), dtype=object).astype(str).str.strip().str.upper()).unique()
+    sig = sig[universe.get_indexer(sig) >= 0]
+
+    sets = gene_sets.restrict_to(universe.to_numpy(dtype=str), min_size, max_size)
+    if len(sets) == 0:
+        return pd.DataFrame(columns=ORA_COLUMNS)
+
+    hit = np.zeros(len(universe), dtype=bool)
+    hit[universe.get_indexer(sig)] = True
+    member_hit = hit[sets.indices]
+    overlap = np.bincount(sets.set_ids()[member_hit], minlength=len(sets))
+    size = sets.sizes
+
+    n_total, n_drawn = len(universe), len(sig)
+    pvalue = hypergeom_sf(overlap, size, n_drawn, n_total)
+    expected = size * n_drawn / n_total if n_total else np.zeros(len(sets))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fold = np.where(expected > 0, overlap / expected, np.nan)
+
+    hit_genes = sets.genes[sets.indices[member_hit]]
+    bounds = np.concatenate([[0], np.cumsum(overlap)])
+    genes = [";".join(hit_genes[bounds[i]:bounds[i + 1]].tolist()) for i in range(len(sets))]
+
+    res = pd.DataFrame({
+        "Term": sets.names,
+        "Description": sets.descriptions,
+        "Size": size,
+        "Overlap": overlap,
+        "Expected": expected,
+        "Fold": fold,
+        "pvalue": pvalue,
+        "padj": bh_adjust(pvalue),
+        "Genes": genes,
+    })
+    return res.sort_values(["pvalue", "Term"], kind="stable").reset_index(drop=True)
+
+
+def ora_from_results(
+    res_df: pd.DataFrame,
+    gene_sets: GeneSetCollection,
+    alpha: float = 0.05,
+    gene_column: str | None = None,
+    min_size: int = 1,
+    max_size: int | None = None,
+) -> pd.DataFrame:
+    """
+    ORA of a DE result table: padj < alpha against every gene with a padj.
+
+    Gene IDs come from `gene_column`, else from gene_tair if the table was
+    annotated (see idmap), else from the index.
+    """
+    if gene_column is None and "gene_tair" in res_df.columns:
+        gene_column = "gene_tair"
+    genes = pd.Series(res_df.index if gene_column is None else res_df[gene_column].to_numpy(),
+                      index=res_df.index)
+    padj = res_df["padj"].astype(float)
+    tested = padj.notna() & genes.notna()
+    sig = tested & (padj < alpha)
+    return ora(genes[sig].tolist(), genes[tested].tolist(), gene_sets, min_size, max_size)
+
+
+def ora_options_from_dict(cfg: dict[str, Any] | None, root: str | Path) -> dict[str, Any] | None:
+    """
+    Read the `enrichment.ora` section of config.yaml.
+
+    Returns None if it is missing or not enabled; otherwise gene_sets is
+    resolved against `root` (the config folder).
+    """
+    if not cfg or not cfg.get("enabled", False):
+        return None
+    if "gene_sets" not in cfg:
+        raise ValueError("enrichment.ora.gene_sets is required when ORA is enabled.")
+    path = Path(cfg["gene_sets"])
+    if not path.is_absolute():
+        path = Path(root) / path
+    max_size = cfg.get("max_size")
+    return {
+        "gene_sets": str(path.resolve()),
+        "min_size": int(cfg.get("min_size", 1)),
+        "max_size": int(max_size) if max_size is not None else None,
+    }
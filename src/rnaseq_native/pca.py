@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.fsutil import atomic_dir
+
+DEFAULT_N_TOP = 500
+DEFAULT_N_COMPONENTS = 10
+SCORES_FILE = "scores.npy"
+LOADINGS_FILE = "loadings.npy"
+VARIANCE_FILE = "explained_variance.npy"
+GENES_FILE = "genes.npy"
+META_FILE = "meta.json"
+
+
+def gene_variances(X: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+    """Per-gene variance (ddof=1) of a (samples x genes) block, one gene chunk at a time."""
+    n_genes = X.shape[1]
+    out = np.empty(n_genes)
+    for lo in range(0, n_genes, chunk_size):
+        out[lo:lo + chunk_size] = np.asarray(X[:, lo:lo + chunk_size], dtype=np.float64).var(axis=0, ddof=1)
+    return out
+
+
+def top_variable_genes(variances: np.ndarray, n_top: int) -> np.ndarray:
+    """
+    Positions of the n_top largest variances, most variable first.
+
+    argpartition selects them in linear time; only the n_top picks are sorted.
+    """
+    n_top = min(int(n_top), len(variances))
+    if n_top <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(variances, len(variances) - n_top)[len(variances) - n_top:]
+    return top[np.argsort(-variances[top], kind="stable")]
+
+
+@dataclass(frozen=True)
+class PcaResult:
+    """
+    PCA of the top-variance genes.
+
+    scores is (samples x K), loadings (K x top genes); explained_variance
+    is per component and total_variance the summed variance of the genes
+    used, so explained_variance / total_variance is the variance ratio.
+    """
+
+    scores: np.ndarray
+    loadings: np.ndarray
+    explained_variance: np.ndarray
+    genes: np.ndarray
+    samples: list[str]
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def n_components(self) -> int:
+        return self.scores.shape[1]
+
+    @property
+    def explained_variance_ratio(self) -> np.ndarray:
+        return self.explained_variance / float(self.meta["total_variance"])
+
+    def save(self, directory: str | Path) -> Path:
+        """Write as .npy arrays plus a JSON sidecar (tmp dir, then rename)."""
+        directory = Path(directory)
+        with atomic_dir(directory) as tmp:
+            np.save(tmp / SCORES_FILE, self.scores)
+            np.save(tmp / LOADINGS_FILE, self.loadings)
+            np.save(tmp / VARIANCE_FILE, self.explained_variance)
+            np.save(tmp / GENES_FILE, np.asarray(self.genes, dtype=str))
+            payload = dict(self.meta, samples=list(self.samples))
+            (tmp / META_FILE).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        return directory
+
+    @classmethod
+    def load(cls, directory: str | Path) -> PcaResult:
+        directory = Path(directory)
+        if not (directory / META_FILE).exists():
+            raise FileNotFoundError(f"PCA cache not found: {directory}")
+        meta = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+        return cls(
+            scores=np.load(directory / SCORES_FILE),
+            loadings=np.load(directory / LOADINGS_FILE),
+            explained_variance=np.load(directory / VARIANCE_FILE),
+            genes=np.load(directory / GENES_FILE),
+            samples=list(meta.pop("samples")),
+            meta=meta,
+        )
+
+
+def run_pca(
+    X: np.ndarray,
+    genes: Sequence[str],
+    samples: Sequence[str],
+    n_top: int = DEFAULT_N_TOP,
+    n_components: int = DEFAULT_N_COMPONENTS,
+    seed: int = 0,
+) -> PcaResult:
+    """
+    PCA of a (samples x genes) block such as the stored VST.
+
+    Gene variances are computed chunk by chunk (a memmap streams), the
+    n_top most variable genes are gathered once and centered, and K
+    components come from a randomized SVD with signs fixed by svd_flip,
+    so reruns give the same scores.
+    """
+    from sklearn.utils.extmath import randomized_svd, svd_flip
+
+    n_samples = X.shape[0]
+    if n_samples < 2:
+        raise ValueError("PCA needs at least 2 samples.")
+    variances = gene_variances(X)
+    top = top_variable_genes(variances, n_top)
+    block = np.take(X, top, axis=1).astype(np.float64)
+    block -= block.mean(axis=0)
+
+    k = max(1, min(int(n_components), n_samples - 1, len(top)))
+    u, s, vt = randomized_svd(block, k, n_oversamples=10, n_iter=7, random_state=seed,
+                              flip_sign=False)
+    u, vt = svd_flip(u, vt)
+    return PcaResult(
+        scores=u * s,
+        loadings=vt,
+        explained_variance=s**2 / (n_samples - 1),
+        genes=np.asarray(genes, dtype=str)[top],
+        samples=list(samples),
+        meta={"total_variance": float(variances[top].sum()), "n_top": int(n_top),
+              "n_components": k, "seed": int(seed)},
+    )
+
+
+def load_pca(
+    directory: str | Path,
+    X: np.ndarray,
+    genes: Sequence[str],
+    samples: Sequence[str],
+    key: dict[str, Any],
+    n_top: int = DEFAULT_N_TOP,
+    n_components: int = DEFAULT_N_COMPONENTS,
+    seed: int = 0,
+) -> PcaResult:
+    """Cached run_pca: reused while `key` (the inputs), samples and settings match."""
+    directory = Path(directory)
+    settings = {"n_top": int(n_top), "n_components_requested": int(n_components), "seed": int(seed)}
+    if (directory / META_FILE).exists():
+        cached = PcaResult.load(directory)
+        if (cached.meta.get("key") == key and cached.samples == list(samples)
+                and all(cached.meta.get(k) == v for k, v in settings.items())):
+            return cached
+    result = run_pca(X, genes, samples, n_top=n_top, n_components=n_components, seed=seed)
+    result.meta.update(settings, key=key)
+    result.save(directory)
+    return result
+
+
+def plot_scree(result: PcaResult, outpath: Path) -> Path:
+    import matplotlib.pyplot as plt
+
+    ratio = result.explained_variance_ratio * 100
+    pcs = np.arange(1, len(ratio) + 1)
+    fig, ax = plt.subplots()
+    ax.bar(pcs, ratio)
+    ax.plot(pcs, np.cumsum(ratio), marker="o", color="black", label="cumulative")
+    ax.set_xlabel("Principal component")
+    ax.set_ylabel("Variance explained (%)")
+    ax.set_xticks(pcs)
+    ax.set_title(f"Scree plot (top {len(result.genes)} variable genes)")
+    ax.legend()
+    outpath.parent.mkdir(parents=True, exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(outpath, dpi=200)
+    plt.close(fig)
+    return outpath
+
+
+def plot_pc_pairs(
+    result: PcaResult,
+    labels: Sequence[Any] | None,
+    outpath: Path,
+    pairs: Sequence[tuple[int, int]] = ((0, 1), (0, 2), (1, 2)),
+    title: str = "PCA",
+    annotate: bool = False,
+) -> Path:
+    """Scatter each PC pair side by side, coloured by `labels` (one per sample)."""
+    import matplotlib.pyplot as plt
+
+    pairs = [(a, b) for a, b in pairs if max(a, b) < result.n_components]
+    if not pairs:
+        raise ValueError(f"No PC pair fits in {result.n_components} component(s).")
+    ratio = result.explained_variance_ratio * 100
+    fig, axes = plt.subplots(1, len(pairs), figsize=(4.5 * len(pairs), 4.2), squeeze=False)
+    groups = pd.Series(list(labels) if labels is not None else [""] * len(result.samples)).astype(str)
+    for ax, (a, b) in zip(axes[0], pairs):
+        for name, idx in groups.groupby(groups, sort=True).groups.items():
+            ax.scatter(result.scores[idx, a], result.scores[idx, b], s=40, alpha=0.8,
+                       label=name or None)
+        if annotate:
+            for i, name in enumerate(result.samples):
+                ax.text(result.scores[i, a], result.scores[i, b], name, fontsize=8)
+        ax.set_xlabel(f"PC{a + 1} ({ratio[a]:.1f}%)")
+        ax.set_ylabel(f"PC{b + 1} ({ratio[b]:.1f}%)")
+    if labels is not None:
+        axes[0][-1].legend(fontsize=8, loc="best")
+    fig.suptitle(title)
+    outpath.parent.mkdir(parents=True, exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(outpath, dpi=200)
+    plt.close(fig)
+    return outpath
+
+
+def render_pca_plots(
+    result: PcaResult,
+    metadata: pd.DataFrame,
+    outdir: Path,
+    color_by: Sequence[str] = ("tree", "condition"),
+) -> list[Path]:
+    """
+    All PCA plots from a (cached) result: pca.png (PC1 vs PC2 with sample
+    names), scree.png and one pca_<column>.png of PC pairs per metadata column.
+
+    metadata is indexed by sample; rows are matched to result.samples.
+    """
+    missing = [c for c in color_by if c not in metadata.columns]
+    if missing:
+        raise ValueError(f"PCA color_by columns not in sample metadata: {missing}")
+    meta = metadata.reindex([str(s) for s in result.samples])
+    first = meta[color_by[0]].tolist() if color_by else None
+
+    paths = [plot_scree(result, outdir / "scree.png")]
+    if result.n_components < 2:
+        return paths
+    paths.append(plot_pc_pairs(result, first, outdir / "pca.png", pairs=[(0, 1)],
+                               title="PCA (VST counts)", annotate=True))
+    for column in color_by:
+        paths.append(plot_pc_pairs(result, meta[column].tolist(), outdir / f"pca_{column}.png",
+                                   title=f"PCA by {column}"))
+    return paths
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+PLOT_FORMATS = ("png", "svg", "pdf")
+
+
+@dataclass(frozen=True)
+class PlotOptions:
+    """
+    formats: any of PLOT_FORMATS. bins: 2-D histogram resolution of the
+    density layer. max_points: cap on individually drawn points (the most
+    extreme are kept), which bounds SVG/PDF size whatever the gene count.
+    """
+
+    formats: tuple[str, ...] = ("png",)
+    dpi: int = 150
+    bins: int = 200
+    max_points: int = 2000
+    n_workers: int = 1
+
+
+def plot_options_from_dict(cfg: dict | None) -> PlotOptions:
+    """Read the `analysis.plots` section of config.yaml (plan key "plots")."""
+    cfg = cfg or {}
+    defaults = PlotOptions()
+    formats = tuple(str(f).lower().lstrip(".") for f in cfg.get("formats", defaults.formats))
+    bad = [f for f in formats if f not in PLOT_FORMATS]
+    if bad or not formats:
+        raise ValueError(f"plot formats must be a non-empty subset of {PLOT_FORMATS}, got {list(formats)}")
+    return PlotOptions(
+        formats=formats,
+        dpi=int(cfg.get("dpi", defaults.dpi)),
+        bins=int(cfg.get("bins", defaults.bins)),
+        max_points=int(cfg.get("max_points", defaults.max_points)),
+        n_workers=int(cfg.get("n_workers", defaults.n_workers)),
+    )
+
+
+@dataclass(frozen=True)
+class ScatterJob:
+    """
+    One density scatter: x/y of all genes, a mask of points to draw on top,
+    and the output path without suffix (one file per format).
+    """
+
+    x: np.ndarray
+    y: np.ndarray
+    highlight: np.ndarray
+    outpath: Path
+    title: str
+    xlabel: str
+    ylabel: str
+    hline: float | None = None
+
+
+def _column(res_df: pd.DataFrame, name: str) -> np.ndarray:
+    return res_df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _outliers(values: np.ndarray, q: float = 0.999) -> np.ndarray:
+    return values > np.quantile(values, q) if len(values) else np.zeros(0, dtype=bool)
+
+
+def contrast_jobs(res_df: pd.DataFrame, plots_dir: Path, alpha: float = 0.05) -> list[ScatterJob]:
+    """
+    Volcano and MA jobs for one result table (float arrays only; res_df is not copied).
+
+    Significant genes (padj < alpha) and the 0.1% most extreme ones are
+    drawn as points; everything else goes into the density layer.
+    """
+    lfc = _column(res_df, "log2FoldChange")
+    pvalue = _column(res_df, "pvalue")
+    padj = _column(res_df, "padj")
+    sig = np.nan_to_num(padj, nan=1.0) < alpha
+
+    jobs = []
+    ok = np.isfinite(lfc) & np.isfinite(pvalue)
+    y = -np.log10(np.clip(pvalue[ok], 1e-300, None))
+    jobs.append(ScatterJob(
+        lfc[ok], y, sig[ok] | _outliers(y) | _outliers(np.abs(lfc[ok])),
+        plots_dir / "volcano", "Volcano plot", "log2FoldChange", "-log10(pvalue)",
+        hline=float(-np.log10(alpha)),
+    ))
+    # DESeq2 results usually have baseMean; if missing, we skip MA.
+    if "baseMean" in res_df.columns:
+        base = _column(res_df, "baseMean")
+        ok = np.isfinite(base) & np.isfinite(lfc)
+        jobs.append(ScatterJob(
+            np.log10(base[ok] + 1.0), lfc[ok], sig[ok] | _outliers(np.abs(lfc[ok])),
+            plots_dir / "ma", "MA plot", "log10(baseMean + 1)", "log2FoldChange", hline=0.0,
+        ))
+    return jobs
+
+
+def render_scatter(job: ScatterJob, options: PlotOptions) -> list[Path]:
+    """
+    Draw one job: a log-scaled 2-D histogram image (always raster) plus at
+    most options.max_points highlighted points, written in every format.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    rest = ~job.highlight
+    if rest.any():
+        # Coarser bins for small tables so single genes stay visible
+        bins = min(options.bins, max(20, int(np.sqrt(rest.sum()))))
+        hist, xe, ye = np.histogram2d(job.x[rest], job.y[rest], bins=bins)
+        hist[hist == 0] = np.nan
+        ax.imshow(hist.T, origin="lower", aspect="auto", cmap="Blues", interpolation="nearest",
+                  extent=(xe[0], xe[-1], ye[0], ye[-1]),
+                  norm=LogNorm(vmin=0.3, vmax=max(1.0, np.nanmax(hist))))
+
+    pts = np.flatnonzero(job.highlight)
+    if len(pts) > options.max_points:
+        # Keep the most extreme points (furthest from the bulk on either axis)
+        score = np.abs(job.y[pts] - np.median(job.y)) + np.abs(job.x[pts] - np.median(job.x))
+        pts = pts[np.argpartition(-score, options.max_points - 1)[:options.max_points]]
+    if len(pts):
+        ax.scatter(job.x[pts], job.y[pts], s=6, alpha=0.7, color="tab:red", linewidths=0)
+
+    if job.hline is not None:
+        ax.axhline(job.hline, linestyle="--", color="tab:blue", linewidth=0.8)
+    ax.set_xlabel(job.xlabel)
+    ax.set_ylabel(job.ylabel)
+    ax.set_title(job.title)
+    job.outpath.parent.mkdir(parents=True, exist_ok=True)
+    fig.tight_layout()
+    paths = []
+    for fmt in options.formats:
+        path = job.outpath.with_suffix(f".{fmt}")
+        fig.savefig(path, dpi=options.dpi)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def render_jobs(jobs: Sequence[ScatterJob], options: PlotOptions) -> list[Path]:
+    """
+    Render all jobs, on a process pool when options.n_workers > 1.
+    render_scatter selects the non-interactive Agg backend in whichever
+    process draws. Paths keep job order.
+    """
+    n_workers = max(1, min(options.n_workers, len(jobs)))
+    if n_workers == 1:
+        return [p for job in jobs for p in render_scatter(job, options)]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(render_scatter, jobs, [options] * len(jobs)))
+    return [p for paths in results for p in paths]
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
+from typing import Any
+
+from rnaseq_native.fingerprint import content_hash, file_fingerprint
+from rnaseq_native.manifest import JsonManifest
+
+QC_MANIFEST = "qc_manifest.json"
 
 
 @dataclass(frozen=True)
@@ -17,18 +24,92 @@ def fastp_command(sample: str, r1: str, r2: str, outdir: str | Path, cfg: FastpQ
     outdir = Path(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    html = outdir / f"{sample}.fastp.html"
-    json = outdir / f"{sample}.fastp.json"
-    out_r1 = outdir / f"{sample}.trimmed.R1.fastq.gz"
-    out_r2 = outdir / f"{sample}.trimmed.R2.fastq.gz"
+    out = fastp_outputs(sample, outdir)
 
     return [
         "fastp",
         "-i", r1,
         "-I", r2,
-        "-o", str(out_r1),
-        "-O", str(out_r2),
-        "-h", str(html),
-        "-j", str(json),
+        "-o", str(out["r1"]),
+        "-O", str(out["r2"]),
+        "-h", str(out["html"]),
+        "-j", str(out["json"]),
         "-w", str(cfg.threads),
     ]
+
+
+def fastp_outputs(sample: str, outdir: str | Path) -> dict[str, Path]:
+    """Files fastp_command writes for one sample."""
+    outdir = Path(outdir)
+    return {
+        "html": outdir / f"{sample}.fastp.html",
+        "json": outdir / f"{sample}.fastp.json",
+        "r1": outdir / f"{sample}.trimmed.R1.fastq.gz",
+        "r2": outdir / f"{sample}.trimmed.R2.fastq.gz",
+    }
+
+
+def _params(cmd: list[str]) -> list[str]:
+    # Thread count does not change fastp's output, so it does not force a rerun
+    if "-w" in cmd[:-1]:
+        i = cmd.index("-w")
+        return cmd[:i] + cmd[i + 2:]
+    return list(cmd)
+
+
+def _same_file(path: Path, recorded: dict[str, Any] | None, checksum: bool) -> bool:
+    if recorded is None or not path.exists():
+        return False
+    fp = file_fingerprint(path)
+    if fp["size"] != recorded.get("size"):
+        return False
+    if fp["mtime_ns"] == recorded.get("mtime_ns"):
+        return True
+    # Touched but same size: only a recorded checksum can clear it
+    return checksum and "hash" in recorded and content_hash(path) == recorded["hash"]
+
+
+class QCManifest(JsonManifest):
+    """
+    Record of finished fastp runs, stored as JSON in the QC output folder.
+
+    Per sample it keeps the fingerprints (size, mtime, optional checksum) of
+    the R1/R2 inputs and of every output from fastp_outputs, plus the fastp
+    arguments used. A sample is up to date when all of these still match, so
+    reruns only schedule new or changed samples. Entries are saved as each
+    sample finishes, which lets an interrupted run resume where it stopped.
+    """
+
+    key = "samples"
+
+    def __init__(self, path: str | Path, checksum: bool = False) -> None:
+        super().__init__(path)
+        self.checksum = checksum
+
+    def is_current(self, sample: str, r1: str, r2: str, cmd: list[str], outdir: str | Path) -> bool:
+        entry = self.entries.get(sample)
+        if entry is None or entry.get("params") != _params(cmd):
+            return False
+        inputs = entry.get("inputs", {})
+        if not (_same_file(Path(r1), inputs.get("r1"), self.checksum)
+                and _same_file(Path(r2), inputs.get("r2"), self.checksum)):
+            return False
+        outputs = entry.get("outputs", {})
+        return all(
+            _same_file(path, outputs.get(name), checksum=False)
+            for name, path in fastp_outputs(sample, outdir).items()
+        )
+
+    def record(self, sample: str, r1: str, r2: str, cmd: list[str], outdir: str | Path) -> None:
+        self.entries[sample] = {
+            "params": _params(cmd),
+            "inputs": {
+                "r1": file_fingerprint(r1, checksum=self.checksum),
+                "r2": file_fingerprint(r2, checksum=self.checksum),
+            },
+            "outputs": {
+                name: file_fingerprint(path)
+                for name, path in fastp_outputs(sample, outdir).items()
+            },
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+QC_TABLE = "qc_table"
+FASTP_JSON_SUFFIX = ".fastp.json"
+
+# Column -> path of keys in the fastp JSON report
+FASTP_FIELDS: dict[str, tuple[str, ...]] = {
+    "reads_before": ("summary", "before_filtering", "total_reads"),
+    "reads_after": ("summary", "after_filtering", "total_reads"),
+    "bases_before": ("summary", "before_filtering", "total_bases"),
+    "bases_after": ("summary", "after_filtering", "total_bases"),
+    "q30_rate_before": ("summary", "before_filtering", "q30_rate"),
+    "q30_rate_after": ("summary", "after_filtering", "q30_rate"),
+    "gc_content_after": ("summary", "after_filtering", "gc_content"),
+    "duplication_rate": ("duplication", "rate"),
+    "adapter_trimmed_reads": ("adapter_cutting", "adapter_trimmed_reads"),
+    "adapter_trimmed_bases": ("adapter_cutting", "adapter_trimmed_bases"),
+    "insert_size_peak": ("insert_size", "peak"),
+    "low_quality_reads": ("filtering_result", "low_quality_reads"),
+    "too_many_n_reads": ("filtering_result", "too_many_N_reads"),
+    "too_short_reads": ("filtering_result", "too_short_reads"),
+}
+
+INT_FIELDS = {
+    "reads_before", "reads_after", "bases_before", "bases_after",
+    "adapter_trimmed_reads", "adapter_trimmed_bases", "insert_size_peak",
+    "low_quality_reads", "too_many_n_reads", "too_short_reads",
+}
+
+# Metric -> which side is bad ("low" or "high") for outlier flags
+OUTLIER_METRICS: dict[str, str] = {
+    "reads_after": "low",
+    "pass_rate": "low",
+    "q30_rate_after": "low",
+    "duplication_rate": "high",
+    "adapter_trimmed_fraction": "high",
+}
+DEFAULT_OUTLIER_Z = 3.5
+
+
+def sample_from_report(path: str | Path) -> str:
+    """S1.fastp.json -> S1 (the naming used by fastp_outputs)."""
+    name = Path(path).name
+    return name[: -len(FASTP_JSON_SUFFIX)] if name.endswith(FASTP_JSON_SUFFIX) else Path(path).stem
+
+
+def find_fastp_reports(qc_dir: str | Path) -> list[Path]:
+    qc_dir = Path(qc_dir)
+    if not qc_dir.is_dir():
+        raise FileNotFoundError(f"QC folder not found: {qc_dir}")
+    return sorted(qc_dir.glob(f"*{FASTP_JSON_SUFFIX}"))
+
+
+def _get(report: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    node: Any = report
+    for k in keys:
+        if not isinstance(node, dict) or k not in node:
+            return None
+        node = node[k]
+    return node
+
+
+def parse_fastp_report(path: str | Path) -> dict[str, Any]:
+    """
+    Pull the FASTP_FIELDS values out of one fastp JSON report.
+
+    Missing sections (e.g. no insert_size for single-end runs) give None.
+    Raises ValueError if the file is not valid JSON.
+    """
+    path = Path(path)
+    try:
+        report = json.loads(path.read_bytes())
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid fastp JSON report {path}: {e}") from e
+    row = {col: _get(report, keys) for col, keys in FASTP_FIELDS.items()}
+    row["sample"] = sample_from_report(path)
+    return row
+
+
+def _parse_many(paths: list[str]) -> list[dict[str, Any]]:
+    return [parse_fastp_report(p) for p in paths]
+
+
+def _columns(rows: list[dict[str, Any]]) -> dict[str, np.ndarray]:
+    cols: dict[str, np.ndarray] = {"sample": np.array([r["sample"] for r in rows], dtype=str)}
+    for col in FASTP_FIELDS:
+        vals = np.array([r[col] if r[col] is not None else np.nan for r in rows], dtype=np.float64)
+        if col in INT_FIELDS and not np.isnan(vals).any():
+            cols[col] = vals.astype(np.int64)
+        else:
+            cols[col] = vals
+    return cols
+
+
+def load_fastp_reports(paths: list[str | Path], n_jobs: int = 1, batch_size: int = 64) -> pd.DataFrame:
+    """
+    Parse many fastp JSON reports into one table (one row per sample).
+
+    With n_jobs > 1 the reports are parsed on a process pool, `batch_size`
+    files per task so that thousands of small files do not cost one task
+    each. Values are collected per column into typed numpy arrays, and
+    derived rates are computed on whole columns:
+
+    - pass_rate = reads_after / reads_before
+    - adapter_trimmed_fraction = adapter_trimmed_reads / reads_before
+
+    Rows keep the order of `paths`. Raises ValueError on duplicate samples.
+    """
+    paths = [str(p) for p in paths]
+    if not paths:
+        raise ValueError("No fastp JSON reports given.")
+    missing = [p for p in paths if not Path(p).exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing fastp reports: {missing}")
+
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    if n_jobs > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(batches))) as pool:
+            rows = [r for batch in pool.map(_parse_many, batches) for r in batch]
+    else:
+        rows = _parse_many(paths)
+
+    cols = _columns(rows)
+    samples = cols["sample"]
+    uniq, counts = np.unique(samples, return_counts=True)
+    if (counts > 1).any():
+        raise ValueError(f"Duplicate samples in fastp reports: {uniq[counts > 1].tolist()}")
+
+    before = cols["reads_before"].astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols["pass_rate"] = np.where(before > 0, cols["reads_after"] / before, np.nan)
+        cols["adapter_trimmed_fraction"] = np.where(
+            before > 0, cols["adapter_trimmed_reads"] / before, np.nan)
+    return pd.DataFrame(cols)
+
+
+def flag_outliers(
+    table: pd.DataFrame,
+    metrics: dict[str, str] | None = None,
+    z: float = DEFAULT_OUTLIER_Z,
+) -> pd.DataFrame:
+    """
+    Flag samples that sit far from the rest on any QC metric.
+
+    Uses the robust z-score 0.6745 * (x - median) / MAD per metric, so a few
+    bad samples do not hide themselves by inflating the spread. Only the bad
+    side of each metric counts (see OUTLIER_METRICS). Metrics with MAD 0 are
+    skipped. Adds `outlier` (bool) and `outlier_reasons` (e.g.
+    "q30_rate_after low; duplication_rate high") to a copy of the table.
+    """
+    metrics = OUTLIER_METRICS if metrics is None else metrics
+    out = table.copy()
+    flagged = np.zeros(len(out), dtype=bool)
+    reasons: list[list[str]] = [[] for _ in range(len(out))]
+
+    for metric, side in metrics.items():
+        if side not in ("low", "high"):
+            raise ValueError(f"Outlier side must be 'low' or 'high', got {side!r} for {metric}")
+        if metric not in out.columns:
+            continue
+        x = out[metric].to_numpy(dtype=np.float64)
+        med = np.nanmedian(x) if np.isfinite(x).any() else np.nan
+        mad = np.nanmedian(np.abs(x - med)) if np.isfinite(med) else np.nan
+        if not np.isfinite(mad) or mad == 0:
+            continue
+        score = 0.6745 * (x - med) / mad
+        hit = score < -z if side == "low" else score > z
+        hit &= np.isfinite(score)
+        flagged |= hit
+        for i in np.flatnonzero(hit):
+            reasons[i].append(f"{metric} {side}")
+
+    out["outlier"] = flagged
+    out["outlier_reasons"] = ["; ".join(r) for r in reasons]
+    return out
+
+
+def write_qc_table(table: pd.DataFrame, outdir: str | Path, name: str = QC_TABLE) -> tuple[Path, Path]:
+    """
+    Write the QC table as <name>.tsv and as <name>.npz (one array per column).
+
+    The .npz keeps dtypes and loads without parsing text (read_qc_table).
+    """
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    tsv = outdir / f"{name}.tsv"
+    npz = outdir / f"{name}.npz"
+    table.to_csv(tsv, sep="\t", index=False)
+    arrays = {
+        col: (table[col].to_numpy(dtype=str) if table[col].dtype == object else table[col].to_numpy())
+        for col in table.columns
+    }
+    np.savez(npz, **arrays)
+    return tsv, npz
+
+
+def read_qc_table(path: str | Path) -> pd.DataFrame:
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"QC table not found: {path}")
+    with np.load(path) as data:
+        return pd.DataFrame({col: data[col] for col in data.files})
@@ -1,15 +1,51 @@
 from __future__ import annotations
 
+import os
+import queue
 import shlex
+import signal
 import subprocess
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Iterable
+from pathlib import Path
+from typing import Callable, Iterable
+
+# Flags that set a tool's worker thread count (fastp uses -w / --thread)
+THREAD_FLAGS = ("-w", "--thread", "--threads")
 
 
 @dataclass(frozen=True)
 class RunOptions:
     dry_run: bool = True
     check: bool = True  # raise error if command fails
+    thread_budget: int | None = None  # total tool threads at once; None = CPU count
+    log_dir: Path | None = None  # per-command stdout/stderr logs; None = inherit
+
+
+@dataclass(frozen=True)
+class CommandResult:
+    name: str
+    cmd: list[str]
+    returncode: int | None  # None: dry run, or cancelled before it started
+    wall_s: float = 0.0
+    cpu_s: float | None = None  # user + system time of the process (POSIX only)
+    threads: int = 1
+    stdout_log: Path | None = None
+    stderr_log: Path | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+class RunFailed(subprocess.CalledProcessError):
+    """First failing command; `results` holds every command's outcome."""
+
+    def __init__(self, returncode: int, cmd: list[str], results: list[CommandResult]) -> None:
+        super().__init__(returncode, cmd)
+        self.results = results
 
 
 def format_cmd(cmd: list[str]) -> str:
@@ -17,9 +53,154 @@ def format_cmd(cmd: list[str]) -> str:
     return " ".join(shlex.quote(x) for x in cmd)
 
 
-def run_commands(commands: Iterable[list[str]], opts: RunOptions) -> None:
-    for cmd in commands:
+def command_threads(cmd: list[str]) -> int:
+    """Threads a command asks for via -w/--thread(s) N; 1 if it does not say."""
+    for flag in THREAD_FLAGS:
+        if flag in cmd[:-1]:
+            try:
+                return max(1, int(cmd[cmd.index(flag) + 1]))
+            except ValueError:
+                pass
+    return 1
+
+
+def _wait(proc: subprocess.Popen) -> tuple[int, float | None]:
+    # os.wait4 gives this child's own rusage; elsewhere only the exit code
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode, usage.ru_utime + usage.ru_stime
+    return proc.wait(), None
+
+
+def _report(i: int, proc: subprocess.Popen, done: queue.Queue) -> None:
+    try:
+        returncode, cpu_s = _wait(proc)
+    except OSError:
+        returncode, cpu_s = -1, None
+    done.put((i, returncode, cpu_s, time.perf_counter()))
+
+
+def run_commands(
+    commands: Iterable[list[str]],
+    opts: RunOptions,
+    names: Iterable[str] | None = None,
+    on_complete: Callable[[CommandResult], None] | None = None,
+) -> list[CommandResult]:
+    """
+    Run commands concurrently while keeping their summed thread count under a budget.
+
+    Each command's weight is its -w/--thread value (capped at the budget). A
+    command starts as soon as its weight fits next to the ones already
+    running, in submission order. stdout/stderr go to <log_dir>/<name>.stdout.log
+    and .stderr.log when opts.log_dir is set. on_complete, if given, is called
+    with each CommandResult as soon as that command exits.
+
+    With opts.check, the first failure cancels everything: queued commands are
+    never started, running ones are terminated, and RunFailed is raised once
+    all have exited. Ctrl-C terminates running commands the same way.
+
+    Returns one CommandResult per command, in input order (exit code, wall
+    and CPU seconds). With opts.dry_run commands are only printed.
+    """
+    commands = [list(c) for c in commands]
+    names = list(names) if names is not None else [f"cmd{i:03d}" for i in range(len(commands))]
+    if len(names) != len(commands):
+        raise ValueError("names must have one entry per command.")
+
+    if opts.dry_run:
+        for cmd in commands:
+            print(format_cmd(cmd))
+        return [CommandResult(name=n, cmd=c, returncode=None,
+                              threads=command_threads(c)) for n, c in zip(names, commands)]
+
+    budget = max(1, opts.thread_budget or os.cpu_count() or 1)
+    if opts.log_dir is not None:
+        Path(opts.log_dir).mkdir(parents=True, exist_ok=True)
+
+    results: list[CommandResult | None] = [None] * len(commands)
+    pending = deque(range(len(commands)))
+    running: dict[int, tuple[subprocess.Popen, float, int, list]] = {}
+    done: queue.Queue = queue.Queue()
+    used = 0
+    failed: int | None = None
+
+    def launch(i: int) -> None:
+        cmd, name = commands[i], names[i]
+        weight = min(command_threads(cmd), budget)
+        out_log = err_log = None
+        handles: list = []
+        if opts.log_dir is not None:
+            out_log = Path(opts.log_dir) / f"{name}.stdout.log"
+            err_log = Path(opts.log_dir) / f"{name}.stderr.log"
+            handles = [out_log.open("wb"), err_log.open("wb")]
         print(format_cmd(cmd))
-        if not opts.dry_run:
-            continue
-            subprocess.run(cmd, check=opts.check)
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            cmd,
+            stdout=handles[0] if handles else None,
+            stderr=handles[1] if handles else None,
+        )
+        running[i] = (proc, start, weight, handles)
+        threading.Thread(target=_report, args=(i, proc, done), daemon=True).start()
+        results[i] = CommandResult(name=name, cmd=cmd, returncode=None, threads=weight,
+                                   stdout_log=out_log, stderr_log=err_log)
+
+    def cancel_running() -> None:
+        for proc, *_ in running.values():
+            if proc.returncode is not None:
+                continue
+            if hasattr(os, "wait4"):
+                # Not proc.terminate(): its poll() would race the wait4 thread
+                try:
+                    os.kill(proc.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            else:
+                proc.terminate()
+
+    try:
+        while pending or running:
+            while pending and failed is None:
+                weight = min(command_threads(commands[pending[0]]), budget)
+                if running and used + weight > budget:
+                    break
+                i = pending.popleft()
+                try:
+                    launch(i)
+                except OSError:
+                    cancel_running()
+                    raise
+                used += weight
+
+            if not running:
+                break
+
+            i, returncode, cpu_s, end = done.get()
+            proc, start, weight, handles = running.pop(i)
+            for h in handles:
+                h.close()
+            used -= weight
+            prev = results[i]
+            results[i] = CommandResult(
+                name=prev.name, cmd=prev.cmd, returncode=returncode,
+                wall_s=round(end - start, 3), cpu_s=cpu_s, threads=weight,
+                stdout_log=prev.stdout_log, stderr_log=prev.stderr_log,
+            )
+            if on_complete is not None:
+                on_complete(results[i])
+            if returncode != 0 and opts.check and failed is None:
+                failed = i
+                cancel_running()
+    except KeyboardInterrupt:
+        cancel_running()
+        raise
+
+    final = [
+        r if r is not None else CommandResult(name=n, cmd=c, returncode=None,
+                                              threads=command_threads(c))
+        for r, n, c in zip(results, names, commands)
+    ]
+    if failed is not None:
+        raise RunFailed(final[failed].returncode, commands[failed], final)
+    return final
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.io import load_samples_tsv
+
+# Columns whose groupings are precomputed as index arrays
+GROUP_COLUMNS = ("condition", "tree")
+
+
+
+class SampleRegistry:
+    """
+    A validated sample sheet with a prebuilt sample-ID -> row-position index.
+
+    Aligning a matrix to the sheet is one hash lookup per column and returns
+    a positional permutation (rows of the sheet, in column order) rather than
+    a reordered copy. Permutations are cached per column order, so counts,
+    normalized counts and QC tables with the same columns share one.
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        if "sample" not in frame.columns:
+            raise ValueError("samples_df must contain a 'sample' column.")
+        self.frame = frame.reset_index(drop=True)
+        self.index = pd.Index(self.frame["sample"].astype(str), name="sample")
+        if not self.index.is_unique:
+            dups = self.index[self.index.duplicated()].unique().tolist()
+            raise ValueError(f"Duplicate sample IDs found: {dups}")
+        self._perms: dict[tuple[bool, tuple[str, ...]], np.ndarray] = {}
+
+        # condition / tree as integer codes plus the row positions of each level
+        self.codes: dict[str, np.ndarray] = {}
+        self.levels: dict[str, list[str]] = {}
+        self._groups: dict[str, dict[str, np.ndarray]] = {}
+        for col in GROUP_COLUMNS:
+            if col in self.frame.columns:
+                codes, levels = pd.factorize(self.frame[col].astype(str), sort=True)
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(levels) + 1))
+                self.codes[col] = codes
+                self.levels[col] = levels.tolist()
+                self._groups[col] = {
+                    str(level): order[bounds[i]:bounds[i + 1]] for i, level in enumerate(levels)
+                }
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        strict_path: bool = False,
+        require_fastq: bool = True,
+    ) -> SampleRegistry:
+        """
+        Load and validate a sample sheet.
+
+        The sheet is re-read on every call so FASTQ checks (strict_path) see
+        the files as they are now; those checks list each folder once,
+        concurrently (see io.find_missing_paths).
+        """
+        path = Path(path).resolve()
+        if not path.exists():
+            raise FileNotFoundError(f"Sample sheet not found: {path}")
+        return cls(load_samples_tsv(path, strict_path=strict_path, require_fastq=require_fastq))
+
+    @classmethod
+    def from_tsv(cls, path: str | Path, **kwargs) -> SampleRegistry:
+        """Load a sample sheet with load_samples_tsv (same keyword arguments)."""
+        return cls(load_samples_tsv(path, **kwargs))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def samples(self) -> list[str]:
+        return self.index.tolist()
+
+    def positions(self, names: Sequence[str], missing_ok: bool = False) -> np.ndarray:
+        """
+        Sheet rows of `names`.
+
+        Names not in the sheet raise ValueError, or get -1 with missing_ok.
+        """
+        pos = self.index.get_indexer(pd.Index([str(n) for n in names], dtype=object))
+        if (pos < 0).any() and not missing_ok:
+            missing = [str(n) for n, p in zip(names, pos) if p < 0]
+            raise ValueError(f"Missing in samples.tsv: {missing}")
+        return pos
+
+    def align(self, columns: Sequence[str], allow_extra: bool = False) -> np.ndarray:
+        """
+        Permutation that puts the sheet in the order of a matrix's sample columns.
+
+        With allow_extra=False the sheet must hold exactly these samples (as
+        align_counts_and_samples requires); with allow_extra=True the matrix
+        may use a subset of a larger, shared sheet. The result is cached per
+        column order and is read-only.
+        """
+        key = tuple(str(c) for c in columns)
+        perm = self._perms.get((allow_extra, key))
+        if perm is not None:
+            return perm
+
+        pos = self.index.get_indexer(pd.Index(key, dtype=object))
+        n_extra = 0 if allow_extra else len(self.index) - int((pos >= 0).sum())
+        if (pos < 0).any() or n_extra:
+            parts: list[str] = []
+            missing = sorted(c for c, p in zip(key, pos) if p < 0)
+            if missing:
+                parts.append(f"Missing in samples.tsv: {missing}")
+            if n_extra:
+                used = np.zeros(len(self.index), dtype=bool)
+                used[pos[pos >= 0]] = True
+                parts.append(f"Extra in samples.tsv: {sorted(self.index[~used].tolist())}")
+            raise ValueError(
+                "Sample mismatch between count matrix and samples.tsv. " + " | ".join(parts))
+        if len(set(key)) != len(key):
+            raise ValueError("Count matrix has duplicate sample columns.")
+
+        pos.flags.writeable = False
+        self._perms[(allow_extra, key)] = pos
+        return pos
+
+    def take(self, perm: np.ndarray, columns: Sequence[str] | None = None) -> pd.DataFrame:
+        """Metadata rows in permutation order (optionally only `columns`)."""
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.take(perm).reset_index(drop=True)
+
+    def column(self, name: str, perm: np.ndarray | None = None) -> np.ndarray:
+        """One metadata column as an array, optionally permuted (no frame copy)."""
+        values = self.frame[name].to_numpy()
+        return values if perm is None else values[perm]
+
+    def groups(self, column: str, perm: np.ndarray | None = None) -> dict[str, np.ndarray]:
+        """
+        Row positions of each level of `column` (condition or tree), levels sorted.
+
+        Positions index the sheet; with `perm` they index the aligned matrix
+        columns instead (e.g. the samples of one condition in a count block).
+        """
+        if column not in self._groups:
+            raise ValueError(f"No precomputed groups for column '{column}'. Available: {list(self._groups)}")
+        if perm is None:
+            return self._groups[column]
+        codes = self.codes[column][perm]
+        return {level: np.flatnonzero(codes == i) for i, level in enumerate(self.levels[column])}
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+from rnaseq_native.de import contrast_label
+from rnaseq_native.ora import bh_adjust
+
+SCREEN_COLUMNS = ["baseMean", "log2FoldChange", "lfcSE", "stat", "pvalue", "padj"]
+
+
+@dataclass(frozen=True)
+class LinearFit:
+    """
+    Gene-wise weighted least-squares fit of log-CPM on a design matrix.
+
+    coef is (genes x p), cov_unscaled is (genes x p x p) = (X' W X)^-1 and
+    s2 the residual variances with df_residual degrees of freedom.
+    """
+
+    coef: np.ndarray
+    cov_unscaled: np.ndarray
+    s2: np.ndarray
+    df_residual: int
+
+
+def design_matrix(design: str, coldata: pd.DataFrame) -> tuple[np.ndarray, list[str]]:
+    """Model matrix of a formula such as "~ tree + condition" (treatment coding, as PyDESeq2)."""
+    from formulaic import model_matrix
+
+    mm = model_matrix(design, coldata)
+    X = np.asarray(mm, dtype=np.float64)
+    if np.linalg.matrix_rank(X) < X.shape[1]:
+        raise ValueError(f"Design {design!r} is not full rank for these samples.")
+    return X, [str(c) for c in mm.columns]
+
+
+def contrast_vector(columns: Sequence[str], contrast: Sequence[str]) -> np.ndarray:
+    """
+    Coefficient weights of [factor, level, reference] for a treatment-coded design.
+
+    A level absent from the columns is the baseline (coefficient 0).
+    """
+    factor, level, ref = contrast
+    c = np.zeros(len(columns))
+    found = False
+    for lvl, sign in ((level, 1.0), (ref, -1.0)):
+        name = f"{factor}[T.{lvl}]"
+        if name in columns:
+            c[list(columns).index(name)] = sign
+            found = True
+    if not found:
+        raise ValueError(f"Contrast {list(contrast)} does not match design columns {list(columns)}")
+    return c
+
+
+def log_cpm(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """voom log2-CPM of a (samples x genes) block, with the library sizes."""
+    lib_size = counts.sum(axis=1, dtype=np.float64)
+    y = np.asarray(counts, dtype=np.float64) + 0.5
+    y /= (lib_size + 1.0)[:, None]
+    y *= 1e6
+    np.log2(y, out=y)
+    return y, lib_size
+
+
+def weighted_lstsq(y: np.ndarray, X: np.ndarray, weights: np.ndarray | None = None) -> LinearFit:
+    """
+    Fit every gene at once: y and weights are (samples x genes), X is (samples x p).
+
+    The p x p normal equations of all genes are built with einsum and
+    inverted as one batch.
+    """
+    n, p = X.shape
+    if n <= p:
+        raise ValueError(f"Need more samples ({n}) than design columns ({p}).")
+    w = np.ones_like(y) if weights is None else weights
+    xtwx = np.einsum("ng,ni,nj->gij", w, X, X, optimize=True)
+    cov = np.linalg.inv(xtwx)
+    xtwy = np.einsum("ng,ni->gi", w * y, X, optimize=True)
+    coef = np.einsum("gij,gj->gi", cov, xtwy)
+    resid = y - X @ coef.T
+    s2 = np.einsum("ng,ng->g", w * resid, resid) / (n - p)
+    return LinearFit(coef, cov, s2, n - p)
+
+
+def _lowess(
+    x: np.ndarray, y: np.ndarray, span: float = 0.5, n_grid: int = 200, iterations: int = 3
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Robust local-linear smoother (as R's lowess) evaluated on a grid over x.
+
+    Each grid point uses the span * n nearest points with tricube weights;
+    later passes down-weight outliers with bisquare weights. Returns
+    (grid, fitted) for np.interp.
+    """
+    grid = np.linspace(x.min(), x.max(), n_grid)
+    k = min(len(x), max(2, int(np.ceil(span * len(x)))))
+    dist = np.abs(x[None, :] - grid[:, None])
+    h = np.partition(dist, k - 1, axis=1)[:, k - 1]
+    local = np.clip(1.0 - (dist / np.maximum(h, 1e-12)[:, None]) ** 3, 0.0, None) ** 3
+    del dist
+
+    robust = np.ones(len(x))
+    for it in range(iterations + 1):
+        w = local * robust
+        s0 = w.sum(axis=1)
+        sx, sy = w @ x, w @ y
+        sxx, sxy = w @ (x * x), w @ (x * y)
+        mx, my = sx / s0, sy / s0
+        var = sxx / s0 - mx * mx
+        slope = np.where(var > 1e-12, (sxy / s0 - mx * my) / np.where(var > 1e-12, var, 1.0), 0.0)
+        fitted = my + slope * (grid - mx)
+        if it == iterations:
+            break
+        resid = y - np.interp(x, grid, fitted)
+        scale = 6.0 * np.median(np.abs(resid))
+        if scale <= 0:
+            break
+        robust = np.clip(1.0 - (resid / scale) ** 2, 0.0, None) ** 2
+    return grid, fitted
+
+
+def voom_weights(
+    counts: np.ndarray, X: np.ndarray, span: float = 0.5
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    voom precision weights for a (samples x genes) count block.
+
+    An unweighted fit gives each gene's residual sd; a lowess trend of
+    sqrt(sd) against mean log-count is then read off at every fitted
+    log-count, and weight = trend ** -4. Returns (log-CPM, weights).
+    """
+    y, lib_size = log_cpm(counts)
+    fit = weighted_lstsq(y, X)
+    log_lib = np.log2(lib_size + 1.0)
+    sx = y.mean(axis=0) + log_lib.mean() - np.log2(1e6)
+    sy = np.sqrt(np.sqrt(fit.s2))
+    grid, trend = _lowess(sx, sy, span=span)
+
+    fitted_log_count = X @ fit.coef.T
+    fitted_log_count += (log_lib - np.log2(1e6))[:, None]
+    weights = np.interp(fitted_log_count, grid, trend)
+    weights **= -4
+    return y, weights
+
+
+def _trigamma_inverse(x: float) -> float:
+    # Newton iteration as in limma::trigammaInverse
+    if x > 1e7:
+        return 1.0 / np.sqrt(x)
+    if x < 1e-6:
+        return 1.0 / x
+    y = 0.5 + 1.0 / x
+    for _ in range(50):
+        tri = special.polygamma(1, y)
+        dif = tri * (1.0 - tri / x) / special.polygamma(2, y)
+        y += dif
+        if -dif / y < 1e-8:
+            break
+    return float(y)
+
+
+def squeeze_var(s2: np.ndarray, df: int) -> tuple[np.ndarray, float, float]:
+    """
+    Empirical-Bayes moderated variances (limma's squeezeVar / fitFDist).
+
+    A scaled inverse-chi-square prior (df0, s0^2) is fitted to the gene
+    variances by moments of log(s2); returns (posterior s2, df0, s0^2).
+    Without extra spread between genes df0 is infinite and every gene gets s0^2.
+    """
+    ok = np.isfinite(s2) & (s2 > 0)
+    if ok.sum() < 2:
+        return s2, 0.0, float("nan")
+    half = df / 2.0
+    e = np.log(s2[ok]) - special.digamma(half) + np.log(half)
+    e_mean = e.mean()
+    e_var = e.var(ddof=1) - special.polygamma(1, half)
+    if e_var > 0:
+        df0 = 2.0 * _trigamma_inverse(e_var)
+        s0 = float(np.exp(e_mean + special.digamma(df0 / 2.0) - np.log(df0 / 2.0)))
+        post = (df0 * s0 + df * s2) / (df0 + df)
+    else:
+        df0, s0 = np.inf, float(np.exp(e_mean))
+        post = np.full_like(s2, s0)
+    return post, float(df0), s0
+
+
+def screen_contrasts(
+    counts: np.ndarray,
+    genes: Sequence[str],
+    coldata: pd.DataFrame,
+    design: str,
+    contrasts: list[list[str]],
+    span: float = 0.5,
+) -> dict[str, pd.DataFrame]:
+    """
+    Fast approximate DE (voom + limma-style moderated t) for a quick ranking.
+
+    counts is (samples x genes) in coldata row order. One weighted fit
+    serves every contrast. Returns {contrast_label: frame} indexed by gene
+    with SCREEN_COLUMNS, the DESeq2 names: log2FoldChange is the log2-CPM
+    difference and stat the moderated t.
+    """
+    if counts.shape != (len(coldata), len(genes)):
+        raise ValueError(
+            f"counts must be (samples x genes) = ({len(coldata)}, {len(genes)}), got {counts.shape}")
+    X, columns = design_matrix(design, coldata)
+    y, weights = voom_weights(counts, X, span=span)
+    fit = weighted_lstsq(y, X, weights)
+    s2_post, df0, _ = squeeze_var(fit.s2, fit.df_residual)
+    df_total = min(fit.df_residual + df0, fit.df_residual * len(genes))
+
+    lib_size = counts.sum(axis=1, dtype=np.float64)
+    base_mean = (counts * (lib_size.mean() / lib_size)[:, None]).mean(axis=0)
+    index = pd.Index(np.asarray(genes).astype(str))
+
+    results: dict[str, pd.DataFrame] = {}
+    for contrast in contrasts:
+        c = contrast_vector(columns, contrast)
+        lfc = fit.coef @ c
+        se = np.sqrt(np.einsum("i,gij,j->g", c, fit.cov_unscaled, c) * s2_post)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stat = lfc / se
+        pvalue = 2.0 * stats.t.sf(np.abs(stat), df_total)
+        results[contrast_label(contrast)] = pd.DataFrame(
+            {
+                "baseMean": base_mean,
+                "log2FoldChange": lfc,
+                "lfcSE": se,
+                "stat": stat,
+                "pvalue": pvalue,
+                "padj": bh_adjust(pvalue),
+            },
+            index=index,
+        )
+    return results
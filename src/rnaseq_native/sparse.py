@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import gzip
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+import scipy.io
+import scipy.sparse as sp
+
+from rnaseq_native.counts import (
+    DEFAULT_CHUNKSIZE,
+    MAX_REPORTED_CELLS,
+    REQUIRED_GENE_COLUMN,
+    pseudobulk_count_matrix,
+    sample_codes,
+)
+from rnaseq_native.matrix import CountMatrix
+from rnaseq_native.validate import ISSUE_KINDS, CellIssue, CountValidationReport
+
+SPARSE_FORMATS = ("mtx", "triplets")
+DEFAULT_CHUNK_COLUMNS = 10_000
+# 10x-style sidecar files next to a matrix.mtx(.gz)
+GENE_FILES = ("features.tsv", "features.tsv.gz", "genes.tsv", "genes.tsv.gz")
+COLUMN_FILES = ("barcodes.tsv", "barcodes.tsv.gz")
+
+
+@dataclass(frozen=True)
+class SparseCountMatrix:
+    """
+    A (genes x columns) count matrix stored as CSC: only non-zero cells are kept.
+
+    Columns are cells, barcodes or samples. CSC keeps each column's non-zeros
+    contiguous, so column selection and per-column sums touch only those.
+    Nothing here densifies the genes x columns block; pseudobulk() returns the
+    small dense (samples x genes) CountMatrix that DE needs.
+    """
+    data: sp.csc_matrix
+    genes: np.ndarray
+    columns: list[str]
+
+    def __post_init__(self) -> None:
+        if not sp.issparse(self.data) or self.data.format != "csc":
+            raise ValueError("data must be a scipy.sparse CSC matrix.")
+        if self.data.shape != (len(self.genes), len(self.columns)):
+            raise ValueError(
+                f"data must be (genes x columns) = ({len(self.genes)}, {len(self.columns)}), "
+                f"got {self.data.shape}")
+
+    @classmethod
+    def load(cls, path: str | Path, fmt: str | None = None) -> SparseCountMatrix:
+        """Load Matrix Market (.mtx / .mtx.gz) or a triplet TSV; fmt is guessed from the name."""
+        path = Path(path)
+        if fmt is None:
+            fmt = "mtx" if path.name.lower().removesuffix(".gz").endswith(".mtx") else "triplets"
+        if fmt == "mtx":
+            return cls.from_matrix_market(path)
+        if fmt == "triplets":
+            return cls.from_triplets(path)
+        raise ValueError(f"Sparse count format must be one of {SPARSE_FORMATS}, got {fmt!r}")
+
+    @classmethod
+    def from_matrix_market(
+        cls,
+        path: str | Path,
+        genes_path: str | Path | None = None,
+        columns_path: str | Path | None = None,
+    ) -> SparseCountMatrix:
+        """
+        Read a Matrix Market file (rows = genes, columns = cells/samples).
+
+        Gene IDs and column names come from the first column of genes_path and
+        columns_path; by default the 10x names next to the matrix are used
+        (features.tsv / genes.tsv and barcodes.tsv, optionally gzipped).
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Count matrix file not found: {path}")
+        genes_path = Path(genes_path) if genes_path else _sidecar(path, GENE_FILES)
+        columns_path = Path(columns_path) if columns_path else _sidecar(path, COLUMN_FILES)
+
+        data = sp.csc_matrix(scipy.io.mmread(path))
+        genes = _first_column(genes_path)
+        columns = _first_column(columns_path).tolist()
+        data.sum_duplicates()
+        data.eliminate_zeros()
+        return cls(data=data, genes=genes, columns=columns)
+
+    @classmethod
+    def from_triplets(cls, path: str | Path, chunksize: int = DEFAULT_CHUNKSIZE) -> SparseCountMatrix:
+        """
+        Read a long TSV/CSV of non-zero cells: Geneid, <column>, count (with header).
+
+        The file is streamed in chunks; gene and column names are numbered in
+        order of first appearance. Raises ValueError on non-numeric counts and
+        on repeated (gene, column) pairs. Zero counts are dropped.
+        """
+        path = Path(path)
+        genes = pd.Index([], dtype=object)
+        columns = pd.Index([], dtype=object)
+        rows, cols, vals = [], [], []
+        for g, c, v in _triplet_chunks(path, chunksize):
+            genes = genes.append(pd.Index(pd.unique(g[~g.isin(genes)])))
+            columns = columns.append(pd.Index(pd.unique(c[~c.isin(columns)])))
+            rows.append(genes.get_indexer(g))
+            cols.append(columns.get_indexer(c))
+            vals.append(v)
+
+        r = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        c = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        v = np.concatenate(vals) if vals else np.zeros(0)
+        key = r * max(len(columns), 1) + c
+        uniq, counts = np.unique(key, return_counts=True)
+        if (counts > 1).any():
+            dup = uniq[counts > 1][:MAX_REPORTED_CELLS]
+            pairs = [(str(genes[k // len(columns)]), str(columns[k % len(columns)])) for k in dup]
+            raise ValueError(f"Repeated (Geneid, column) pairs in {path.name}: {pairs}")
+
+        data = sp.csc_matrix((v, (r, c)), shape=(len(genes), len(columns)))
+        data.eliminate_zeros()
+        return cls(data=data, genes=np.asarray(genes, dtype=str), columns=[str(x) for x in columns])
+
+    @property
+    def n_genes(self) -> int:
+        return len(self.genes)
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.columns)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.data.nnz)
+
+    def header_frame(self) -> pd.DataFrame:
+        """Empty Geneid + columns frame, for align_counts_and_samples."""
+        return pd.DataFrame(columns=[REQUIRED_GENE_COLUMN, *self.columns])
+
+    def gene_totals(self) -> np.ndarray:
+        """Total count per gene over all columns (one pass over the non-zeros)."""
+        totals = np.bincount(self.data.indices, weights=self.data.data, minlength=self.n_genes)
+        return np.rint(totals).astype(np.uint64)
+
+    def column_totals(self) -> np.ndarray:
+        """Library size per column (sums each column's contiguous non-zeros)."""
+        return np.rint(np.asarray(self.data.sum(axis=0)).ravel()).astype(np.uint64)
+
+    def filter_min_total(self, min_total: int) -> SparseCountMatrix:
+        """Keep genes whose total count over all columns is >= min_total."""
+        keep = np.flatnonzero(self.gene_totals() >= min_total)
+        if len(keep) == self.n_genes:
+            return self
+        return replace(self, data=sp.csc_matrix(self.data[keep, :]), genes=self.genes[keep])
+
+    def select_columns(self, names: Sequence[str]) -> SparseCountMatrix:
+        """Reorder / subset columns by name (e.g. to the samples.tsv order)."""
+        pos = pd.Index(self.columns).get_indexer(list(names))
+        if (pos < 0).any():
+            missing = [n for n, p in zip(names, pos) if p < 0]
+            raise ValueError(f"Columns not in the count matrix: {missing}")
+        return replace(self, data=sp.csc_matrix(self.data[:, pos]), columns=list(names))
+
+    def validate(self, max_issues: int = MAX_REPORTED_CELLS) -> CountValidationReport:
+        """
+        Validate gene IDs, column names and the stored values without densifying.
+
+        Implicit zeros are valid counts, so only the non-zeros are scanned.
+        Raises ValueError like validate_count_matrix; returns the report.
+        """
+        gene = pd.Series(self.genes, dtype=str).str.strip()
+        if (gene == "").any():
+            raise ValueError("Count matrix contains empty Geneid values.")
+        if gene.duplicated().any():
+            raise ValueError(f"Duplicate Geneid values found: {gene[gene.duplicated()].unique().tolist()}")
+        cols = pd.Series(self.columns, dtype=str)
+        if cols.duplicated().any():
+            raise ValueError(f"Duplicate column names found: {cols[cols.duplicated()].unique().tolist()}")
+
+        report = _scan_nonzeros(self.data, self.genes, self.columns, max_issues)
+        report.raise_if_invalid()
+        return report
+
+    def pseudobulk(self, labels: Sequence[str]) -> CountMatrix:
+        """
+        Sum columns that share a label into a dense (samples x genes) CountMatrix.
+
+        labels gives one sample name per column; samples are ordered by first
+        appearance. See pseudobulk_codes.
+        """
+        if len(labels) != self.n_columns:
+            raise ValueError(f"labels must have one entry per column ({self.n_columns}), got {len(labels)}")
+        codes, samples = pd.factorize(pd.Index(labels, dtype=str), sort=False)
+        if (codes < 0).any():
+            raise ValueError("labels must not contain missing values.")
+        return self.pseudobulk_codes(codes, [str(s) for s in samples])
+
+    def pseudobulk_codes(
+        self, codes: np.ndarray, samples: Sequence[str], chunk_columns: int = DEFAULT_CHUNK_COLUMNS
+    ) -> CountMatrix:
+        """
+        Sum columns per sample code (as from counts.sample_codes; -1 = drop).
+
+        Columns are processed in chunks of chunk_columns: each chunk is one
+        sparse product with its (columns x samples) indicator block, added
+        into the small dense genes x samples result.
+        """
+        codes = np.asarray(codes)
+        if len(codes) != self.n_columns:
+            raise ValueError(f"codes must have one entry per column ({self.n_columns}), got {len(codes)}")
+        summed = np.zeros((self.n_genes, len(samples)), dtype=np.float64)
+        for a in range(0, self.n_columns, chunk_columns):
+            c = codes[a:a + chunk_columns]
+            keep = np.flatnonzero(c >= 0)
+            indicator = sp.csr_matrix(
+                (np.ones(len(keep)), (keep, c[keep])), shape=(len(c), len(samples)))
+            summed += (self.data[:, a:a + chunk_columns] @ indicator).toarray()
+        return _dense_counts(summed, self.genes, samples)
+
+
+def _dense_counts(summed: np.ndarray, genes: np.ndarray, samples: Sequence[str]) -> CountMatrix:
+    # (genes x samples) sums -> sample-major CountMatrix, uint32 when it fits
+    values = np.rint(summed.T).astype(np.uint64)
+    if values.size == 0 or values.max() <= np.iinfo(np.uint32).max:
+        values = values.astype(np.uint32)
+    return CountMatrix(values=np.ascontiguousarray(values), genes=genes,
+                       samples=[str(s) for s in samples])
+
+
+def pseudobulk_matrix_market(
+    path: str | Path,
+    barcode_to_sample: Mapping[str, str] | pd.Series,
+    samples: Sequence[str],
+    chunksize: int = DEFAULT_CHUNKSIZE * 10,
+    drop_unmapped: bool = False,
+) -> CountMatrix:
+    """
+    Sum a Matrix Market file to samples while streaming its entries.
+
+    Columns are mapped once from barcodes.tsv (sample_codes); then
+    `chunksize` coordinate entries at a time are checked (non-negative
+    integers) and added into the genes x samples result with one bincount.
+    Memory is the result plus one chunk, whatever the number of cells.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Count matrix file not found: {path}")
+    genes = _first_column(_sidecar(path, GENE_FILES))
+    columns = _first_column(_sidecar(path, COLUMN_FILES))
+    codes = sample_codes(columns, barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+
+    n_header = 0
+    with (gzip.open(path, "rt") if path.suffix == ".gz" else path.open("r")) as f:
+        banner = f.readline()
+        if "coordinate" not in banner:
+            raise ValueError(f"Only coordinate Matrix Market files can be streamed: {path.name}")
+        n_header = 1
+        line = f.readline()
+        while line.startswith("%"):
+            n_header += 1
+            line = f.readline()
+        n_rows, n_cols, _ = (int(x) for x in line.split())
+        n_header += 1
+    if (n_rows, n_cols) != (len(genes), len(columns)):
+        raise ValueError(
+            f"{path.name} is {n_rows} x {n_cols} but has {len(genes)} genes and {len(columns)} barcodes.")
+
+    n_samples = len(samples)
+    summed = np.zeros(n_samples * n_rows, dtype=np.float64)
+    reader = pd.read_csv(path, sep=r"\s+", header=None, skiprows=n_header,
+                         usecols=[0, 1, 2], names=["row", "col", "value"], chunksize=chunksize)
+    offset = 0
+    with reader:
+        for chunk in reader:
+            v = chunk["value"].to_numpy(dtype=np.float64)
+            bad = np.flatnonzero(~((v >= 0) & (v == np.rint(v))))
+            if len(bad):
+                i = bad[0]
+                raise ValueError(
+                    f"Count matrix contains invalid values (counts must be integers >=0): "
+                    f"entry {offset + i} (Geneid '{genes[chunk['row'].iat[i] - 1]}', "
+                    f"column '{columns[chunk['col'].iat[i] - 1]}'): {v[i]!r}")
+            r = chunk["row"].to_numpy(dtype=np.int64) - 1
+            c = codes[chunk["col"].to_numpy(dtype=np.int64) - 1]
+            keep = c >= 0
+            summed += np.bincount(c[keep] * n_rows + r[keep], weights=v[keep],
+                                  minlength=n_samples * n_rows)
+            offset += len(chunk)
+    return _dense_counts(summed.reshape(n_samples, n_rows).T, genes, samples)
+
+
+def _triplet_chunks(path: Path, chunksize: int) -> Iterator[tuple[pd.Series, pd.Series, np.ndarray]]:
+    # (gene, column, count) per chunk of a triplet file; raises on bad layout or non-numeric counts
+    if not path.exists():
+        raise FileNotFoundError(f"Count matrix file not found: {path}")
+    sep = "," if path.name.lower().removesuffix(".gz").endswith(".csv") else "\t"
+    offset = 0
+    for chunk in pd.read_csv(path, sep=sep, dtype=str, chunksize=chunksize):
+        if chunk.shape[1] != 3 or chunk.columns[0] != REQUIRED_GENE_COLUMN:
+            raise ValueError(
+                f"Triplet file must have 3 columns: {REQUIRED_GENE_COLUMN}, <column>, count; "
+                f"got {list(chunk.columns)}")
+        g = chunk.iloc[:, 0].str.strip()
+        c = chunk.iloc[:, 1].str.strip()
+        raw = chunk.iloc[:, 2]
+        v = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+        bad = np.flatnonzero(np.isnan(v) & raw.notna().to_numpy())
+        if len(bad):
+            shown = [f"row {offset + i} ({g.iat[i]}, {c.iat[i]}): {raw.iat[i]!r}"
+                     for i in bad[:MAX_REPORTED_CELLS]]
+            raise ValueError(
+                "Count matrix contains non-numeric values (unable to parse string as a number): "
+                + "; ".join(shown))
+        yield g, c, v
+        offset += len(chunk)
+
+
+def pseudobulk_triplets(
+    path: str | Path,
+    barcode_to_sample: Mapping[str, str] | pd.Series,
+    samples: Sequence[str],
+    chunksize: int = DEFAULT_CHUNKSIZE * 10,
+    drop_unmapped: bool = False,
+) -> CountMatrix:
+    """
+    Sum a triplet file (Geneid, <column>, count) to samples while streaming it.
+
+    Each chunk's new columns are mapped to sample codes once, counts are
+    checked (non-negative integers) and added into the samples x genes
+    result with np.add.at; genes keep their order of first appearance.
+    Memory is the result plus one chunk. Repeated (gene, column) pairs are
+    summed, as in pseudobulk_matrix_market.
+    """
+    path = Path(path)
+    lookup = pd.Series(barcode_to_sample, dtype=object)
+    sample_index = pd.Index(list(samples))
+    genes = pd.Index([], dtype=object)
+    columns = pd.Index([], dtype=object)
+    column_codes = np.zeros(0, dtype=np.int64)
+    summed = np.zeros((len(samples), 1024), dtype=np.float64)
+    offset = 0
+    for g, c, v in _triplet_chunks(path, chunksize):
+        genes = genes.append(pd.Index(pd.unique(g[~g.isin(genes)])))
+        new = pd.Index(pd.unique(c[~c.isin(columns)]))
+        columns = columns.append(new)
+        # Unmapped or unknown columns get -1 here; sample_codes reports them below
+        column_codes = np.concatenate(
+            [column_codes, sample_index.get_indexer(lookup.reindex(new).to_numpy())])
+
+        ok = (v >= 0) & (v == np.rint(v))
+        if not ok.all():
+            i = int(np.flatnonzero(~ok)[0])
+            raise ValueError(
+                f"Count matrix contains invalid values (counts must be integers >=0): "
+                f"row {offset + i} (Geneid '{g.iat[i]}', column '{c.iat[i]}'): {v[i]!r}")
+        if len(genes) > summed.shape[1]:
+            grown = np.zeros((len(samples), max(2 * summed.shape[1], len(genes))))
+            grown[:, :summed.shape[1]] = summed
+            summed = grown
+        r = genes.get_indexer(g)
+        s = column_codes[columns.get_indexer(c)]
+        keep = s >= 0
+        np.add.at(summed, (s[keep], r[keep]), v[keep])
+        offset += len(g)
+
+    # Same checks and messages as the other formats (unmapped, unknown, empty samples)
+    sample_codes(columns, barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+    return _dense_counts(summed[:, :len(genes)].T, np.asarray(genes, dtype=str), samples)
+
+
+def load_pseudobulk(
+    path: str | Path,
+    fmt: str,
+    barcode_to_sample: Mapping[str, str] | pd.Series,
+    samples: Sequence[str],
+    drop_unmapped: bool = False,
+) -> CountMatrix:
+    """
+    Aggregate a cell/replicate-level count matrix of any input format to samples.
+
+    dense: streamed by gene chunks (counts.pseudobulk_count_matrix);
+    mtx: streamed by entries (pseudobulk_matrix_market);
+    triplets: streamed by rows (pseudobulk_triplets).
+    Returns a (samples x genes) CountMatrix in the order of `samples`.
+    """
+    if fmt == "dense":
+        df = pseudobulk_count_matrix(path, barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+        return CountMatrix.from_frame(df)
+    if fmt == "mtx":
+        return pseudobulk_matrix_market(path, barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+    if fmt == "triplets":
+        return pseudobulk_triplets(path, barcode_to_sample, samples, drop_unmapped=drop_unmapped)
+    raise ValueError(f"Count format must be 'dense' or one of {SPARSE_FORMATS}, got {fmt!r}")
+
+
+def _sidecar(path: Path, names: tuple[str, ...]) -> Path:
+    for name in names:
+        candidate = path.parent / name
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"None of {list(names)} found next to {path}")
+
+
+def _first_column(path: Path) -> np.ndarray:
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    return pd.read_csv(path, sep="\t", header=None, dtype=str, usecols=[0])[0].str.strip().to_numpy(dtype=str)
+
+
+def _scan_nonzeros(data: sp.csc_matrix, genes: np.ndarray, columns: list[str],
+                   max_issues: int) -> CountValidationReport:
+    v = data.data
+    n_bad = {k: 0 for k in ISSUE_KINDS}
+    if v.dtype.kind == "u":
+        return CountValidationReport(n_genes=len(genes), n_samples=len(columns), n_bad=n_bad)
+
+    if v.dtype.kind == "i":
+        bad = np.flatnonzero(v < 0)
+    else:
+        ok = (v >= 0) & (v == np.rint(v)) & (v != np.inf)
+        bad = np.flatnonzero(~ok)
+
+    kinds = np.empty(len(bad), dtype=object)
+    b = v[bad].astype(np.float64)
+    kinds[:] = "non-integer"
+    kinds[b < 0] = "negative"
+    kinds[(b != np.rint(b)) | np.isinf(b)] = "non-integer"
+    kinds[np.isnan(b)] = "missing"
+
+    rows = data.indices[bad]
+    cols = np.searchsorted(data.indptr, bad, side="right") - 1
+    issues: list[CellIssue] = []
+    for k in ISSUE_KINDS:
+        sel = np.flatnonzero(kinds == k)
+        n_bad[k] = int(len(sel))
+        order = np.lexsort((cols[sel], rows[sel]))[:max_issues]
+        issues.extend(
+            CellIssue(kind=k, row=int(rows[sel][i]), gene=str(genes[rows[sel][i]]),
+                      sample=str(columns[cols[sel][i]]), value=str(v[bad[sel][i]]))
+            for i in order
+        )
+    return CountValidationReport(n_genes=len(genes), n_samples=len(columns),
+                                 n_bad=n_bad, issues=tuple(issues))
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Order matters: it is the order in which problems are reported/raised
+ISSUE_KINDS = ("missing", "non-numeric", "non-integer", "negative")
+ISSUE_HINTS = {
+    "missing": "",
+    "non-numeric": " (unable to parse string as a number)",
+    "non-integer": " (counts must be integers)",
+    "negative": " (counts must be >=0)",
+}
+DEFAULT_MAX_ISSUES = 20
+DEFAULT_BLOCK_COLUMNS = 64
+
+
+@dataclass(frozen=True)
+class CellIssue:
+    kind: str
+    row: int
+    gene: str
+    sample: str
+    value: str
+
+    def __str__(self) -> str:
+        return f"row {self.row} (Geneid '{self.gene}'), column '{self.sample}': {self.value!r}"
+
+
+@dataclass(frozen=True)
+class CountValidationReport:
+    """
+    Result of scanning the sample block of a count matrix.
+
+    n_bad holds the total number of offending cells per kind; issues holds
+    only the first max_issues of them, ordered by (row, column).
+    """
+    n_genes: int
+    n_samples: int
+    n_bad: dict[str, int] = field(default_factory=dict)
+    issues: tuple[CellIssue, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.n_bad.values())
+
+    def raise_if_invalid(self) -> None:
+        """Raise ValueError for the first kind of problem found (see ISSUE_KINDS)."""
+        for kind in ISSUE_KINDS:
+            n = self.n_bad.get(kind, 0)
+            if not n:
+                continue
+            cells = [str(c) for c in self.issues if c.kind == kind]
+            if n > len(cells):
+                cells.append(f"... and {n - len(cells)} more")
+            raise ValueError(
+                f"Count matrix contains {kind} values in sample columns"
+                f"{ISSUE_HINTS[kind]}: " + "; ".join(cells)
+            )
+
+
+def to_count_block(frame: pd.DataFrame) -> tuple[np.ndarray, dict[int, np.ndarray]]:
+    """
+    Convert the sample columns of `frame` into one column-major 2-D array.
+
+    Integer frames are returned as-is (no float round trip). Any other column is
+    parsed into a float64 block (pd.to_numeric only when a plain cast fails);
+    cells that could not be parsed become NaN and their row positions are returned per column index so
+    they can be told apart from genuinely missing cells.
+    """
+    if all(dtype.kind in "iu" for dtype in frame.dtypes):
+        return np.asfortranarray(frame.to_numpy()), {}
+
+    values = np.empty(frame.shape, dtype=np.float64, order="F")
+    unparsed: dict[int, np.ndarray] = {}
+    for j in range(frame.shape[1]):
+        raw = frame.iloc[:, j]
+        if raw.dtype.kind in "iuf":
+            values[:, j] = raw.to_numpy(dtype=np.float64)
+            continue
+        present = raw.notna().to_numpy()
+        if present.all():
+            # Fast path: NumPy's string -> float cast is much cheaper than
+            # to_numeric, and only fails if some cell is not a number
+            try:
+                values[:, j] = raw.to_numpy(dtype=object).astype(np.float64)
+                continue
+            except (TypeError, ValueError):
+                pass
+        parsed = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64)
+        bad = np.isnan(parsed) & present
+        if bad.any():
+            unparsed[j] = np.flatnonzero(bad)
+        values[:, j] = parsed
+    return values, unparsed
+
+
+def _bad_mask(block: np.ndarray) -> np.ndarray | None:
+    # One combined predicate per block: NaN/inf, fractional and negative all fail it
+    if block.dtype.kind == "u":
+        return None
+    if block.dtype.kind == "i":
+        return block < 0
+    ok = block >= 0
+    ok &= block == np.rint(block)
+    ok &= block != np.inf
+    return ~ok
+
+
+def _classify(block: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+              unparsed_rows: dict[int, np.ndarray], col_offset: int) -> np.ndarray:
+    kinds = np.empty(rows.size, dtype=object)
+    if block.dtype.kind in "iu":
+        kinds[:] = "negative"
+        return kinds
+
+    v = block[rows, cols]
+    kinds[:] = "non-integer"
+    kinds[v < 0] = "negative"
+    kinds[v != np.rint(v)] = "non-integer"
+    kinds[~np.isfinite(v) & ~np.isnan(v)] = "non-integer"
+    nan = np.isnan(v)
+    kinds[nan] = "missing"
+    for j in np.unique(cols[nan]):
+        hit = unparsed_rows.get(int(j) + col_offset)
+        if hit is not None:
+            sel = nan & (cols == j)
+            kinds[sel & np.isin(rows, hit)] = "non-numeric"
+    return kinds
+
+
+def _scan_columns(values: np.ndarray, unparsed: dict[int, np.ndarray],
+                  start: int, stop: int, max_issues: int):
+    block = values[:, start:stop]
+    mask = _bad_mask(block)
+    if mask is None or not mask.any():
+        return {}, []
+
+    rows, cols = np.nonzero(mask)
+    kinds = _classify(block, rows, cols, unparsed, start)
+    totals = {k: int((kinds == k).sum()) for k in ISSUE_KINDS}
+
+    # keep the first max_issues per kind so every kind can be reported
+    kept: list[tuple[int, int, str]] = []
+    for k in ISSUE_KINDS:
+        sel = np.flatnonzero(kinds == k)
+        if sel.size:
+            order = np.lexsort((cols[sel], rows[sel]))[:max_issues]
+            kept.extend((int(rows[sel][i]), int(cols[sel][i]) + start, k) for i in order)
+    return totals, kept
+
+
+def scan_count_block(
+    values: np.ndarray,
+    unparsed: dict[int, np.ndarray],
+    frame: pd.DataFrame,
+    genes: np.ndarray,
+    *,
+    row_offset: int = 0,
+    max_issues: int = DEFAULT_MAX_ISSUES,
+    n_jobs: int = 1,
+    block_columns: int = DEFAULT_BLOCK_COLUMNS,
+) -> CountValidationReport:
+    """
+    Check missing, non-numeric, non-integer and negative cells in one pass.
+
+    The block is processed in slices of `block_columns` columns so temporary
+    masks stay small; with n_jobs > 1 the slices are scanned on a thread pool
+    (NumPy releases the GIL for these ufuncs). `frame` is only used to look up
+    the original text of offending cells. Rows in the report are 0-based data
+    rows shifted by `row_offset`.
+    """
+    n_rows, n_cols = values.shape
+    spans = [(a, min(a + block_columns, n_cols))
+             for a in range(0, n_cols, block_columns)]
+
+    if n_jobs > 1 and len(spans) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(
+                lambda s: _scan_columns(values, unparsed, s[0], s[1], max_issues), spans))
+    else:
+        results = [_scan_columns(values, unparsed, a, b, max_issues) for a, b in spans]
+
+    n_bad = {k: 0 for k in ISSUE_KINDS}
+    kept: list[tuple[int, int, str]] = []
+    for totals, cells in results:
+        for k, n in totals.items():
+            n_bad[k] += n
+        kept.extend(cells)
+
+    issues: list[CellIssue] = []
+    for k in ISSUE_KINDS:
+        first = sorted((r, c) for r, c, kind in kept if kind == k)[:max_issues]
+        issues.extend(
+            CellIssue(
+                kind=k,
+                row=row_offset + r,
+                gene=str(genes[r]),
+                sample=str(frame.columns[c]),
+                value=str(frame.iat[r, c]),
+            )
+            for r, c in first
+        )
+
+    return CountValidationReport(
+        n_genes=n_rows, n_samples=n_cols, n_bad=n_bad, issues=tuple(issues))
+
+
+def check_count_values(
+    frame: pd.DataFrame,
+    genes: np.ndarray,
+    *,
+    row_offset: int = 0,
+    max_issues: int = DEFAULT_MAX_ISSUES,
+    n_jobs: int = 1,
+) -> tuple[np.ndarray, CountValidationReport]:
+    """Convert `frame` (sample columns only) once and scan it; returns (block, report)."""
+    values, unparsed = to_count_block(frame)
+    report = scan_count_block(
+        values, unparsed, frame, genes,
+        row_offset=row_offset, max_issues=max_issues, n_jobs=n_jobs,
+    )
+    return values, report
@@ -3,7 +3,51 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+import pytest
+
 # Add the <project_root>/src to python import path for all tests
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC = PROJECT_ROOT / "src"
 sys.path.insert(0, str(SRC))
+
+
+def _tree_condition_counts(
+    n_samples: int = 8,
+    n_genes: int = 120,
+    n_effect: int = 10,
+    effect: float = 4.0,
+    size: float = 5.0,
+    seed: int = 0,
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Negative-binomial (samples x genes) counts with a tree + condition sheet.
+
+    Trees cycle 1..4, the first half of the samples are Control and the rest
+    Protzen; Protzen samples get `effect` x the mean on the first n_effect
+    genes. Library sizes vary 0.5-2x so size factors are not trivial.
+    """
+    rng = np.random.default_rng(seed)
+    mean = rng.gamma(2.0, 50.0, size=n_genes)
+    depth = rng.uniform(0.5, 2.0, size=(n_samples, 1))
+    protzen = np.arange(n_samples) >= n_samples // 2
+    fold = np.ones(n_genes)
+    fold[:n_effect] = effect
+    mu = mean * depth * np.where(protzen[:, None], fold, 1.0)
+    counts = rng.negative_binomial(size, size / (size + mu)).astype(np.int64)
+    coldata = pd.DataFrame(
+        {
+            "tree": pd.Categorical([str(i % 4 + 1) for i in range(n_samples)]),
+            "condition": pd.Categorical(np.where(protzen, "Protzen", "Control"),
+                                        categories=["Control", "Protzen"]),
+        },
+        index=[f"S{i}" for i in range(n_samples)],
+    )
+    return counts, coldata
+
+
+@pytest.fixture
+def tree_condition_counts():
+    """Factory for the shared simulated DE dataset (see _tree_condition_counts)."""
+    return _tree_condition_counts
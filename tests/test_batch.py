@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from rnaseq_native.batch import THREAD_ENV_VARS, discover_plans, thread_env, warm_count_cache
+from rnaseq_native.cache import CountCacheConfig
+
+
+def _plan(path: Path, counts: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"inputs": {"counts_csv": str(counts)}}), encoding="utf-8")
+    return path
+
+
+def test_discover_plans_from_dir_and_manifest(tmp_path: Path) -> None:
+    a = _plan(tmp_path / "leaf" / "de_plan.json", tmp_path / "c.csv")
+    b = _plan(tmp_path / "root" / "de_plan_t2.json", tmp_path / "c.csv")
+    (tmp_path / "root" / "other.json").write_text("{}", encoding="utf-8")
+
+    assert discover_plans(tmp_path) == [a.resolve(), b.resolve()]
+
+    manifest = tmp_path / "plans.txt"
+    manifest.write_text(
+        "# plans\nroot/de_plan_t2.json\n\nleaf/de_plan.json\nroot/de_plan_t2.json\n",
+        encoding="utf-8",
+    )
+    assert discover_plans(manifest) == [b.resolve(), a.resolve()]
+
+
+def test_discover_plans_missing_entry_raises(tmp_path: Path) -> None:
+    manifest = tmp_path / "plans.txt"
+    manifest.write_text("nope/de_plan.json\n", encoding="utf-8")
+    with pytest.raises(FileNotFoundError):
+        discover_plans(manifest)
+
+
+def test_thread_env_caps_all_pools() -> None:
+    env = thread_env(3, base={"PATH": "/bin"})
+    assert env["PATH"] == "/bin"
+    assert all(env[v] == "3" for v in THREAD_ENV_VARS)
+
+
+def test_warm_cache_loads_shared_counts_once_and_isolates_failures(tmp_path: Path) -> None:
+    counts = tmp_path / "counts.csv"
+    counts.write_text("Geneid,A\ng1,1\n", encoding="utf-8")
+    p1 = _plan(tmp_path / "t1" / "de_plan.json", counts)
+    p2 = _plan(tmp_path / "t2" / "de_plan.json", counts)
+    bad = _plan(tmp_path / "t3" / "de_plan.json", tmp_path / "missing.csv")
+    cache = CountCacheConfig(directory=tmp_path / "cache")
+
+    status = warm_count_cache([p1, p2, bad], cache)
+
+    assert status[p1] == (cache, None)
+    assert status[p2] == (cache, None)
+    assert "missing.csv" in status[bad][1]
+    assert len(list(cache.directory.iterdir())) == 1
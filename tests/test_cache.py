@@ -0,0 +1,59 @@
+import os
+from pathlib import Path
+
+
+from rnaseq_native.cache import (
+    CountCacheConfig,
+    evict_count_cache,
+    invalidate_count_cache,
+    load_count_matrix_cached,
+)
+
+
+def _write_counts(path: Path, text: str = "Geneid,A,B\ng1,1,2\ng2,3,4\n") -> Path:
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_cache_hit_is_memory_mapped(tmp_path: Path) -> None:
+    counts = _write_counts(tmp_path / "counts.csv")
+    cache = CountCacheConfig(directory=tmp_path / "cache")
+
+    first = load_count_matrix_cached(counts, cache)
+    second = load_count_matrix_cached(counts, cache)
+
+    assert first.equals(second)
+    assert second["Geneid"].tolist() == ["g1", "g2"]
+    assert second["B"].tolist() == [2, 4]
+    # mapped read-only from the cached .npy block
+    assert not second["A"].to_numpy().flags.writeable
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_cache_rebuilds_when_content_changes(tmp_path: Path) -> None:
+    counts = _write_counts(tmp_path / "counts.csv")
+    cache = CountCacheConfig(directory=tmp_path / "cache")
+    load_count_matrix_cached(counts, cache)
+
+    _write_counts(counts, "Geneid,A,B\ng1,9,2\ng2,3,4\n")
+    st = counts.stat()
+    os.utime(counts, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    df = load_count_matrix_cached(counts, cache)
+    assert df["A"].tolist() == [9, 3]
+
+
+def test_invalidate_and_evict(tmp_path: Path) -> None:
+    cache = CountCacheConfig(directory=tmp_path / "cache")
+    a = _write_counts(tmp_path / "a.csv")
+    b = _write_counts(tmp_path / "b.csv")
+    load_count_matrix_cached(a, cache)
+    load_count_matrix_cached(b, cache)
+    assert len(list(cache.directory.iterdir())) == 2
+
+    removed = evict_count_cache(cache.directory, max_bytes=1)
+    assert len(removed) == 2
+
+    load_count_matrix_cached(a, cache)
+    assert invalidate_count_cache(a, cache)
+    assert not invalidate_count_cache(a, cache)
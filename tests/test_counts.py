@@ -5,8 +5,11 @@ import pytest
 
 from rnaseq_native.counts import (
     load_count_matrix, 
+    load_count_matrix_typed,
     validate_count_matrix, 
     align_counts_and_samples,
+    pseudobulk_count_matrix,
+    sample_codes,
 )
 
 
@@ -104,3 +107,57 @@ def test_align_reorders_metadata_to_match_counts() -> None:
     )
     _, meta2 = align_counts_and_samples(counts, meta)
     assert meta2["sample"].tolist() == ["B", "A"]
+
+
+def test_typed_loader_parses_compact_integers(tmp_path: Path) -> None:
+    p = tmp_path / "counts.csv"
+    p.write_text("Geneid,A,B\ng1,1,2\ng2,3,4\ng3,0,5\n", encoding="utf-8")
+    df = load_count_matrix_typed(p, chunksize=2)
+    assert list(df.columns) == ["Geneid", "A", "B"]
+    assert df["Geneid"].tolist() == ["g1", "g2", "g3"]
+    assert df["A"].dtype == "uint32"
+    assert df["B"].tolist() == [2, 4, 5]
+    validate_count_matrix(df)
+
+
+def test_typed_loader_widens_to_uint64(tmp_path: Path) -> None:
+    p = tmp_path / "counts.tsv"
+    p.write_text("Geneid\tA\ng1\t1\ng2\t5000000000\n", encoding="utf-8")
+    df = load_count_matrix_typed(p, chunksize=1)
+    assert df["A"].dtype == "uint64"
+    assert df["A"].tolist() == [1, 5000000000]
+
+
+def test_typed_loader_reports_bad_cell_coordinates(tmp_path: Path) -> None:
+    p = tmp_path / "counts.csv"
+    p.write_text("Geneid,A,B\ng1,1,2\ng2,3,4\ng3,1.5,5\n", encoding="utf-8")
+    with pytest.raises(ValueError) as excinfo:
+        load_count_matrix_typed(p, chunksize=2)
+    msg = str(excinfo.value)
+    assert "non-integer" in msg
+    assert "row 2" in msg
+    assert "'g3'" in msg
+    assert "column 'A'" in msg
+
+
+def test_pseudobulk_sums_mapped_columns_per_sample(tmp_path: Path) -> None:
+    p = tmp_path / "cells.csv"
+    p.write_text("Geneid,c1,c2,c3,c4,junk\ng1,1,2,3,4,x\ng2,0,5,0,1,x\ng3,2,2,2,2,x\n",
+                 encoding="utf-8")
+    mapping = {"c1": "B", "c2": "A", "c3": "B", "c4": "A"}
+    df = pseudobulk_count_matrix(p, mapping, ["A", "B"], chunksize=2, drop_unmapped=True)
+    assert list(df.columns) == ["Geneid", "A", "B"]
+    assert df["A"].tolist() == [6, 6, 4]
+    assert df["B"].tolist() == [4, 0, 4]
+    assert df["A"].dtype == "uint32"
+
+    with pytest.raises(ValueError, match="no sample in the barcode table: \\['junk'\\]"):
+        pseudobulk_count_matrix(p, mapping, ["A", "B"])
+
+
+def test_sample_codes_rejects_unknown_and_empty_samples() -> None:
+    assert sample_codes(["c1", "c2"], {"c1": "A", "c2": "A"}, ["A"]).tolist() == [0, 0]
+    with pytest.raises(ValueError, match="not in samples.tsv: \\['Z'\\]"):
+        sample_codes(["c1", "c2"], {"c1": "A", "c2": "Z"}, ["A"])
+    with pytest.raises(ValueError, match="No count matrix columns for samples: \\['B'\\]"):
+        sample_codes(["c1"], {"c1": "A"}, ["A", "B"])
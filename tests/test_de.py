@@ -0,0 +1,76 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from anndata import AnnData
+from pydeseq2.dds import DeseqDataSet
+
+from rnaseq_native.de import contrast_label, normalize_contrasts, run_contrasts, summarize_results
+
+
+def test_single_contrast_is_wrapped() -> None:
+    assert normalize_contrasts(["condition", "Protzen", "Control"]) == [
+        ["condition", "Protzen", "Control"]
+    ]
+
+
+def test_list_of_contrasts_and_labels() -> None:
+    contrasts = normalize_contrasts(
+        [["condition", "Protzen", "Control"], ["tree", "5", "1"]]
+    )
+    assert [contrast_label(c) for c in contrasts] == [
+        "condition_Protzen_vs_Control",
+        "tree_5_vs_1",
+    ]
+
+
+def test_bad_or_duplicate_contrasts_rejected() -> None:
+    with pytest.raises(ValueError):
+        normalize_contrasts([["condition", "Protzen"]])
+    with pytest.raises(ValueError) as excinfo:
+        normalize_contrasts([["tree", "5", "1"], ["tree", "5", "1"]])
+    assert "Duplicate" in str(excinfo.value)
+
+
+def test_summarize_results_counts() -> None:
+    res = pd.DataFrame({"pvalue": [0.01, 0.2, None], "padj": [0.04, None, None]})
+    assert summarize_results(res) == {
+        "genes_total": 3,
+        "pvalue_nan": 1,
+        "padj_nan": 2,
+        "pvalue_lt_005": 1,
+        "padj_lt_005": 1,
+    }
+
+
+def _fitted_dds(counts: np.ndarray, coldata: pd.DataFrame) -> DeseqDataSet:
+    adata = AnnData(X=counts, obs=coldata,
+                    var=pd.DataFrame(index=[f"g{i}" for i in range(counts.shape[1])]))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        dds = DeseqDataSet(adata=adata, design="~ tree + condition", n_cpus=1, quiet=True)
+        dds.deseq2()
+    return dds
+
+
+def test_run_contrasts_same_results_for_every_executor(tree_condition_counts) -> None:
+    dds = _fitted_dds(*tree_condition_counts(n_genes=40, n_effect=5))
+    contrasts = normalize_contrasts(
+        [["tree", "3", "1"], ["condition", "Protzen", "Control"], ["tree", "2", "1"]])
+    labels = [contrast_label(c) for c in contrasts]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        serial = run_contrasts(dds, contrasts, n_workers=1)
+        process = run_contrasts(dds, contrasts, n_workers=2, executor="process")
+        thread = run_contrasts(dds, contrasts, n_workers=2, executor="thread")
+
+    for results in (serial, process, thread):
+        assert list(results) == labels
+    for label in labels:
+        pd.testing.assert_frame_equal(process[label], serial[label])
+        pd.testing.assert_frame_equal(thread[label], serial[label])
+    with pytest.raises(ValueError, match="executor"):
+        run_contrasts(dds, contrasts, n_workers=2, executor="dask")
+
@@ -0,0 +1,39 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from anndata import AnnData
+from pydeseq2.dds import DeseqDataSet
+from pydeseq2.default_inference import DefaultInference
+
+from rnaseq_native.de_chunks import ChunkedInference
+
+
+def _fit(data: tuple[np.ndarray, pd.DataFrame], inference) -> DeseqDataSet:
+    counts, coldata = data
+    adata = AnnData(X=counts, obs=coldata,
+                    var=pd.DataFrame(index=[f"g{i}" for i in range(counts.shape[1])]))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        dds = DeseqDataSet(adata=adata, design="~ tree + condition",
+                           inference=inference, quiet=True)
+        dds.deseq2()
+    return dds
+
+
+def test_chunked_fit_matches_single_process(tree_condition_counts) -> None:
+    data = tree_condition_counts()
+    ref = _fit(data, DefaultInference(n_cpus=1))
+    with ChunkedInference(n_cpus=2, chunk_size=25) as inference:
+        got = _fit(data, inference)
+
+    for key in ["genewise_dispersions", "fitted_dispersions", "dispersions"]:
+        np.testing.assert_array_equal(got.var[key], ref.var[key])
+    np.testing.assert_array_equal(got.varm["LFC"], ref.varm["LFC"])
+    np.testing.assert_array_equal(got.obs["size_factors"], ref.obs["size_factors"])
+
+
+def test_chunk_size_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        ChunkedInference(n_cpus=2, chunk_size=0)
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import numpy as np
+
+from rnaseq_native.counts import load_count_matrix, validate_count_matrix
+from rnaseq_native.featurecounts import (
+    CountOptions,
+    count_reads,
+    count_samples,
+    load_annotation,
+    write_count_csv,
+)
+
+GTF = "\n".join([
+    '#!genome-build test',
+    'chr1\tsrc\tgene\t100\t900\t.\t+\t.\tgene_id "G1";',
+    'chr1\tsrc\texon\t100\t200\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+    'chr1\tsrc\texon\t800\t900\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+    'chr1\tsrc\texon\t400\t500\t.\t-\t.\tgene_id "G2"; transcript_id "T2";',
+    'chr1\tsrc\texon\t480\t600\t.\t+\t.\tgene_id "G3"; transcript_id "T3";',
+    'chr2\tsrc\texon\t10\t50\t.\t+\t.\tgene_id "G4"; transcript_id "T4";',
+]) + "\n"
+
+
+def _sam(path: Path, records: list[tuple[int, str, int, int, str]]) -> Path:
+    lines = ["@HD\tVN:1.6", "@SQ\tSN:chr1\tLN:1000"]
+    lines += [f"r{i}\t{flag}\t{chrom}\t{pos}\t{mapq}\t{cigar}\t*\t0\t0\tACGT\tIIII"
+              for i, (flag, chrom, pos, mapq, cigar) in enumerate(records)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+RECORDS = [
+    (0, "chr1", 150, 60, "20M"),  # G1
+    (0, "chr1", 190, 60, "11M600N20M"),  # spliced over the intron: G1 once
+    (0, "chr1", 300, 60, "50M"),  # intron only: no feature
+    (0, "chr1", 470, 60, "20M"),  # G2 and G3 overlap: ambiguous
+    (16, "chr2", 20, 60, "10M"),  # G4
+    (4, "*", 0, 0, "*"),  # unmapped
+    (256, "chr1", 150, 60, "20M"),  # secondary
+    (0, "chr1", 150, 3, "20M"),  # low MAPQ
+    (0x1 | 0x80, "chr1", 150, 60, "20M"),  # second mate: counted via the first
+]
+
+
+def test_count_reads_assigns_like_featurecounts(tmp_path: Path) -> None:
+    (tmp_path / "a.gtf").write_text(GTF, encoding="utf-8")
+    options = CountOptions(min_mapq=10)
+    index = load_annotation(tmp_path / "a.gtf", options)
+    assert index.genes.tolist() == ["G1", "G2", "G3", "G4"]
+
+    counts, status = count_reads(_sam(tmp_path / "s.sam", RECORDS), index, options, chunksize=3)
+    assert counts.tolist() == [2, 0, 0, 1]
+    assert status == {
+        "assigned": 3,
+        "unassigned_unmapped": 1,
+        "unassigned_secondary": 1,
+        "unassigned_mapq": 1,
+        "unassigned_no_features": 1,
+        "unassigned_ambiguity": 1,
+    }
+
+    # Stranded: the read over G2/G3 on + only hits G3; the reverse read on chr2 is lost
+    stranded = CountOptions(min_mapq=10, strand=1)
+    counts, _ = count_reads(tmp_path / "s.sam", load_annotation(tmp_path / "a.gtf", stranded), stranded)
+    assert counts.tolist() == [2, 0, 1, 0]
+
+
+def test_count_samples_writes_a_valid_count_matrix(tmp_path: Path) -> None:
+    (tmp_path / "a.gtf").write_text(GTF, encoding="utf-8")
+    index = load_annotation(tmp_path / "a.gtf")
+    bed = tmp_path / "s2.bed"
+    bed.write_text("chr1\t99\t120\tr1\t60\t+\nchr1\t819\t840\tr2\t60\t-\nchr2\t0\t30\tr3\t60\t+\n",
+                   encoding="utf-8")
+    counts, summary = count_samples(
+        {"S1": _sam(tmp_path / "s1.sam", RECORDS), "S2": bed}, index, n_jobs=2)
+
+    assert counts.samples == ["S1", "S2"]
+    assert counts.values.dtype == np.uint32
+    assert counts.values[1].tolist() == [2, 0, 0, 1]
+    assert summary.loc["S2", "assigned"] == 3
+
+    df = load_count_matrix(write_count_csv(counts, tmp_path / "gene_count_matrix.csv"))
+    validate_count_matrix(df)
+    assert df["S1"].astype(int).tolist() == counts.values[0].tolist()
@@ -0,0 +1,75 @@
+import shutil
+
+import numpy as np
+
+from rnaseq_native.genesets import GeneSetCollection, compile_gmt, load_gene_sets, parse_gmt
+
+
+def _write_gmt(path) -> None:
+    path.write_text(
+        "GO:1\tfirst\tat1g1, AT1G2,at1g1\n"
+        "GO:2\tsecond\tAT1G2\tAT1G3\tAT1G4\tAT1G3\n"
+        "GO:1\tdup term\tAT1G5\n"
+        "short\tline\n"
+        "GO:3\tsingle\tAT1G9\n",
+        encoding="utf-8",
+    )
+
+
+def test_parse_gmt_both_layouts(tmp_path) -> None:
+    path = tmp_path / "sets.gmt"
+    _write_gmt(path)
+    sets = parse_gmt(path)
+    assert dict(sets) == {
+        "GO:1": ["AT1G1", "AT1G2", "AT1G5"],
+        "GO:2": ["AT1G2", "AT1G3", "AT1G4"],
+        "GO:3": ["AT1G9"],
+    }
+    assert sets.descriptions.tolist() == ["first", "second", "single"]
+    assert sets.sizes.tolist() == [3, 3, 1]
+    # the gene dictionary is shared between sets
+    assert len(sets.genes) == 6
+
+
+def test_compile_filter_and_restrict(tmp_path) -> None:
+    path = tmp_path / "sets.gmt"
+    _write_gmt(path)
+    compiled = compile_gmt(path, min_size=2)
+    assert compiled.names.tolist() == ["GO:1", "GO:2"]
+    assert "AT1G9" not in compiled.genes.tolist()
+
+    loaded = load_gene_sets(path, min_size=2)
+    assert loaded.meta["source"]["size"] == path.stat().st_size
+    assert dict(loaded) == dict(compiled)
+    # the stored file is unfiltered; filters are applied per load
+    stored = GeneSetCollection.load(tmp_path / "sets.npz")
+    assert stored.names.tolist() == ["GO:1", "GO:2", "GO:3"]
+    assert np.array_equal(stored.filter_size(2).indices, compiled.indices)
+    stamp = (tmp_path / "sets.npz").stat().st_mtime_ns
+    assert len(load_gene_sets(path)) == 3
+    assert (tmp_path / "sets.npz").stat().st_mtime_ns == stamp
+
+    # a copied .npz (same size and mtime) built from another GMT is not reused
+    (tmp_path / "copy").mkdir()
+    for name in ("sets.gmt", "sets.npz"):
+        shutil.copy2(tmp_path / name, tmp_path / "copy" / name)
+    copied = load_gene_sets(tmp_path / "copy" / "sets.gmt", min_size=2)
+    assert copied.meta["source"]["path"] == str((tmp_path / "copy" / "sets.gmt").resolve())
+
+    # members outside the universe are dropped before the size filter
+    ranked = compiled.restrict_to(["AT1G4", "AT1G2", "AT1G3"], min_size=2)
+    assert ranked.names.tolist() == ["GO:2"]
+    assert sorted(ranked.members(0).tolist()) == [0, 1, 2]
+
+
+def test_unreadable_compiled_file_is_rebuilt(tmp_path) -> None:
+    path = tmp_path / "sets.gmt"
+    _write_gmt(path)
+    compiled = compile_gmt(path)
+    # e.g. a half-written file left by an interrupted writer
+    npz = tmp_path / "sets.npz"
+    npz.write_bytes(npz.read_bytes()[:100])
+    assert dict(load_gene_sets(path)) == dict(compiled)
+    assert dict(GeneSetCollection.load(npz)) == dict(compiled)
+    assert [p.name for p in tmp_path.iterdir() if ".tmp-" in p.name] == []
+
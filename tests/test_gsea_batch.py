@@ -0,0 +1,39 @@
+import numpy as np
+
+from rnaseq_native.gsea import PrerankOptions
+from rnaseq_native.gsea_batch import GseaManifest, expand_jobs, run_gsea_jobs
+
+
+def _inputs(tmp_path):
+    rng = np.random.default_rng(0)
+    genes = [f"AT1G{i:05d}" for i in range(200)]
+    ranked = {}
+    for name in ("c1", "c2"):
+        path = tmp_path / f"{name}.rnk"
+        path.write_text("".join(f"{g}\t{m}\n" for g, m in zip(genes, rng.normal(size=200))))
+        ranked[name] = path
+    gmt = tmp_path / "bp.gmt"
+    gmt.write_text("".join(
+        f"GO:{t}\tterm\t" + "\t".join(rng.choice(genes, 20, replace=False)) + "\n" for t in range(10)))
+    return ranked, {"bp": gmt}
+
+
+def test_cross_product_runs_and_manifest_skips_unchanged(tmp_path) -> None:
+    ranked, libraries = _inputs(tmp_path)
+    jobs = expand_jobs(ranked, libraries, tmp_path / "gsea")
+    assert [j.name for j in jobs] == ["c1/bp", "c2/bp"]
+
+    options = PrerankOptions(permutations=50, min_size=5, block_size=25)
+    manifest = GseaManifest(tmp_path / "gsea" / "gsea_manifest.json")
+    results = run_gsea_jobs(jobs, options, max_threads=2,
+                            on_complete=lambda job, res: manifest.record(job, options))
+    assert all(r.ok for r in results) and [r.n_sets for r in results] == [10, 10]
+    assert (tmp_path / "bp.npz").exists()
+    manifest.save()
+
+    reloaded = GseaManifest(tmp_path / "gsea" / "gsea_manifest.json")
+    assert all(reloaded.is_current(j, options) for j in jobs)
+    # more permutations or a changed ranked list force a rerun
+    assert not reloaded.is_current(jobs[0], PrerankOptions(permutations=100, min_size=5, block_size=25))
+    ranked["c2"].write_text(ranked["c2"].read_text() + "AT9G00001\t0.5\n")
+    assert reloaded.is_current(jobs[0], options) and not reloaded.is_current(jobs[1], options)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnaseq_native.idmap import StrgTairIndex, load_id_index, strip_tair_isoform
+
+
+def _annotation() -> pd.DataFrame:
+    return pd.DataFrame({
+        "STRG_key": ["STRG.1", "STRG.2", "STRG.2", "STRG.3", " STRG.4 ", "STRG.5", "STRG.1"],
+        "Arabidopsis_ID": ["AT1G11910.1", "AT2G00002.1", "AT1G00001.2", None, "AT3G00003", "", "AT1G11910.2"],
+        "other": range(7),
+    })
+
+
+def test_strip_and_build_index() -> None:
+    assert strip_tair_isoform(["AT1G11910.1", " AT2G1 ", None]).tolist()[:2] == ["AT1G11910", "AT2G1"]
+
+    index = StrgTairIndex.from_frame(_annotation())
+    assert index.keys.tolist() == ["STRG.1", "STRG.2", "STRG.4"]
+    # STRG.2 has two TAIR genes: the first in sort order is kept
+    assert index.tair.tolist() == ["AT1G11910", "AT1G00001", "AT3G00003"]
+    assert index.meta["n_multi"] == 1
+    assert index.lookup(["STRG.4", "STRG.9", "STRG.1"]).tolist() == ["AT3G00003", None, "AT1G11910"]
+
+
+def test_map_ranked_and_annotate() -> None:
+    index = StrgTairIndex.from_frame(_annotation())
+    ranked = pd.DataFrame({
+        "gene": ["STRG.1", "STRG.2", "STRG.9", "STRG.4"],
+        "rank_metric": [-3.0, 1.0, 2.0, 0.5],
+    })
+    mapped, unmapped = index.map_ranked(ranked)
+    assert mapped["gene_tair"].tolist() == ["AT1G00001", "AT3G00003", "AT1G11910"]
+    assert mapped["rank_metric"].tolist() == [1.0, 0.5, -3.0]
+    assert unmapped["gene"].tolist() == ["STRG.9"]
+
+    res = pd.DataFrame({"log2FoldChange": [1.0, 2.0]}, index=["STRG.9", "STRG.2"])
+    assert index.annotate(res)["gene_tair"].tolist() == [None, "AT1G00001"]
+
+
+def test_load_id_index_is_persistent(tmp_path) -> None:
+    path = tmp_path / "ann.csv"
+    _annotation().to_csv(path, index=False)
+    cache_dir = tmp_path / "idmap"
+
+    first = load_id_index(path, cache_dir)
+    assert isinstance(first.keys, np.memmap)
+    assert first.meta["source"]["size"] == path.stat().st_size
+
+    again = load_id_index(path, cache_dir)
+    assert again.keys.tolist() == first.keys.tolist()
+
+    # a changed file is picked up
+    pd.DataFrame({"STRG_key": ["STRG.7"], "Arabidopsis_ID": ["AT5G00007.1"]}).to_csv(path, index=False)
+    assert load_id_index(path, cache_dir).tair.tolist() == ["AT5G00007"]
+
+    pd.DataFrame({"STRG_key": ["STRG.7"]}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="Missing columns in annotation file"):
+        load_id_index(path, None)
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import pytest
 
-from rnaseq_native.io import load_samples_tsv, REQUIRED_COLUMNS
+from rnaseq_native.io import find_missing_paths, load_barcode_map, load_samples_tsv, REQUIRED_COLUMNS
 
 
 def _write_tsv(path: Path, text: str) -> Path:
@@ -83,3 +83,24 @@ def test_minimal_samplesheet_allowed_in_counts_mode(tmp_path: Path) -> None:
     df = load_samples_tsv(p, require_fastq=False)
     assert df.shape[0] == 2
     assert df["sample"].tolist() == ["A", "B"]
+
+
+def test_barcode_map_rejects_repeated_barcodes(tmp_path: Path) -> None:
+    p = _write_tsv(tmp_path / "barcodes.tsv", "barcode\tsample\n c1 \tA\nc2\tB\n")
+    mapping = load_barcode_map(p)
+    assert mapping.to_dict() == {"c1": "A", "c2": "B"}
+
+    p = _write_tsv(tmp_path / "dups.tsv", "barcode\tsample\nc1\tA\nc1\tB\n")
+    with pytest.raises(ValueError, match="more than once"):
+        load_barcode_map(p)
+
+
+def test_find_missing_paths_lists_each_folder_once(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "S1_R1.fq.gz").write_text("x")
+    paths = [
+        str(tmp_path / "a" / "S1_R1.fq.gz"),
+        str(tmp_path / "a" / "S1_R2.fq.gz"),
+        str(tmp_path / "nofolder" / "S2_R1.fq.gz"),
+    ]
+    assert find_missing_paths(paths, n_jobs=2) == paths[1:]
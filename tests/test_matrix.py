@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnaseq_native.cache import CountCacheConfig
+from rnaseq_native.matrix import CountMatrix
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"Geneid": ["g1", "g2", "g3"], "A": [0, 5, 20], "B": [1, 6, 0]}
+    )
+
+
+def test_from_frame_is_sample_major() -> None:
+    cm = CountMatrix.from_frame(_frame())
+    assert cm.samples == ["A", "B"]
+    assert cm.values.shape == (2, 3)
+    assert cm.values.flags.c_contiguous
+    assert cm.values[1].tolist() == [1, 6, 0]
+
+
+def test_filter_is_index_view_until_materialised() -> None:
+    cm = CountMatrix.from_frame(_frame())
+    kept = cm.filter_min_total(10)
+    assert kept.values is cm.values
+    assert kept.kept_genes.tolist() == ["g2", "g3"]
+    assert kept.to_array().tolist() == [[5, 20], [6, 0]]
+    assert cm.filter_min_total(0) is cm
+    assert cm.to_array() is cm.values
+
+
+def test_from_cache_maps_block_and_round_trips(tmp_path: Path) -> None:
+    p = tmp_path / "counts.csv"
+    p.write_text("Geneid,A,B\ng1,0,1\ng2,5,6\ng3,20,0\n", encoding="utf-8")
+    cm = CountMatrix.from_cache(p, CountCacheConfig(directory=tmp_path / "cache"))
+    assert isinstance(cm.values, np.memmap)
+
+    saved = cm.filter_min_total(10).save(tmp_path / "kept")
+    back = CountMatrix.load(saved)
+    assert back.genes.tolist() == ["g2", "g3"]
+    assert back.to_array().tolist() == [[5, 20], [6, 0]]
+
+
+def test_to_anndata_requires_matching_sample_order() -> None:
+    pytest.importorskip("anndata")
+    cm = CountMatrix.from_frame(_frame())
+    meta = pd.DataFrame({"condition": ["Control", "Protzen"]}, index=["B", "A"])
+    with pytest.raises(ValueError):
+        cm.to_anndata(meta)
+    adata = cm.to_anndata(meta.loc[["A", "B"]])
+    assert adata.shape == (2, 3)
+    assert adata.var_names.tolist() == ["g1", "g2", "g3"]
@@ -0,0 +1,37 @@
+import numpy as np
+from pydeseq2.preprocessing import deseq2_norm
+
+from rnaseq_native.normalize import load_normalized, size_factors, vst_transform
+
+
+def test_chunked_size_factors_match_pydeseq2(tree_condition_counts) -> None:
+    for n_samples in (6, 7):
+        counts, _ = tree_condition_counts(n_samples=n_samples, n_genes=2001)
+        _, ref = deseq2_norm(counts)
+        np.testing.assert_allclose(size_factors(counts, chunk_size=300), ref, rtol=1e-12)
+
+
+def test_vst_mean_trend_is_pydeseq2_arcsinh_form() -> None:
+    q = np.array([0.0, 1.0, 10.0, 1e4])
+    a0 = 0.2
+    ref = (2 * np.arcsinh(np.sqrt(a0 * q)) - np.log(a0) - np.log(4)) / np.log(2)
+    np.testing.assert_allclose(vst_transform(q, (a0, 0.0)), ref)
+
+
+def test_normalized_store_is_reused_until_key_changes(tmp_path, tree_condition_counts) -> None:
+    counts, _ = tree_condition_counts(n_samples=7, n_genes=500)
+    genes = [f"g{i}" for i in range(500)]
+    samples = [f"S{i}" for i in range(7)]
+    out = tmp_path / "normalized"
+
+    first = load_normalized(out, counts, genes, samples, {"counts": 1}, chunk_size=128)
+    assert isinstance(first.vst, np.memmap)
+    np.testing.assert_allclose(first.normed, counts / first.size_factors[:, None], rtol=1e-6)
+    stamp = (out / "vst_counts.npy").stat().st_mtime_ns
+
+    again = load_normalized(out, counts, genes, samples, {"counts": 1})
+    assert (out / "vst_counts.npy").stat().st_mtime_ns == stamp
+    np.testing.assert_array_equal(again.vst, first.vst)
+
+    changed = load_normalized(out, counts, genes, samples, {"counts": 2})
+    assert changed.meta["key"] == {"counts": 2}
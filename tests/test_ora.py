@@ -0,0 +1,46 @@
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+from rnaseq_native.genesets import GeneSetCollection
+from rnaseq_native.ora import bh_adjust, hypergeom_sf, ora_from_results
+
+
+def test_hypergeom_sf_and_bh() -> None:
+    n_total, n_drawn = 60, 12
+    k = np.array([0, 1, 3, 5, 8])
+    n_set = np.array([10, 10, 20, 9, 8])
+    expected = [
+        sum(comb(K, i) * comb(n_total - K, n_drawn - i) for i in range(x, min(K, n_drawn) + 1))
+        / comb(n_total, n_drawn)
+        for x, K in zip(k, n_set)
+    ]
+    assert np.allclose(hypergeom_sf(k, n_set, n_drawn, n_total), expected, rtol=1e-9)
+
+    padj = bh_adjust(np.array([0.01, 0.04, np.nan, 0.03]))
+    assert np.allclose(padj[[0, 1, 3]], [0.03, 0.04, 0.04])
+    assert np.isnan(padj[2])
+
+
+def test_ora_from_results_uses_tested_genes() -> None:
+    genes = np.array([f"AT1G{i}" for i in range(10)])
+    sets = GeneSetCollection(
+        names=np.array(["GO:1", "GO:2"]),
+        descriptions=np.array(["hits", "misses"]),
+        genes=np.concatenate([genes, ["AT9G99"]]),
+        offsets=np.array([0, 4, 8]),
+        indices=np.array([0, 1, 2, 10, 5, 6, 7, 8], dtype=np.int32),
+    )
+    res = pd.DataFrame(
+        {"padj": [0.01, 0.01, 0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, np.nan],
+         "gene_tair": [g.lower() for g in genes]},
+        index=[f"STRG.{i}" for i in range(10)],
+    )
+    out = ora_from_results(res, sets, alpha=0.05)
+    assert out["Term"].tolist() == ["GO:1", "GO:2"]
+    first = out.iloc[0]
+    # AT9G99 is not in the universe and AT1G9 was not tested (padj NaN)
+    assert first["Size"] == 3 and first["Overlap"] == 2 and first["Genes"] == "AT1G0;AT1G1"
+    assert np.isclose(first["pvalue"], comb(3, 2) * comb(6, 0) / comb(9, 2))
+    assert out.iloc[1]["pvalue"] == 1.0
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+
+from rnaseq_native.pca import load_pca, render_pca_plots, run_pca, top_variable_genes
+
+
+def _vst() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(8, 300))
+    X[:4, :20] += 3.0  # one strong group effect
+    return X
+
+
+def test_top_variable_genes_matches_full_sort() -> None:
+    v = np.random.default_rng(1).random(1000)
+    np.testing.assert_array_equal(top_variable_genes(v, 50), np.argsort(-v)[:50])
+
+
+def test_pca_matches_sklearn_on_top_genes() -> None:
+    X = _vst()
+    res = run_pca(X, [f"g{i}" for i in range(300)], [f"S{i}" for i in range(8)],
+                  n_top=100, n_components=3)
+    top = top_variable_genes(X.var(axis=0, ddof=1), 100)
+    ref = PCA(n_components=3).fit(X[:, top])
+    np.testing.assert_allclose(np.abs(res.scores), np.abs(ref.transform(X[:, top])), atol=1e-8)
+    np.testing.assert_allclose(res.explained_variance_ratio, ref.explained_variance_ratio_)
+
+
+def test_pca_cache_reused_and_plots_render(tmp_path) -> None:
+    X = _vst()
+    genes, samples = [f"g{i}" for i in range(300)], [f"S{i}" for i in range(8)]
+    first = load_pca(tmp_path / "pca", X, genes, samples, key={"v": 1}, n_top=50, n_components=4)
+    # A cache hit never touches X
+    again = load_pca(tmp_path / "pca", None, genes, samples, key={"v": 1}, n_top=50, n_components=4)
+    np.testing.assert_array_equal(again.scores, first.scores)
+
+    meta = pd.DataFrame({"tree": list("12341234"), "condition": ["A"] * 4 + ["B"] * 4},
+                        index=samples)
+    paths = render_pca_plots(again, meta, tmp_path / "plots")
+    assert {p.name for p in paths} == {"scree.png", "pca.png", "pca_tree.png", "pca_condition.png"}
+    assert all(p.stat().st_size > 0 for p in paths)
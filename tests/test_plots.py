@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnaseq_native.plots import PlotOptions, contrast_jobs, plot_options_from_dict, render_jobs
+
+
+def _results(n_genes: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    pvalue = rng.uniform(size=n_genes)
+    pvalue[:100] = 10.0 ** -rng.uniform(5, 20, size=100)
+    padj = np.minimum(pvalue * n_genes, 1.0)
+    padj[-10:] = np.nan
+    return pd.DataFrame({
+        "baseMean": rng.gamma(1.0, 200.0, size=n_genes),
+        "log2FoldChange": rng.normal(size=n_genes),
+        "pvalue": pvalue,
+        "padj": padj,
+    }, index=[f"g{i}" for i in range(n_genes)])
+
+
+def test_large_vector_plots_stay_small(tmp_path) -> None:
+    jobs = contrast_jobs(_results(60_000), tmp_path, alpha=0.05)
+    assert [j.outpath.name for j in jobs] == ["volcano", "ma"]
+    # Significant genes plus the most extreme 0.1% are the only individual points
+    assert jobs[0].highlight.sum() < 300
+
+    paths = render_jobs(jobs, PlotOptions(formats=("png", "svg", "pdf"), max_points=100, n_workers=2))
+    assert sorted(p.name for p in paths) == sorted(
+        f"{k}.{f}" for k in ("volcano", "ma") for f in ("png", "svg", "pdf"))
+    assert all(0 < p.stat().st_size < 1_000_000 for p in paths)
+
+
+def test_plot_options_validate_formats() -> None:
+    assert plot_options_from_dict({"formats": ["SVG", ".pdf"]}).formats == ("svg", "pdf")
+    with pytest.raises(ValueError):
+        plot_options_from_dict({"formats": ["jpg"]})
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rnaseq_native.run import RunFailed, RunOptions, command_threads, run_commands
+
+
+def _py(code: str, threads: int = 1) -> list[str]:
+    return [sys.executable, "-c", code, "-w", str(threads)]
+
+
+def test_command_threads_reads_fastp_flag() -> None:
+    assert command_threads(["fastp", "-i", "a", "-w", "8"]) == 8
+    assert command_threads(["tool", "--threads", "3"]) == 3
+    assert command_threads(["tool", "-w"]) == 1
+    assert command_threads(["tool"]) == 1
+
+
+def test_dry_run_prints_and_does_not_execute(tmp_path: Path, capsys) -> None:
+    marker = tmp_path / "ran"
+    results = run_commands([_py(f"open({str(marker)!r}, 'w')")], RunOptions(dry_run=True))
+    assert not marker.exists()
+    assert results[0].returncode is None
+    assert sys.executable in capsys.readouterr().out
+
+
+def test_runs_commands_and_logs_per_command(tmp_path: Path) -> None:
+    cmds = [_py(f"print('sample{i}')", threads=2) for i in range(3)]
+    results = run_commands(
+        cmds,
+        RunOptions(dry_run=False, thread_budget=4, log_dir=tmp_path),
+        names=["A", "B", "C"],
+    )
+    assert [r.returncode for r in results] == [0, 0, 0]
+    assert all(r.threads == 2 and r.wall_s > 0 for r in results)
+    assert (tmp_path / "B.stdout.log").read_text().strip() == "sample1"
+
+
+def test_failure_cancels_outstanding_commands(tmp_path: Path) -> None:
+    cmds = [_py("import sys; sys.exit(3)", threads=2)] + [
+        _py("import time; time.sleep(30)", threads=2) for _ in range(3)
+    ]
+    with pytest.raises(RunFailed) as excinfo:
+        run_commands(cmds, RunOptions(dry_run=False, thread_budget=2))
+    assert isinstance(excinfo.value, subprocess.CalledProcessError)
+    assert excinfo.value.returncode == 3
+    assert [r.returncode for r in excinfo.value.results] == [3, None, None, None]
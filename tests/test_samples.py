@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnaseq_native.counts import align_counts_and_samples
+from rnaseq_native.samples import SampleRegistry
+
+
+def _sheet() -> pd.DataFrame:
+    return pd.DataFrame({
+        "sample": ["A", "B", "C", "D"],
+        "tree": ["1", "1", "2", "2"],
+        "condition": ["Control", "Protzen", "Control", "Protzen"],
+    })
+
+
+def test_align_returns_cached_permutation() -> None:
+    reg = SampleRegistry(_sheet())
+    perm = reg.align(["C", "A", "D", "B"])
+    assert perm.tolist() == [2, 0, 3, 1]
+    assert reg.align(["C", "A", "D", "B"]) is perm
+    assert not perm.flags.writeable
+    assert reg.column("condition", perm).tolist() == ["Control", "Control", "Protzen", "Protzen"]
+    assert reg.take(perm, ["sample"])["sample"].tolist() == ["C", "A", "D", "B"]
+
+    # a shared sheet can serve a matrix that uses only some of its samples
+    assert reg.align(["D", "B"], allow_extra=True).tolist() == [3, 1]
+    with pytest.raises(ValueError, match=r"Extra in samples.tsv: \['A', 'C'\]"):
+        reg.align(["D", "B"])
+    with pytest.raises(ValueError, match=r"Missing in samples.tsv: \['Z'\]"):
+        reg.align(["D", "Z"], allow_extra=True)
+
+
+def test_align_counts_and_samples_reuses_registry() -> None:
+    sheet = _sheet()
+    reg = SampleRegistry(sheet)
+    counts = pd.DataFrame({"Geneid": ["g1"], "D": [1], "C": [2], "B": [3], "A": [4]})
+    _, meta = align_counts_and_samples(counts, sheet, registry=reg)
+    assert meta["sample"].tolist() == ["D", "C", "B", "A"]
+    assert reg.align(["D", "C", "B", "A"]).tolist() == [3, 2, 1, 0]
+
+    assert reg.positions(["B", "X"], missing_ok=True).tolist() == [1, -1]
+    with pytest.raises(ValueError, match="Duplicate sample IDs"):
+        SampleRegistry(pd.DataFrame({"sample": ["A", "A"]}))
+    assert np.array_equal(reg.positions(["A"]), [0])
+
+
+def test_load_exposes_groups(tmp_path) -> None:
+    p = tmp_path / "samples.tsv"
+    p.write_text("sample\ttree\tcondition\nA\t1\tControl\nB\t2\tProtzen\nC\t1\tProtzen\n",
+                 encoding="utf-8")
+    reg = SampleRegistry.load(p, require_fastq=False)
+    assert reg.levels["condition"] == ["Control", "Protzen"]
+    assert {k: v.tolist() for k, v in reg.groups("condition").items()} == {
+        "Control": [0], "Protzen": [1, 2]}
+    assert {k: v.tolist() for k, v in reg.groups("tree", reg.align(["C", "B", "A"])).items()} == {
+        "1": [0, 2], "2": [1]}
+
+    p.write_text("sample\ttree\tcondition\nA\t1\tControl\nB\t2\tProtzen\n", encoding="utf-8")
+    assert SampleRegistry.load(p, require_fastq=False).samples == ["A", "B"]
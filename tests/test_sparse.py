@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.io
+import scipy.sparse as sp
+
+from rnaseq_native.counts import align_counts_and_samples
+from rnaseq_native.sparse import SparseCountMatrix, pseudobulk_matrix_market, pseudobulk_triplets
+
+DENSE = np.array([
+    [0, 5, 0, 1],
+    [0, 0, 0, 0],
+    [7, 0, 2, 0],
+])  # genes x columns
+
+
+def _mtx(tmp_path: Path) -> Path:
+    path = tmp_path / "matrix.mtx"
+    scipy.io.mmwrite(path, sp.coo_matrix(DENSE))
+    (tmp_path / "features.tsv").write_text("g1\tA\tGene Expression\ng2\tB\tGene Expression\ng3\tC\tGene Expression\n")
+    (tmp_path / "barcodes.tsv").write_text("c1\nc2\nc3\nc4\n")
+    return path
+
+
+def test_matrix_market_and_triplets_load_the_same_matrix(tmp_path: Path) -> None:
+    m = SparseCountMatrix.load(_mtx(tmp_path))
+    assert m.genes.tolist() == ["g1", "g2", "g3"]
+    assert m.columns == ["c1", "c2", "c3", "c4"]
+    assert m.nnz == 4
+
+    trip = tmp_path / "counts_triplets.tsv"
+    trip.write_text("Geneid\tcell\tcount\ng3\tc1\t7\ng1\tc2\t5\ng3\tc3\t2\ng1\tc4\t1\ng2\tc4\t0\n")
+    t = SparseCountMatrix.from_triplets(trip, chunksize=2).select_columns(m.columns)
+    t = t.filter_min_total(0)
+    assert t.nnz == 4
+    pos = pd.Index(t.genes).get_indexer(m.genes)
+    assert (t.data.toarray()[pos] == m.data.toarray()).all()
+
+    trip.write_text("Geneid\tcell\tcount\ng1\tc1\t1\ng1\tc1\t2\n")
+    with pytest.raises(ValueError, match="Repeated"):
+        SparseCountMatrix.from_triplets(trip)
+
+
+def test_validate_scans_non_zeros_only(tmp_path: Path) -> None:
+    m = SparseCountMatrix.load(_mtx(tmp_path))
+    assert m.validate().ok
+
+    bad = sp.csc_matrix(np.array([[0.0, 1.5], [-2.0, np.nan]]))
+    with pytest.raises(ValueError, match="missing values"):
+        SparseCountMatrix(bad, np.array(["a", "b"]), ["s1", "s2"]).validate()
+    bad = sp.csc_matrix(np.array([[0.0, 1.5], [-2.0, 0.0]]))
+    with pytest.raises(ValueError, match=r"non-integer.*Geneid 'a'\), column 's2'"):
+        SparseCountMatrix(bad, np.array(["a", "b"]), ["s1", "s2"]).validate()
+
+
+def test_filter_align_and_pseudobulk(tmp_path: Path) -> None:
+    m = SparseCountMatrix.load(_mtx(tmp_path)).filter_min_total(3)
+    assert m.genes.tolist() == ["g1", "g3"]
+
+    meta = pd.DataFrame({"sample": ["c4", "c3", "c2", "c1"]})
+    _, meta = align_counts_and_samples(m.header_frame(), meta)
+    assert meta["sample"].tolist() == m.columns
+    assert m.column_totals().tolist() == [7, 5, 2, 1]
+
+    bulk = m.pseudobulk(["S1", "S2", "S1", "S2"])
+    assert bulk.samples == ["S1", "S2"]
+    assert bulk.values.dtype == np.uint32
+    assert bulk.values.tolist() == [[0, 9], [6, 0]]
+
+
+def test_streamed_matrix_market_pseudobulk_matches_in_memory(tmp_path: Path) -> None:
+    path = _mtx(tmp_path)
+    mapping = {"c1": "S2", "c2": "S1", "c3": "S2", "c4": "S1"}
+    streamed = pseudobulk_matrix_market(path, mapping, ["S1", "S2"], chunksize=1)
+    assert streamed.samples == ["S1", "S2"]
+    assert streamed.values.tolist() == [[6, 0, 0], [0, 0, 9]]
+
+    m = SparseCountMatrix.load(path)
+    codes = np.array([1, 0, 1, 0])
+    assert m.pseudobulk_codes(codes, ["S1", "S2"], chunk_columns=3).values.tolist() == \
+        streamed.values.tolist()
+
+    trip = tmp_path / "counts_triplets.tsv"
+    trip.write_text("Geneid\tcell\tcount\ng3\tc1\t7\ng1\tc2\t5\ng2\tc4\t0\ng3\tc3\t2\ng1\tc4\t1\n")
+    triplets = pseudobulk_triplets(trip, mapping, ["S1", "S2"], chunksize=2)
+    assert triplets.genes.tolist() == ["g3", "g1", "g2"]
+    assert triplets.values.tolist() == [[0, 6, 0], [9, 0, 0]]
+    with pytest.raises(ValueError, match="no sample in the barcode table"):
+        pseudobulk_triplets(trip, {"c1": "S2", "c2": "S1"}, ["S1", "S2"])
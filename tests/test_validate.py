@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rnaseq_native.validate import check_count_values
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "A": ["1", "2", None, "4"],
+            "B": ["1.5", "-3", "abc", "0"],
+            "C": ["5", "6", "7", "8"],
+        }
+    )
+
+
+def test_report_counts_each_kind_and_locates_cells() -> None:
+    df = _frame()
+    genes = np.array(["g1", "g2", "g3", "g4"])
+    _, report = check_count_values(df, genes)
+
+    assert not report.ok
+    assert report.n_genes == 4
+    assert report.n_samples == 3
+    assert report.n_bad == {
+        "missing": 1, "non-numeric": 1, "non-integer": 1, "negative": 1,
+    }
+
+    by_kind = {c.kind: c for c in report.issues}
+    assert by_kind["non-integer"].gene == "g1"
+    assert by_kind["non-integer"].sample == "B"
+    assert by_kind["negative"].row == 1
+    assert by_kind["non-numeric"].value == "abc"
+
+
+def test_clean_integer_frame_is_ok() -> None:
+    df = pd.DataFrame({"A": [1, 2], "B": [0, 3]})
+    values, report = check_count_values(df, np.array(["g1", "g2"]))
+    assert report.ok
+    assert values.flags.f_contiguous
+    report.raise_if_invalid()
+
+
+def test_parallel_scan_matches_serial_and_caps_issues() -> None:
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 100, size=(50, 200)).astype(float)
+    values[3, 150] = -1
+    values[7, 10] = 0.5
+    values[::5, 42] = np.nan
+    df = pd.DataFrame(values, columns=[f"S{i}" for i in range(200)])
+    genes = np.array([f"g{i}" for i in range(50)])
+
+    _, serial = check_count_values(df, genes, max_issues=3)
+    _, parallel = check_count_values(df, genes, max_issues=3, n_jobs=4)
+
+    assert serial == parallel
+    assert serial.n_bad["missing"] == 10
+    assert len([c for c in serial.issues if c.kind == "missing"]) == 3
+    with pytest.raises(ValueError) as excinfo:
+        serial.raise_if_invalid()
+    assert "missing" in str(excinfo.value)
+    assert "and 7 more" in str(excinfo.value)
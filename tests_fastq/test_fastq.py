@@ -0,0 +1,59 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+from rnaseq_native.fastq import fastq_pair_stats, fastq_stats, iter_fastq_blocks
+
+RECORDS = [
+    ("GCGCAT", "IIIII#"),  # Q40 x5, Q2
+    ("ATNA", "5555"),  # Q20
+    ("GGCCGGCC", "IIIIIIII"),
+]
+
+
+def _fastq(path: Path, records=RECORDS, gz: bool = False) -> Path:
+    text = "".join(f"@r{i}\n{s}\n+\n{q}\n" for i, (s, q) in enumerate(records)).encode()
+    if gz:
+        with gzip.open(path, "wb") as f:
+            f.write(text)
+    else:
+        path.write_bytes(text)
+    return path
+
+
+def test_fastq_stats_counts_quality_gc_and_lengths(tmp_path: Path) -> None:
+    stats = fastq_stats(_fastq(tmp_path / "r1.fastq.gz", gz=True))
+    assert stats.n_reads == 3
+    assert stats.n_bases == 18
+    assert stats.n_gc == 4 + 0 + 8
+    assert stats.n_n == 1
+    assert stats.n_q30 == 5 + 8
+    assert stats.bases_by_pos.tolist() == [3, 3, 3, 3, 2, 2, 1, 1]
+    assert stats.mean_quality_by_position()[0] == pytest.approx((40 + 20 + 40) / 3)
+    assert stats.n_rate_by_position()[2] == pytest.approx(1 / 3)
+    assert stats.to_dict()["length_distribution"] == {4: 1, 6: 1, 8: 1}
+    assert stats.gc_hist[100] == 1 and stats.gc_hist[67] == 1 and stats.gc_hist[0] == 1
+
+
+def test_small_blocks_and_workers_match_single_pass(tmp_path: Path) -> None:
+    path = _fastq(tmp_path / "r1.fastq", records=RECORDS * 50)
+    blocks = list(iter_fastq_blocks(path, block_bytes=37))
+    assert len(blocks) > 1
+    assert [first for _, first in blocks][:2] == [0, blocks[0][0].count(b"\n") // 4]
+
+    whole = fastq_stats(path).to_dict()
+    assert fastq_stats(path, block_bytes=37).to_dict() == whole
+    assert fastq_stats(path, block_bytes=64, n_jobs=2).to_dict() == whole
+
+
+def test_pair_stats_rejects_truncated_and_unpaired_files(tmp_path: Path) -> None:
+    r1 = _fastq(tmp_path / "r1.fastq")
+    r2 = _fastq(tmp_path / "r2.fastq", records=RECORDS[:2])
+    with pytest.raises(ValueError, match="different read counts"):
+        fastq_pair_stats(r1, r2)
+
+    broken = tmp_path / "broken.fastq"
+    broken.write_bytes(r1.read_bytes()[:-12])
+    with pytest.raises(ValueError, match="Truncated"):
+        fastq_stats(broken)
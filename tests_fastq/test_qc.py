@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from rnaseq_native.qc import FastpQCConfig, fastp_command
+from rnaseq_native.qc import FastpQCConfig, QCManifest, fastp_command, fastp_outputs
 
 
 def test_fastp_command_build_expected_outputs(tmp_path: Path) -> None:
@@ -16,3 +16,52 @@ def test_fastp_command_build_expected_outputs(tmp_path: Path) -> None:
     assert "8" in cmd
     assert str(tmp_path / "S1.fastp.html") in cmd
     assert str(tmp_path / "S1.trimmed.R1.fastq.gz") in cmd
+
+
+def _fake_run(sample: str, outdir: Path) -> None:
+    for path in fastp_outputs(sample, outdir).values():
+        path.write_text("out", encoding="utf-8")
+
+
+def _inputs(tmp_path: Path) -> tuple[str, str]:
+    r1 = tmp_path / "S1_R1.fastq.gz"
+    r2 = tmp_path / "S1_R2.fastq.gz"
+    r1.write_text("r1", encoding="utf-8")
+    r2.write_text("r2", encoding="utf-8")
+    return str(r1), str(r2)
+
+
+def test_manifest_marks_finished_sample_current(tmp_path: Path) -> None:
+    r1, r2 = _inputs(tmp_path)
+    outdir = tmp_path / "qc"
+    cmd = fastp_command("S1", r1, r2, outdir, FastpQCConfig(threads=4))
+
+    manifest = QCManifest(outdir / "qc_manifest.json")
+    assert not manifest.is_current("S1", r1, r2, cmd, outdir)
+
+    _fake_run("S1", outdir)
+    manifest.record("S1", r1, r2, cmd, outdir)
+    manifest.save()
+
+    reloaded = QCManifest(outdir / "qc_manifest.json")
+    assert reloaded.is_current("S1", r1, r2, cmd, outdir)
+    # thread count alone does not force a rerun
+    cmd8 = fastp_command("S1", r1, r2, outdir, FastpQCConfig(threads=8))
+    assert reloaded.is_current("S1", r1, r2, cmd8, outdir)
+
+
+def test_manifest_detects_changed_input_and_missing_output(tmp_path: Path) -> None:
+    r1, r2 = _inputs(tmp_path)
+    outdir = tmp_path / "qc"
+    cmd = fastp_command("S1", r1, r2, outdir, FastpQCConfig())
+    _fake_run("S1", outdir)
+    manifest = QCManifest(outdir / "qc_manifest.json")
+    manifest.record("S1", r1, r2, cmd, outdir)
+
+    fastp_outputs("S1", outdir)["json"].unlink()
+    assert not manifest.is_current("S1", r1, r2, cmd, outdir)
+
+    _fake_run("S1", outdir)
+    manifest.record("S1", r1, r2, cmd, outdir)
+    Path(r1).write_text("new reads", encoding="utf-8")
+    assert not manifest.is_current("S1", r1, r2, cmd, outdir)
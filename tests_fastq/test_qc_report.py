@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from rnaseq_native.qc_report import (
+    flag_outliers,
+    load_fastp_reports,
+    read_qc_table,
+    write_qc_table,
+)
+
+
+def _report(path: Path, reads: int, q30: float, dup: float, insert: bool = True) -> Path:
+    report = {
+        "summary": {
+            "before_filtering": {"total_reads": reads, "total_bases": reads * 150, "q30_rate": q30},
+            "after_filtering": {"total_reads": reads - 100, "total_bases": (reads - 100) * 148,
+                                "q30_rate": q30 + 0.01, "gc_content": 0.44},
+        },
+        "duplication": {"rate": dup},
+        "adapter_cutting": {"adapter_trimmed_reads": 50, "adapter_trimmed_bases": 900},
+        "filtering_result": {"low_quality_reads": 80, "too_many_N_reads": 5, "too_short_reads": 15},
+    }
+    if insert:
+        report["insert_size"] = {"peak": 210}
+    path.write_text(json.dumps(report), encoding="utf-8")
+    return path
+
+
+def test_load_fastp_reports_builds_typed_columns(tmp_path: Path) -> None:
+    paths = [_report(tmp_path / f"S{i}.fastp.json", 10_000 + i, 0.9, 0.1) for i in range(5)]
+    paths.append(_report(tmp_path / "S5.fastp.json", 10_000, 0.9, 0.1, insert=False))
+
+    table = load_fastp_reports(paths, n_jobs=2, batch_size=2)
+    assert table["sample"].tolist() == [f"S{i}" for i in range(6)]
+    assert table["reads_before"].dtype.kind == "i"
+    assert table["insert_size_peak"].isna().tolist() == [False] * 5 + [True]
+    assert table.loc[0, "pass_rate"] == pytest.approx(9_900 / 10_000)
+    assert table.loc[0, "adapter_trimmed_fraction"] == pytest.approx(50 / 10_000)
+
+    tsv, npz = write_qc_table(flag_outliers(table), tmp_path / "out")
+    assert tsv.exists()
+    back = read_qc_table(npz)
+    assert back["sample"].tolist() == table["sample"].tolist()
+    assert back["reads_before"].tolist() == table["reads_before"].tolist()
+
+
+def test_flag_outliers_uses_bad_side_only(tmp_path: Path) -> None:
+    paths = [_report(tmp_path / f"S{i}.fastp.json", 10_000 + 37 * i, 0.90 + 0.002 * i, 0.10 + 0.003 * i)
+             for i in range(8)]
+    paths.append(_report(tmp_path / "low.fastp.json", 10_100, 0.60, 0.11))
+    paths.append(_report(tmp_path / "clean.fastp.json", 10_100, 0.99, 0.11))
+
+    flagged = flag_outliers(load_fastp_reports(paths)).set_index("sample")
+    assert flagged.loc["low", "outlier"]
+    assert "q30_rate_after low" in flagged.loc["low", "outlier_reasons"]
+    # unusually good quality is not a problem
+    assert not flagged.loc["clean", "outlier"]
+    assert flagged["outlier"].sum() == 1